@@ -0,0 +1,61 @@
+#ifndef COMPONENTSOLVER_H
+#define COMPONENTSOLVER_H
+
+#include "common.h"
+using namespace std;
+
+// Loony endgames: once every box left sits in an independent chain or loop, the value of a position
+// depends only on the multiset of component sizes and the pending double-deal, not on the board.
+// Values are memoized in one table shared by every engine and search thread and kept for the life
+// of the module, so each multiset is solved once per process.
+struct ComponentMemo {
+    static constexpr int SIZE = 1 << 16;
+    atomic<uint64_t> slots[SIZE] = {};   // key with its low byte replaced by the value; a racing store
+                                         // only ever writes a whole word, so a hit is never torn
+
+    bool probe(uint64_t key, int &value) const {
+        uint64_t s = slots[key & (SIZE - 1)].load(memory_order_relaxed);
+        if ((s ^ key) >> 8) return false;
+        value = int8_t(s & 0xFF);
+        return true;
+    }
+    void store(uint64_t key, int value) {
+        slots[key & (SIZE - 1)].store((key & ~0xFFULL) | uint8_t(value), memory_order_relaxed);
+    }
+};
+inline ComponentMemo componentMemo;
+
+// Margin the side to move makes on the remaining boxes. comps holds count sizes as in
+// DotsAndBoxesState::components (-length for chains, length for loops) and is put back as it was;
+// multiset is the sum of their zobristComp keys. Unlike getMoves, every distinct size is tried.
+inline int solveComponents(int8_t *comps, int count, int doubleDeal, uint64_t multiset) {
+    if (!count) return doubleDeal;
+    uint64_t key = multiset ^ zobristDoubleDeal[doubleDeal];
+    int value;
+    if (componentMemo.probe(key, value)) return value;
+    if (doubleDeal) {   // take the last boxes and open the next component, or leave them and let the opponent open it
+        int open = solveComponents(comps, count, 0, multiset);
+        value = max(doubleDeal + open, -doubleDeal - open);
+    } else {
+        value = -SCORE_INF;
+        for (int i = 0; i < count; i++) {
+            int8_t c = comps[i];
+            bool seen = false;
+            for (int j = 0; j < i; j++) seen |= (comps[j] == c);
+            if (seen) continue;
+            // same rules as DotsAndBoxesState::apply: the opponent takes all but the double-deal
+            bool isChain = (c < 0);
+            int length = abs(c), leaveN = (isChain ? 2 : 4);
+            bool big = (length >= (isChain ? 3 : 4));
+            swap(comps[i], comps[count - 1]);
+            int reply = (big ? length - leaveN : length)
+                      + solveComponents(comps, count - 1, big ? leaveN : 0, multiset - zobristComp[c + BOX_X * BOX_Y]);
+            swap(comps[i], comps[count - 1]);
+            value = max(value, -reply);
+        }
+    }
+    componentMemo.store(key, value);
+    return value;
+}
+
+#endif
@@ -4,57 +4,100 @@
 #include "DotsAndBoxesState.h"
 using namespace std;
 
-inline void pushChild(vector<DotsAndBoxesState> &children, vector<int8_t> *eList, DotsAndBoxesState &&st, int8_t tag){
+inline void pushChild(vector<DotsAndBoxesState> &children, vector<Edge> *eList, DotsAndBoxesState &&st, Edge tag){
     children.emplace_back(move(st));
     if (eList) eList->push_back(tag);
 }
 
-void DotsAndBoxesState::getChildren(vector<DotsAndBoxesState> &children, vector<int8_t> *eList) const {
-    int reserveCount = (this->doubleDealState ? 2 : PRUNING + 2);
-    children.clear(); children.reserve(reserveCount);
-    if (eList) {eList->clear(); eList->reserve(reserveCount);}
+// Stable insertion sort by descending score: equal scores keep the root order.
+static void sortMoves(pair<int, Edge> *moves, int count) {
+    for (int i = 1; i < count; i++) {
+        pair<int, Edge> m = moves[i];
+        int j = i;
+        for (; j > 0 && moves[j - 1].first < m.first; j--) moves[j] = moves[j - 1];
+        moves[j] = m;
+    }
+}
+
+int DotsAndBoxesState::getMoves(Edge *tags, const MoveOrdering *ordering, int ply, Edge hint) const {
     if (this->doubleDealState) {
-        auto addChild = [&](int8_t tag, bool giveToOpponent) {
-            DotsAndBoxesState ns = *this;
-            if (giveToOpponent) {ns.score *= -1; ns.turn *= -1;}
-            ns.score += ns.doubleDealState;
-            ns.remainingBoxes -= ns.doubleDealState;
-            ns.doubleDealState = 0;
-            pushChild(children, eList, move(ns), tag);
-        };
-        addChild(NO_DOUBLE_DEAL, false); 
-        addChild(DOUBLE_DEAL, true);  
-        return;
+        bool dealFirst = (hint == DOUBLE_DEAL);
+        tags[0] = dealFirst ? DOUBLE_DEAL : NO_DOUBLE_DEAL;
+        tags[1] = dealFirst ? NO_DOUBLE_DEAL : DOUBLE_DEAL;
+        return 2;
     }
-    for (size_t k = 0; k < order.size(); ++k) {
-        int8_t e = order[k], oe = this->opp[e];
+    // Candidate lines in the engine's shuffled order, sorted by the move ordering before the PRUNING cut;
+    // the component openings are always kept. Without ordering this is the plain order.
+    pair<int, Edge> moves[PRUNING + 2];
+    int count = 0;
+    const Edge *order = g_search->order;
+    for (int k = 0; k < NUM_EDGE; k++) {
+        Edge e = order[k];
+        Edge oe = this->edges[e].opp;
         if (e < oe || oe == REMOVED) continue;
-        int8_t ne = this->next[e], nne = this->next[ne], nnne = this->next[nne];
-        int8_t e3 = ((ne==oe || nne==oe || nnne==oe) && (ne==e || nne==e || nnne==e)) ? (ne==e ? nne : ne) : REMOVED;
-        int8_t length = this->simplifiedBoxCount[e] + (e3 == REMOVED ? 0 : this->simplifiedBoxCount[e3] + 1);
-        DotsAndBoxesState ns = *this;
-        ns.removeAndSimplify(e);
-        ns.removeAndSimplify(e3);
-        ns.applyScore(length, 2, 3);
-        pushChild(children, eList, move(ns), e);
-        if (children.size() >= PRUNING) break;
+        if (!ordering) {
+            moves[count++] = {0, e};
+            if (count >= PRUNING) break;
+            continue;
+        }
+        // keep the best PRUNING seen so far; a later move only gets in by scoring strictly higher
+        int sc = ordering->score(e, e, ply, hint);
+        if (count == PRUNING && sc <= moves[count - 1].first) continue;
+        int j = min(count++, PRUNING - 1);
+        count = min(count, PRUNING);
+        for (; j > 0 && moves[j - 1].first < sc; j--) moves[j] = moves[j - 1];
+        moves[j] = {sc, e};
     }
-    int8_t bestChainSize = 26, bestLoopSize = 26, bestChain = -1, bestLoop = -1;
+    int8_t bestChainSize = BOX_X * BOX_Y + 1, bestLoopSize = BOX_X * BOX_Y + 1, bestChain = -1, bestLoop = -1;
     for (int i = 0; i < componentsCount; i++) {
         int8_t cs = this->components[i];
         if (cs<0 && -cs < bestChainSize) {bestChainSize = -cs; bestChain = i;} 
         else if (cs < bestLoopSize) {bestLoopSize = cs; bestLoop = i;}
     }
-    auto openComp = [&](int idx){
-        DotsAndBoxesState ns = *this;
+    for (int idx : {bestChain, bestLoop}) {
+        if (idx < 0) continue;
+        Edge tag = Edge(-OPEN_CHAIN - idx);
+        moves[count++] = {ordering ? ordering->score(tag, orderSlot(tag), ply, hint) : 0, tag};
+    }
+    if (ordering) sortMoves(moves, count);
+    for (int k = 0; k < count; k++) tags[k] = moves[k].second;
+    return count;
+}
+
+void DotsAndBoxesState::apply(Edge tag, UndoStack *undo) {
+    if (tag == NO_DOUBLE_DEAL || tag == DOUBLE_DEAL) {
+        if (tag == DOUBLE_DEAL) {score *= -1; turn *= -1;}   // give the boxes to the opponent
+        score += doubleDealState;
+        remainingBoxes -= doubleDealState;
+        doubleDealState = 0;
+    } else if (tag <= -OPEN_CHAIN) {
+        int idx = -tag - OPEN_CHAIN;
         int8_t raw = components[idx];
         bool isChain = (raw < 0);
         int length = abs(raw), leaveN = (isChain ? 2 : 4), minN = (isChain ? 3 : 4);
-        ns.applyScore(length, leaveN, minN);
-        ns.components[idx] = ns.components[--ns.componentsCount];
-        pushChild(children, eList, move(ns), int8_t(-OPEN_CHAIN - idx));
-    };
-    if (bestChain >= 0) openComp(bestChain);
-    if (bestLoop >= 0) openComp(bestLoop);
-    return;
+        applyScore(length, leaveN, minN);
+        components[idx] = components[--componentsCount];
+    } else {
+        Edge e = tag, oe = edges[e].opp, ne = edges[e].next, nne = edges[ne].next, nnne = edges[nne].next;
+        Edge e3 = ((ne==oe || nne==oe || nnne==oe) && (ne==e || nne==e || nnne==e)) ? (ne==e ? nne : ne) : REMOVED;
+        int8_t length = edges[e].len + (e3 == REMOVED ? 0 : edges[e3].len + 1);
+        removeAndSimplify(e, undo);
+        removeAndSimplify(e3, undo);
+        applyScore(length, 2, 3);
+    }
+}
+
+DotsAndBoxesState DotsAndBoxesState::child(Edge tag) const {
+    DotsAndBoxesState ns = *this;
+    ns.apply(tag);
+    return ns;
+}
+
+void DotsAndBoxesState::getChildren(vector<DotsAndBoxesState> &children, vector<Edge> *eList,
+                                    const MoveOrdering *ordering, int ply, Edge hint) const {
+    Edge tags[PRUNING + 2];
+    int n = getMoves(tags, ordering, ply, hint);
+    children.clear(); children.reserve(n);
+    if (eList) {eList->clear(); eList->reserve(n);}
+    for (int k = 0; k < n; k++) pushChild(children, eList, child(tags[k]), tags[k]);
 }
@@ -5,85 +5,117 @@
 #define DOTSANDBOXESSTATE_H
 
 #include "common.h"
+#include "Symmetry.h"
+#include "MoveOrdering.h"
+#include "ComponentSolver.h"
 using namespace std;
 
+// Box sides are edges 4 * (x + BOX_X * y) + k, k = 0 top, 1 right, 2 bottom, 3 left.
+// opp is the same line seen from the neighbouring box, next/prev walk the sides still open in the
+// box clockwise, len counts the boxes of the simplified chain behind the side. The four fields of
+// one side sit together, so a move touches one slot per side instead of four arrays.
+struct EdgeState { Edge opp, next, prev; int8_t len; };
+
+struct EdgeTables { EdgeState e[NUM_EDGE]; };
+
+constexpr EdgeTables makeEdgeTables() {
+    EdgeTables t{};
+    for (int y = 0; y < BOX_Y; y++) for (int x = 0; x < BOX_X; x++) {
+        int b = 4 * (x + BOX_X * y);
+        t.e[b].opp = Edge(y > 0 ? b - 4 * BOX_X + 2 : DEADEND);
+        t.e[b + 1].opp = Edge(x < BOX_X - 1 ? b + 4 + 3 : DEADEND);
+        t.e[b + 2].opp = Edge(y < BOX_Y - 1 ? b + 4 * BOX_X : DEADEND);
+        t.e[b + 3].opp = Edge(x > 0 ? b - 4 + 1 : DEADEND);
+        for (int k = 0; k < 4; k++) {
+            t.e[b + k].next = Edge(b + (k + 1) % 4);
+            t.e[b + k].prev = Edge(b + (k + 3) % 4);
+        }
+    }
+    return t;
+}
+inline constexpr EdgeTables INITIAL_EDGES = makeEdgeTables();
+
+// Sides overwritten by make(), in write order; unmake() restores them backwards. One per search thread.
+// A move saves at most 2 * 14 sides (two removeAndSimplify calls), a line lasts at most NUM_BIT + 2 moves.
+struct UndoStack {
+    static constexpr int MAX_SAVED = 28 * (NUM_BIT + 2);
+    pair<Edge, EdgeState> saved[MAX_SAVED];
+    int size = 0;
+};
+
+// Everything make() changes besides the sides on the UndoStack.
+struct Undo {
+    int mark;
+    Score score;
+    int8_t turn, remainingBoxes, doubleDealState, componentsCount;
+    int8_t compIdx, compOld, compLast;   // opening a component: the slot it fills (-1 if none) and the last
+                                         // slot it empties, which deeper moves may write over
+};
+
 struct DotsAndBoxesState
 {
-    int8_t opp[NUM_EDGE] = {                
-        -1, 7, 20, -1, -1, 11, 24, 1, -1, 15, 28, 5, -1, 19, 32, 9, -1, -1, 36, 13,
-        2, 27, 40, -1, 6, 31, 44, 21, 10, 35, 48, 25, 14, 39, 52, 29, 18, -1, 56, 33,
-        22, 47, 60, -1, 26, 51, 64, 41, 30, 55, 68, 45, 34, 59, 72, 49, 38, -1, 76, 53,
-        42, 67, 80, -1, 46, 71, 84, 61, 50, 75, 88, 65, 54, 79, 92, 69, 58, -1, 96, 73,
-        62, 87, -1, -1, 66, 91, -1, 81, 70, 95, -1, 85, 74, 99, -1, 89, 78, -1, -1, 93
-    };
-    int8_t next[NUM_EDGE] = {             
-        1, 2, 3, 0, 5, 6, 7, 4, 9, 10, 11, 8, 13, 14, 15, 12, 17, 18, 19, 16,
-        21, 22, 23, 20, 25, 26, 27, 24, 29, 30, 31, 28, 33, 34, 35, 32, 37, 38, 39, 36,
-        41, 42, 43, 40, 45, 46, 47, 44, 49, 50, 51, 48, 53, 54, 55, 52, 57, 58, 59, 56,
-        61, 62, 63, 60, 65, 66, 67, 64, 69, 70, 71, 68, 73, 74, 75, 72, 77, 78, 79, 76,
-        81, 82, 83, 80, 85, 86, 87, 84, 89, 90, 91, 88, 93, 94, 95, 92, 97, 98, 99, 96
-    };
-    int8_t prev[NUM_EDGE] = {
-        3, 0, 1, 2, 7, 4, 5, 6, 11, 8, 9, 10, 15, 12, 13, 14, 19, 16, 17, 18,
-        23, 20, 21, 22, 27, 24, 25, 26, 31, 28, 29, 30, 35, 32, 33, 34, 39, 36, 37, 38,
-        43, 40, 41, 42, 47, 44, 45, 46, 51, 48, 49, 50, 55, 52, 53, 54, 59, 56, 57, 58,
-        63, 60, 61, 62, 67, 64, 65, 66, 71, 68, 69, 70, 75, 72, 73, 74, 79, 76, 77, 78,
-        83, 80, 81, 82, 87, 84, 85, 86, 91, 88, 89, 90, 95, 92, 93, 94, 99, 96, 97, 98
-    };
-    int8_t simplifiedBoxCount[NUM_EDGE] = {};           
+    EdgeState edges[NUM_EDGE];
     int8_t components[MAX_CHAINS] = {};        
     int8_t componentsCount = 0;        
     int8_t doubleDealState = 0;                
-    int8_t score = 0;                    
+    Score score = 0;                    
     int8_t turn = 1;          
     int8_t remainingBoxes = BOX_X * BOX_Y;     
 
-    DotsAndBoxesState() {}
+    DotsAndBoxesState() {
+        memcpy(edges, INITIAL_EDGES.e, sizeof(edges));
+    }
+    explicit DotsAndBoxesState(const Code &code) : DotsAndBoxesState() {   // from an encode_board_lines() code
+        for (int box = 0; box < BOX_X * BOX_Y; box++) {
+            int cnt = 0;
+            for (int k = 0; k < 4; k++) cnt += code_test(code, edgeToBit[4 * box + k]) ? (remove(Edge(4 * box + k)), 1) : 0;
+            if (cnt == 4) remainingBoxes--;
+        }
+    }
     DotsAndBoxesState(const DotsAndBoxesState &o) : componentsCount(o.componentsCount), doubleDealState(o.doubleDealState), score(o.score), turn(o.turn), remainingBoxes(o.remainingBoxes) {
-        memcpy(opp, o.opp, sizeof(opp));
-        memcpy(next, o.next, sizeof(next));
-        memcpy(prev, o.prev, sizeof(prev));
-        memcpy(simplifiedBoxCount, o.simplifiedBoxCount, sizeof(simplifiedBoxCount));
+        memcpy(edges, o.edges, sizeof(edges));
         memcpy(components, o.components, sizeof(components));
     }
-    void remove(int8_t e) {
-        int8_t p = this->prev[e], n = this->next[e]; 
-        this->next[p] = n;
-        this->prev[n] = p;
-        this->next[e] = REMOVED;
-        this->prev[e] = REMOVED;
-        this->opp[e] = REMOVED;
-        this->simplifiedBoxCount[e] = REMOVED;
+    // Side e, about to be written: saved first when an undo stack is recording.
+    EdgeState &touch(Edge e, UndoStack *undo) {
+        if (undo) undo->saved[undo->size++] = {e, edges[e]};
+        return edges[e];
+    }
+    void remove(Edge e, UndoStack *undo = nullptr) {
+        Edge p = edges[e].prev, n = edges[e].next; 
+        touch(p, undo).next = n;
+        touch(n, undo).prev = p;
+        touch(e, undo) = EdgeState{REMOVED, REMOVED, REMOVED, REMOVED};
     }       
-    void simplify(int8_t e) {
-        int8_t ne = next[e];
-        if (ne < 0 || ne == e || next[ne] != e) return;
-        int8_t one = this->opp[ne], oe = this->opp[e];
-        if (one == e) this->components[(this->componentsCount)++] = this->simplifiedBoxCount[oe] + 1;
+    void simplify(Edge e, UndoStack *undo = nullptr) {
+        Edge ne = edges[e].next;
+        if (ne < 0 || ne == e || edges[ne].next != e) return;
+        Edge one = edges[ne].opp, oe = edges[e].opp;
+        if (one == e) this->components[(this->componentsCount)++] = edges[oe].len + 1;
         else {
-            int8_t length = this->simplifiedBoxCount[ne] + this->simplifiedBoxCount[e] + 1;
-            if (oe != DEADEND) {this->opp[oe] = one; this->simplifiedBoxCount[oe] = length;}
-            if (one != DEADEND) {this->opp[one] = oe; this->simplifiedBoxCount[one] = length;}
+            int8_t length = edges[ne].len + edges[e].len + 1;
+            if (oe != DEADEND) {EdgeState &s = touch(oe, undo); s.opp = one; s.len = length;}
+            if (one != DEADEND) {EdgeState &s = touch(one, undo); s.opp = oe; s.len = length;}
             if (one == DEADEND && oe == DEADEND) this->components[(this->componentsCount)++] = -length; 
         }
-        auto hide = [&](int8_t x){
-            opp[x] = REMOVED;
-            next[x] = REMOVED;
-            prev[x] = REMOVED;
-            simplifiedBoxCount[x] = REMOVED;
-        };
-        hide(e);
-        hide(ne);
+        touch(e, undo) = EdgeState{REMOVED, REMOVED, REMOVED, REMOVED};
+        touch(ne, undo) = EdgeState{REMOVED, REMOVED, REMOVED, REMOVED};
     }
-    void removeAndSimplify(int8_t e) {
-        if (e < 0) return;
-        int8_t oe = this->opp[e], ne = this->next[e];
-        this->remove(e);
-        this->simplify(ne);
+    void removeAndSimplify(Edge e, UndoStack *undo = nullptr) {
+        if (e < 0 || edges[e].opp == REMOVED) return;
+        Edge oe = edges[e].opp, ne = edges[e].next;
+        this->remove(e, undo);
+        if (oe >= 0 && oe / 4 == e / 4) {   // chain looping back into the same box: drop both ends before merging
+            Edge noe = edges[oe].next;
+            this->remove(oe, undo);
+            this->simplify(noe, undo);
+            return;
+        }
+        this->simplify(ne, undo);
         if (oe < 0) return;
-        int8_t noe = this->next[oe];
-        this->remove(oe);
-        this->simplify(noe);
+        Edge noe = edges[oe].next;
+        this->remove(oe, undo);
+        this->simplify(noe, undo);
     }
     void applyScore(int length, int leaveN, int minN) {
         this->turn  = -this->turn;
@@ -94,7 +126,97 @@ struct DotsAndBoxesState
         this->remainingBoxes -= gain;
         this->doubleDealState = big ? leaveN : 0;
     } 
-    void getChildren(vector<DotsAndBoxesState> &children, vector<int8_t> *eList = nullptr) const;
+    // Plays a getMoves() tag in place, recording the sides it overwrites when undo is given.
+    void apply(Edge tag, UndoStack *undo = nullptr);
+    Undo make(Edge tag, UndoStack &undo) {
+        Undo u{undo.size, score, turn, remainingBoxes, doubleDealState, componentsCount, -1, 0, 0};
+        if (tag <= -OPEN_CHAIN) {
+            u.compIdx = int8_t(-tag - OPEN_CHAIN);
+            u.compOld = components[u.compIdx];
+            u.compLast = components[componentsCount - 1];
+        }
+        apply(tag, &undo);
+        return u;
+    }
+    void unmake(const Undo &u, UndoStack &undo) {
+        while (undo.size > u.mark) {
+            undo.size--;
+            edges[undo.saved[undo.size].first] = undo.saved[undo.size].second;
+        }
+        if (u.compIdx >= 0) {
+            components[u.componentsCount - 1] = u.compLast;
+            components[u.compIdx] = u.compOld;
+        }
+        score = u.score;
+        turn = u.turn;
+        remainingBoxes = u.remainingBoxes;
+        doubleDealState = u.doubleDealState;
+        componentsCount = u.componentsCount;   // other slots at or above it are dead, no need to restore them
+    }
+    // No line move remains, only component openings, and the box count agrees with the components.
+    // The count test is cheap and rules out most positions before the sides are scanned.
+    bool componentsOnly() const {
+        int boxes = doubleDealState;
+        for (int i = 0; i < componentsCount; i++) boxes += abs(components[i]);
+        if (boxes != remainingBoxes) return false;
+        for (int e = 0; e < NUM_EDGE; e++) if (edges[e].opp != REMOVED) return false;
+        return true;
+    }
+    // Exact margin of the side to move over the remaining boxes of a componentsOnly() position.
+    int solveEndgame() const {
+        int8_t comps[MAX_CHAINS];
+        uint64_t multiset = 0;
+        for (int i = 0; i < componentsCount; i++) {
+            comps[i] = components[i];
+            multiset += zobristComp[components[i] + BOX_X * BOX_Y];
+        }
+        return solveComponents(comps, componentsCount, doubleDealState, multiset);
+    }
+    uint64_t hash() const {             // score and turn are left out: the TT stores values relative to score
+        uint64_t h = zobristDoubleDeal[doubleDealState] ^ zobristBoxes[remainingBoxes];
+        for (int e = 0; e < NUM_EDGE; e++) {
+            const EdgeState &s = edges[e];
+            if (s.opp == REMOVED) continue;
+            h ^= zobristOpp[e][s.opp + 1] ^ zobristNext[e][s.next] ^ zobristLen[e][s.len];
+        }
+        for (int i = 0; i < componentsCount; i++) h += zobristComp[components[i] + BOX_X * BOX_Y]; // order-free multiset
+        return h;
+    }
+    // hash() of the least-hashing of the 8 symmetric images; *sym receives the symmetry used.
+    uint64_t canonicalHash(int *sym) const {
+        uint64_t h[NUM_SYM];
+        uint64_t base = zobristDoubleDeal[doubleDealState] ^ zobristBoxes[remainingBoxes];
+        for (int i = 0; i < componentsCount; i++) base += zobristComp[components[i] + BOX_X * BOX_Y];
+        for (int s = 0; s < NUM_SYM; s++) h[s] = 0;
+        for (int e = 0; e < NUM_EDGE; e++) {
+            const EdgeState &st = edges[e];
+            if (st.opp == REMOVED) continue;
+            Edge oe = st.opp;
+            int8_t len = st.len;
+            for (int s = 0; s < NUM_SYM; s++) {
+                Edge se = symEdge[s][e];
+                Edge sn = symEdge[s][symReflects(s) ? st.prev : st.next];
+                h[s] ^= zobristOpp[se][oe < 0 ? 0 : symEdge[s][oe] + 1] ^ zobristNext[se][sn] ^ zobristLen[se][len];
+            }
+        }
+        int best = 0;
+        for (int s = 1; s < NUM_SYM; s++) if (h[s] < h[best]) best = s;
+        *sym = best;
+        return h[best] ^ base;
+    }
+    // History slot of a getChildren tag: the edge, or chain/loop opening; -1 for the double-deal choice.
+    int orderSlot(Edge tag) const {
+        if (tag <= -OPEN_CHAIN) return components[-tag - OPEN_CHAIN] < 0 ? MoveOrdering::OPEN_CHAIN_SLOT : MoveOrdering::OPEN_LOOP_SLOT;
+        return tag < NUM_EDGE ? tag : -1;
+    }
+    // Tags of the moves worth searching (at most PRUNING lines plus two component openings), in
+    // move-ordering order when ordering is given: hint (the TT move) first, then killers of this
+    // ply, then history. child(tag) builds the position after one of them.
+    int getMoves(Edge *tags, const MoveOrdering *ordering = nullptr, int ply = 0, Edge hint = REMOVED) const;
+    DotsAndBoxesState child(Edge tag) const;
+    // All children of getMoves() at once; eList receives each child's tag.
+    void getChildren(vector<DotsAndBoxesState> &children, vector<Edge> *eList = nullptr,
+                     const MoveOrdering *ordering = nullptr, int ply = 0, Edge hint = REMOVED) const;
 };
 
 #endif
\ No newline at end of file
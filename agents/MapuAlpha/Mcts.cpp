@@ -0,0 +1,166 @@
+#include "Mcts.h"
+#include "Symmetry.h"
+#include <climits>
+#include <thread>
+using namespace std;
+
+McBoard::McBoard(const Code &code) : lines(code) {
+    for (int b = 0; b < NUM_BIT; b++) if (code_test(code, b)) for (int8_t box : MC_TABLES.lineBoxes[b]) if (box >= 0) sides[box]++;
+    for (int8_t s : sides) boxesLeft -= (s == 4);
+}
+
+void McBoard::play(int bit) {
+    code_set(lines, bit);
+    int done = 0;
+    for (int8_t box : MC_TABLES.lineBoxes[bit]) if (box >= 0 && ++sides[box] == 4) done++;
+    if (!done) {player ^= 1; return;}
+    boxesLeft -= done;
+    margin += player ? -done : done;
+}
+
+// Walks the run of two-sided boxes behind each side of bit: the opponent takes one box after another
+// until the run ends at the border, at a box with fewer sides, or back where it started (a loop).
+int McBoard::giveaway(int bit) const {
+    int total = 0;
+    for (int8_t start : MC_TABLES.lineBoxes[bit]) {
+        int box = start, via = bit;
+        while (box >= 0 && sides[box] == 2) {
+            total++;
+            int next = -1;
+            for (Bit l : MC_TABLES.boxLines[box]) if (l != via && !code_test(lines, l)) {next = l; break;}
+            const int8_t *across = MC_TABLES.lineBoxes[next];
+            box = across[0] == box ? across[1] : across[0];
+            via = next;
+            if (box == start) return total;   // a loop, walked all the way round from one side
+        }
+    }
+    return total;
+}
+
+// Chain-aware default policy: take a box when one is offered, otherwise draw a random line that gives
+// nothing away, and once none is left, open the run that hands over the fewest boxes.
+int McBoard::policy(mt19937_64 &rng) const {
+    Bit safe[NUM_BIT];
+    int safeCount = 0;
+    for (int b = 0; b < NUM_BIT; b++) {
+        if (code_test(lines, b)) continue;
+        int8_t a = MC_TABLES.lineBoxes[b][0], c = MC_TABLES.lineBoxes[b][1];
+        int sa = a >= 0 ? sides[a] : 0, sc = c >= 0 ? sides[c] : 0;
+        if (sa == 3 || sc == 3) return b;
+        if (sa < 2 && sc < 2) safe[safeCount++] = Bit(b);
+    }
+    if (safeCount) return safe[rng() % safeCount];
+    int cheapest = -1, cheapestSeen = 0, cheapestCost = INT_MAX;
+    for (int b = 0; b < NUM_BIT; b++) {
+        if (code_test(lines, b)) continue;
+        int cost = giveaway(b);
+        if (cost < cheapestCost) {cheapestCost = cost; cheapest = b; cheapestSeen = 1;}
+        else if (cost == cheapestCost && rng() % ++cheapestSeen == 0) cheapest = b;
+    }
+    return cheapest;
+}
+
+// Children for every open line at once; returns the first child, or a negative value when the node
+// stays a leaf (another thread is expanding it, or the pool is full).
+int Mcts::expand(McNode &node, const McBoard &board) {
+    int expected = -1;
+    if (!node.first.compare_exchange_strong(expected, -2)) return -1;
+    int count = NUM_BIT - code_count(board.lines);
+    int first = used.fetch_add(count);
+    if (first + count > MCTS_NODES) {
+        node.first = -3;
+        return -3;
+    }
+    for (int b = 0, k = first; b < NUM_BIT; b++) {
+        if (code_test(board.lines, b)) continue;
+        McNode &child = nodes[k++];
+        child.visits = child.reward = child.margin = 0;
+        child.first = -1;
+        child.bit = Bit(b);
+        child.player = board.player;
+        child.count = 0;
+    }
+    node.count = Bit(count);
+    node.first.store(first, memory_order_release);
+    return first;
+}
+
+// One descent by UCT from the root, a default-policy playout from the leaf, and the result added back
+// along the path, each node scored for the player who drew its line.
+void Mcts::playout(McBoard board, mt19937_64 &rng) {
+    int path[NUM_BIT + 1];
+    int n = 0;
+    McNode *node = &nodes[0];
+    node->visits++;
+    while (true) {
+        int first = node->first.load(memory_order_acquire);
+        if (first == -1 && node->visits.load(memory_order_relaxed) >= MCTS_EXPAND && !board.over()) first = expand(*node, board);
+        if (first < 0) break;
+        int count = node->count;
+        double logN = log(double(node->visits.load(memory_order_relaxed)));
+        double best = -1;
+        int pick = 0, offset = int(rng() % count);
+        for (int i = 0; i < count; i++) {
+            int k = (i + offset) % count;
+            McNode &child = nodes[first + k];
+            int v = child.visits.load(memory_order_relaxed);
+            double u = v ? child.reward.load(memory_order_relaxed) / (2.0 * v) + MCTS_C * sqrt(logN / v) : 1e9;
+            if (u > best) {best = u; pick = k;}
+        }
+        node = &nodes[first + pick];
+        node->visits++;          // counted now, rewarded later: the virtual loss
+        path[n++] = first + pick;
+        board.play(node->bit);
+    }
+    for (int d = maxDepth.load(memory_order_relaxed); n > d && !maxDepth.compare_exchange_weak(d, n);) {}
+    while (!board.over()) board.play(board.policy(rng));
+    int score = rootScore + board.margin;   // the whole game decides who won
+    for (int i = 0; i < n; i++) {
+        McNode &nd = nodes[path[i]];
+        int m = nd.player ? -board.margin : board.margin, s = nd.player ? -score : score;
+        nd.reward += s > 0 ? 2 : (s == 0);
+        nd.margin += m;
+    }
+}
+
+void Mcts::worker(const Code &code, SearchContext &search, uint64_t seed, bool timer) {
+    mt19937_64 rng(seed);
+    McBoard root(code);
+    double budgetMs = search.plannedMs > 0 ? search.plannedMs : search.timeLimitMs;
+    long long playouts = 0;
+    while (!search.timeUp) {
+        playout(root, rng);
+        if (++playouts & 0x3F) continue;
+        search.liveNodes += 0x40;
+        if (!timer) continue;
+        double elapsedMs = chrono::duration<double, milli>(Clock::now() - search.startTime).count();
+        if (elapsedMs >= budgetMs || (search.nodeLimit && search.liveNodes >= search.nodeLimit * search.threads)) search.timeUp = true;
+    }
+    search.nodes += playouts;
+}
+
+XYZ Mcts::search(const Code &code, SearchContext &search, int *value) {
+    lock_guard<mutex> lock(busy);
+    if (!nodes) nodes.reset(new McNode[MCTS_NODES]);
+    McNode &root = nodes[0];
+    root.visits = root.reward = root.margin = 0;
+    root.first = -1;
+    root.count = 0;
+    used = 1;
+    maxDepth = 0;
+    rootScore = search.scoreDiff;
+    expand(root, McBoard(code));
+    uint64_t base = seed + searches++;
+    vector<thread> helpers;
+    for (int id = 1; id < search.threads; id++) helpers.emplace_back(&Mcts::worker, this, cref(code), ref(search), base + id * 0x9E3779B97F4A7C15ULL, false);
+    worker(code, search, base, true);
+    for (thread &t : helpers) t.join();
+    McNode *children = &nodes[root.first];
+    int best = 0;
+    for (int k = 1; k < root.count; k++) if (children[k].visits > children[best].visits) best = k;
+    search.depth = maxDepth.load();
+    search.rootMoves = root.count;
+    search.mcts = true;
+    if (value) *value = int(lround(double(children[best].margin) / max(1, children[best].visits.load())));
+    return bitToXYZ[children[best].bit];
+}
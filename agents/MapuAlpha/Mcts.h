@@ -0,0 +1,85 @@
+#ifndef MCTS_H
+#define MCTS_H
+
+#include "common.h"
+#include <memory>
+#include <mutex>
+
+// Monte Carlo tree search for the opening, where alpha-beta sees only a few plies past the PRUNING
+// cut and the score says nothing before boxes fall. Works on the line bitmask with a side count per
+// box instead of the chain graph of DotsAndBoxesState, so a playout to the end of the game is cheap.
+// Threads share one tree and spread over it with virtual loss: a visit is counted on the way down
+// and its reward added on the way up, so a line being played out looks lost to the other threads.
+static constexpr int MCTS_NODES = 1 << 20;   // node pool of one engine, reused by every search
+static constexpr int MCTS_EXPAND = 2;        // visits before a leaf gets children
+static constexpr double MCTS_C = 0.8;        // UCT exploration, rewards are in [0, 1]
+
+// Boxes on each side of a line (-1 off the board) and the lines around each box, top, right, bottom, left.
+struct McTables {
+    int8_t lineBoxes[NUM_BIT][2];
+    Bit boxLines[BOX_X * BOX_Y][4];
+};
+
+constexpr McTables makeMcTables() {
+    McTables t{};
+    for (int b = 0; b < NUM_BIT; b++) t.lineBoxes[b][0] = t.lineBoxes[b][1] = -1;
+    for (int y = 0; y < BOX_Y; y++) for (int x = 0; x < BOX_X; x++) {
+        int box = x + BOX_X * y;
+        int lines[4] = {VERTICAL_BITS + y * BOX_X + x, y * DOT_X + x + 1, VERTICAL_BITS + (y + 1) * BOX_X + x, y * DOT_X + x};
+        for (int k = 0; k < 4; k++) {
+            t.boxLines[box][k] = Bit(lines[k]);
+            t.lineBoxes[lines[k]][t.lineBoxes[lines[k]][0] < 0 ? 0 : 1] = int8_t(box);
+        }
+    }
+    return t;
+}
+inline constexpr McTables MC_TABLES = makeMcTables();
+
+// Position of a playout. Players are 0 (to move at the root) and 1; boxes taken before the root
+// are not known from the lines, so the margin counts from the root on and the search adds the
+// score of the root to it before calling a playout won or drawn.
+struct McBoard {
+    Code lines{};
+    int8_t sides[BOX_X * BOX_Y] = {};
+    int8_t player = 0;
+    int8_t boxesLeft = BOX_X * BOX_Y;
+    int margin = 0;   // player 0's boxes minus player 1's
+
+    explicit McBoard(const Code &code);
+    bool over() const { return !boxesLeft; }
+    void play(int bit);          // a completed box keeps the player on move
+    int giveaway(int bit) const; // boxes the opponent can take in a row after bit is drawn
+    int policy(mt19937_64 &rng) const;
+};
+
+struct McNode {
+    atomic<int> visits{0};       // real and in-flight visits
+    atomic<int> reward{0};       // 2 per win, 1 per draw, for the player who drew bit
+    atomic<int> margin{0};       // sum of that player's final margins
+    atomic<int> first{-1};       // first child in the pool, -1 unexpanded, -2 being expanded, -3 never
+    Bit bit = -1;
+    int8_t player = 0;
+    Bit count = 0;
+};
+
+// One tree per engine, allocated on first use. Searches on the same engine (evaluate's threads) take turns.
+struct Mcts {
+    unique_ptr<McNode[]> nodes;
+    atomic<int> used{0};
+    atomic<int> maxDepth{0};
+    uint64_t seed = 0;        // set by the engine; each search plays from seed + its number
+    uint64_t searches = 0;
+    int rootScore = 0;        // player 0's lead at the root of the running search
+    mutex busy;
+
+    // Most visited line of code for the side to move and its mean playout margin, a win or a draw
+    // counted on search.scoreDiff plus that margin. Searched on
+    // search.threads threads until search.plannedMs (the hard limit when no plan is set),
+    // nodeLimit playouts per thread as alpha-beta counts nodes, or timeUp.
+    XYZ search(const Code &code, SearchContext &search, int *value);
+    void worker(const Code &code, SearchContext &search, uint64_t seed, bool timer);
+    void playout(McBoard board, mt19937_64 &rng);
+    int expand(McNode &node, const McBoard &board);
+};
+
+#endif
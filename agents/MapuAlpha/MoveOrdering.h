@@ -0,0 +1,42 @@
+#ifndef MOVEORDERING_H
+#define MOVEORDERING_H
+
+#include "common.h"
+
+// Killer moves per ply and a history table, filled by minimax on beta cutoffs and read by
+// getChildren to sort moves before the PRUNING cutoff. Each search thread keeps its own.
+struct MoveOrdering {
+    static constexpr int OPEN_CHAIN_SLOT = NUM_EDGE;      // history of opening the shortest chain
+    static constexpr int OPEN_LOOP_SLOT = NUM_EDGE + 1;   // and the shortest loop
+    static constexpr int HINT_SCORE = 1 << 30;            // TT move, then killers, then history
+    static constexpr int HISTORY_MAX = 1 << 20;
+
+    Edge killers[NUM_BIT + 2][2];
+    int history[NUM_EDGE + 2];
+
+    MoveOrdering() { clear(); }
+    void clear() {
+        for (auto &k : killers) k[0] = k[1] = REMOVED;
+        for (int &h : history) h = 0;
+    }
+    void newSearch() {   // killers belong to one position, history carries over at a lower weight
+        for (auto &k : killers) k[0] = k[1] = REMOVED;
+        for (int &h : history) h >>= 2;
+    }
+    int score(Edge tag, int slot, int ply, Edge hint) const {
+        if (tag == hint) return HINT_SCORE;
+        if (tag == killers[ply][0]) return HINT_SCORE - 1;
+        if (tag == killers[ply][1]) return HINT_SCORE - 2;
+        return history[slot];
+    }
+    void cutoff(Edge tag, int slot, int ply, int depth) {
+        if (slot < 0) return;
+        if (tag >= 0 && killers[ply][0] != tag) {   // component tags name an index, not a move worth killing with
+            killers[ply][1] = killers[ply][0];
+            killers[ply][0] = tag;
+        }
+        if ((history[slot] += depth * depth) > HISTORY_MAX) for (int &h : history) h >>= 1;
+    }
+};
+
+#endif
@@ -0,0 +1,65 @@
+#include "OpeningBook.h"
+#include <stdexcept>
+#ifdef _WIN32
+#define NOMINMAX
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+using namespace std;
+
+void OpeningBook::load(const string &path) {
+    unload();
+#ifdef _WIN32
+    HANDLE f = CreateFileA(path.c_str(), GENERIC_READ, FILE_SHARE_READ, nullptr, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, nullptr);
+    if (f == INVALID_HANDLE_VALUE) throw runtime_error("cannot open book " + path);
+    LARGE_INTEGER len;
+    GetFileSizeEx(f, &len);
+    HANDLE m = CreateFileMappingA(f, nullptr, PAGE_READONLY, 0, 0, nullptr);
+    const void *p = m ? MapViewOfFile(m, FILE_MAP_READ, 0, 0, 0) : nullptr;
+    if (!p) {
+        if (m) CloseHandle(m);
+        CloseHandle(f);
+        throw runtime_error("cannot map book " + path);
+    }
+    fileHandle = f; mapHandle = m;
+    size = size_t(len.QuadPart);
+#else
+    int fd = open(path.c_str(), O_RDONLY);
+    if (fd < 0) throw runtime_error("cannot open book " + path);
+    struct stat st;
+    fstat(fd, &st);
+    size = size_t(st.st_size);
+    void *p = size ? mmap(nullptr, size, PROT_READ, MAP_SHARED, fd, 0) : MAP_FAILED;
+    close(fd);
+    if (p == MAP_FAILED) {size = 0; throw runtime_error("cannot map book " + path);}
+#endif
+    base = static_cast<const uint8_t *>(p);
+    uint32_t version;
+    uint64_t n;
+    if (size < 16 || memcmp(base, "MABK", 4) != 0) {unload(); throw runtime_error("not a MapuAlpha book: " + path);}
+    memcpy(&version, base + 4, 4);
+    memcpy(&n, base + 8, 8);
+    if (version != BOOK_VERSION || size != 16 + n * (sizeof(Code) + 2)) {unload(); throw runtime_error("unsupported or truncated book: " + path);}
+    count = size_t(n);
+    keys = reinterpret_cast<const Code *>(base + 16);
+    moves = base + 16 + sizeof(Code) * count;
+    values = reinterpret_cast<const int8_t *>(moves + count);
+}
+
+void OpeningBook::unload() {
+    if (!base) return;
+#ifdef _WIN32
+    UnmapViewOfFile(base);
+    CloseHandle(mapHandle);
+    CloseHandle(fileHandle);
+    fileHandle = mapHandle = nullptr;
+#else
+    munmap(const_cast<uint8_t *>(base), size);
+#endif
+    base = nullptr; size = 0; count = 0;
+    keys = nullptr; moves = nullptr; values = nullptr;
+}
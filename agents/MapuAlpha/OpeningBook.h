@@ -0,0 +1,36 @@
+#ifndef OPENINGBOOK_H
+#define OPENINGBOOK_H
+
+#include "common.h"
+#include <string>
+
+// Read-only view of a book file written by build_book.py:
+//   "MABK" | uint32 version | uint64 count | Code keys[count] (sorted canonical codes, CODE_WORDS
+//   little-endian uint64 words each) | uint8 moves[count] (encode_board_lines bit, canonical
+//   orientation) | int8 values[count]
+static constexpr uint32_t BOOK_VERSION = 1;
+
+struct OpeningBook {
+    const uint8_t *base = nullptr;
+    size_t size = 0;
+    size_t count = 0;
+    const Code *keys = nullptr;
+    const uint8_t *moves = nullptr;
+    const int8_t *values = nullptr;
+#ifdef _WIN32
+    void *fileHandle = nullptr, *mapHandle = nullptr;
+#endif
+
+    ~OpeningBook() { unload(); }
+    void load(const std::string &path);  // throws runtime_error on a missing or malformed file
+    void unload();
+    bool probe(const Code &key, Bit &bit, int8_t &value) const {
+        const Code *it = lower_bound(keys, keys + count, key);
+        if (it == keys + count || *it != key) return false;
+        bit = Bit(moves[it - keys]);
+        value = values[it - keys];
+        return true;
+    }
+};
+
+#endif
@@ -0,0 +1,75 @@
+#include "Symmetry.h"
+using namespace std;
+
+const int8_t symInverse[8] = {0, 1, 2, 3, 5, 4, 6, 7};
+Edge symEdge[NUM_SYM][NUM_EDGE];
+Bit symBit[NUM_SYM][NUM_BIT];
+Bit edgeToBit[NUM_EDGE];
+XYZ bitToXYZ[NUM_BIT];
+Code symNibble[NUM_SYM][NUM_NIBBLE][16];
+
+static pii mapDot(int s, int x, int y) {
+    switch (s) {
+        case 1: return {BOX_X - x, BOX_Y - y};
+        case 2: return {BOX_X - x, y};
+        case 3: return {x, BOX_Y - y};
+        case 4: return {BOX_Y - y, x};
+        case 5: return {y, BOX_X - x};
+        case 6: return {y, x};
+        case 7: return {BOX_Y - y, BOX_X - x};
+        default: return {x, y};
+    }
+}
+
+// Bit of the line joining two neighbouring dots.
+static int dotsToBit(pii a, pii b) {
+    if (a > b) swap(a, b);
+    if (a.second == b.second) return VERTICAL_BITS + a.second * BOX_X + a.first; // horizontal
+    return a.second * DOT_X + a.first;                                        // vertical
+}
+
+// Side k of box (x, y) as its two end dots, in CELL order: top, right, bottom, left.
+static pair<pii, pii> sideDots(int x, int y, int k) {
+    switch (k) {
+        case 0: return {{x, y}, {x + 1, y}};
+        case 1: return {{x + 1, y}, {x + 1, y + 1}};
+        case 2: return {{x, y + 1}, {x + 1, y + 1}};
+        default: return {{x, y}, {x, y + 1}};
+    }
+}
+
+static bool symmetryReady = [] {
+    for (int b = 0; b < NUM_BIT; b++) {
+        if (b < VERTICAL_BITS) bitToXYZ[b] = XYZ{int8_t(b % DOT_X), int8_t(b / DOT_X), int8_t(1)};
+        else bitToXYZ[b] = XYZ{int8_t((b - VERTICAL_BITS) % BOX_X), int8_t((b - VERTICAL_BITS) / BOX_X), int8_t(0)};
+    }
+    for (int y = 0; y < BOX_Y; y++) for (int x = 0; x < BOX_X; x++) for (int k = 0; k < 4; k++) {
+        auto [a, b] = sideDots(x, y, k);
+        edgeToBit[4 * (x + BOX_X * y) + k] = Bit(dotsToBit(a, b));
+    }
+    for (int s = 0; s < NUM_SYM; s++) {
+        for (int b = 0; b < NUM_BIT; b++) {
+            const XYZ &m = bitToXYZ[b];
+            pii a = {m[0], m[1]}, c = m[2] ? pii{m[0], m[1] + 1} : pii{m[0] + 1, m[1]};
+            symBit[s][b] = Bit(dotsToBit(mapDot(s, a.first, a.second), mapDot(s, c.first, c.second)));
+        }
+        for (int y = 0; y < BOX_Y; y++) for (int x = 0; x < BOX_X; x++) {
+            pii c0 = mapDot(s, x, y), c1 = mapDot(s, x + 1, y + 1);
+            int nx = min(c0.first, c1.first), ny = min(c0.second, c1.second);
+            for (int k = 0; k < 4; k++) {
+                auto [a, b] = sideDots(x, y, k);
+                int bit = dotsToBit(mapDot(s, a.first, a.second), mapDot(s, b.first, b.second));
+                for (int nk = 0; nk < 4; nk++) {
+                    auto [na, nb] = sideDots(nx, ny, nk);
+                    if (dotsToBit(na, nb) == bit) symEdge[s][4 * (x + BOX_X * y) + k] = Edge(4 * (nx + BOX_X * ny) + nk);
+                }
+            }
+        }
+        for (int i = 0; i < NUM_NIBBLE; i++) for (int v = 0; v < 16; v++) {
+            Code out{};
+            for (int j = 0; j < 4 && 4 * i + j < NUM_BIT; j++) if (v >> j & 1) code_set(out, symBit[s][4 * i + j]);
+            symNibble[s][i][v] = out;
+        }
+    }
+    return true;
+}();
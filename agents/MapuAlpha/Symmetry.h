@@ -0,0 +1,43 @@
+#ifndef SYMMETRY_H
+#define SYMMETRY_H
+
+#include "common.h"
+
+// Dihedral symmetries of the board. 0 is the identity, 1 turns by 180 degrees, 2-3 reflect;
+// square boards add 4-5 (quarter turns) and 6-7 (diagonal reflections).
+// Reflections reverse the clockwise next/prev ring of every box.
+static constexpr int NUM_SYM = (BOX_X == BOX_Y) ? 8 : 4;
+static constexpr int NUM_NIBBLE = (NUM_BIT + 3) / 4;
+
+extern const int8_t symInverse[8];
+extern Edge symEdge[NUM_SYM][NUM_EDGE];     // DotsAndBoxesState edge e -> edge under symmetry s
+extern Bit symBit[NUM_SYM][NUM_BIT];        // encode_board_lines bit b -> bit under symmetry s
+extern Bit edgeToBit[NUM_EDGE];             // DotsAndBoxesState edge -> encode_board_lines bit
+extern XYZ bitToXYZ[NUM_BIT];
+extern Code symNibble[NUM_SYM][NUM_NIBBLE][16];
+
+inline bool symReflects(int s) { return s == 2 || s == 3 || s >= 6; }
+
+inline int xyzToBit(const XYZ &m) { return m[2] ? m[1] * DOT_X + m[0] : VERTICAL_BITS + m[1] * BOX_X + m[0]; }
+
+inline Code transform_code(const Code &code, int s) {
+    Code out{};
+    for (int i = 0; i < NUM_NIBBLE; i++) out |= symNibble[s][i][code_nibble(code, i)];
+    return out;
+}
+
+// Smallest code over all orientations; *sym receives the symmetry that maps code onto it.
+inline Code canonical_code(const Code &code, int *sym = nullptr) {
+    Code best = code;
+    int bestSym = 0;
+    for (int s = 1; s < NUM_SYM; s++) {
+        Code c = transform_code(code, s);
+        if (c < best) {best = c; bestSym = s;}
+    }
+    if (sym) *sym = bestSym;
+    return best;
+}
+
+inline XYZ transform_move(const XYZ &m, int s) { return bitToXYZ[symBit[s][xyzToBit(m)]]; }
+
+#endif
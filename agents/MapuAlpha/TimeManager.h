@@ -8,7 +8,12 @@ struct TimeManager {
         D0 = max(1.0, (initial_edges - initial_boxes) / 2.0);
     } 
 
+    // Clock kept back from every plan: the referee also counts the Python and conversion time around the
+    // search, which the engine never sees, so running the clock down to zero loses on time.
+    double reserve() const { return max(0.25, 0.02 * total_time); }
+
     double get_time_for_move(double remaining_time, int remaining_edges, int remaining_boxes) {
+        remaining_time = max(0.0, remaining_time - reserve());
         double D = max(1.0, (remaining_edges - remaining_boxes) / 2.0); 
         double base = remaining_time / D;
         double progress = 1.0 - D / D0;
@@ -21,8 +26,27 @@ struct TimeManager {
         double t_move = base * factor;
         double min_time = 0.001;
         double max_frac = 0.9;  
-        if (t_move < min_time) t_move = min_time;
         if (t_move > remaining_time * max_frac) t_move = remaining_time * max_frac;
+        if (t_move < min_time) t_move = min_time;   // even with only the reserve left, one iteration to answer with
         return t_move;
     }
+
+    // Hard stop for a move planned at t_move: the search may run past the plan while the best move
+    // keeps changing, up to twice the plan and never into the time kept for later moves.
+    double get_hard_limit(double remaining_time, double t_move) {
+        remaining_time = max(0.0, remaining_time - reserve());
+        return max(t_move, min(2.0 * t_move, remaining_time * 0.9));
+    }
+
+    // Checked after every completed iteration. A settled best move stops at half the plan and banks the
+    // rest in remaining_time for later moves; a move that just changed may use 1.5x. An iteration the
+    // node rate says cannot finish before the hard stop is not started.
+    bool keep_searching(double elapsed, double t_move, double hard_limit, int stable_iters,
+                        long long iter_nodes, long long prev_iter_nodes, double nodes_per_sec) {
+        double growth = prev_iter_nodes > 0 ? min(16.0, max(1.0, double(iter_nodes) / prev_iter_nodes)) : 4.0;
+        double next_iter = nodes_per_sec > 0 ? iter_nodes * growth / nodes_per_sec : 0.0;
+        if (elapsed + next_iter > hard_limit) return false;
+        double scale = stable_iters >= 3 ? 0.5 : (stable_iters == 0 ? 1.5 : 1.0);
+        return elapsed < t_move * scale;
+    }
 };
\ No newline at end of file
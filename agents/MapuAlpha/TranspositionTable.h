@@ -0,0 +1,73 @@
+#include "common.h"
+#include <atomic>
+#include <memory>
+
+enum : uint8_t { TT_EXACT = 0, TT_LOWER = 1, TT_UPPER = 2, TT_BOUND = 3, TT_SOLVED = 4 };   // TT_SOLVED: no depth cutoff below, the value holds at any depth
+
+struct TTData {
+    int16_t value;    // minimax value minus the score of the stored node
+    uint8_t depth;
+    uint8_t flag;     // bound | TT_SOLVED
+    int16_t bestTag;  // getChildren() tag of the best child, only valid for the same symmetry
+    int8_t sym;
+    uint8_t age;
+};
+static_assert(sizeof(TTData) == sizeof(uint64_t), "TTData must pack into one word");
+
+// Lock-free entry shared by all search threads: check holds key ^ data, so a torn write
+// from two racing stores fails the key test on probe instead of returning a mixed entry.
+struct TTEntry {
+    atomic<uint64_t> check{0}, data{0};
+
+    bool load(uint64_t key, TTData &out) const {
+        uint64_t d = data.load(memory_order_relaxed);
+        if ((check.load(memory_order_relaxed) ^ d) != key) return false;
+        memcpy(&out, &d, sizeof(d));
+        return out.depth > 0;
+    }
+    void save(uint64_t key, const TTData &in) {
+        uint64_t d;
+        memcpy(&d, &in, sizeof(d));
+        check.store(key ^ d, memory_order_relaxed);
+        data.store(d, memory_order_relaxed);
+    }
+};
+
+// Two entries per bucket: slot 0 keeps the deepest (or current-search) result, slot 1 is always replaced.
+struct TranspositionTable {
+    struct Bucket { TTEntry deep, recent; };
+    unique_ptr<Bucket[]> buckets;
+    uint64_t mask = 0;
+    uint8_t age = 0;
+
+    explicit TranspositionTable(size_t megabytes) { resize(megabytes); }
+
+    void resize(size_t megabytes) {
+        size_t n = 1;
+        while ((n << 1) * sizeof(Bucket) <= (megabytes << 20)) n <<= 1;
+        buckets.reset(new Bucket[n]);
+        mask = n - 1;
+    }
+    void clear() {
+        for (uint64_t i = 0; i <= mask; i++) for (TTEntry *en : {&buckets[i].deep, &buckets[i].recent}) {
+            en->check.store(0, memory_order_relaxed);
+            en->data.store(0, memory_order_relaxed);
+        }
+        age = 0;
+    }
+    void newSearch() { age++; }
+
+    bool probe(uint64_t key, TTData &out) const {
+        const Bucket &b = buckets[key & mask];
+        return b.deep.load(key, out) || b.recent.load(key, out);
+    }
+    void store(uint64_t key, int value, int depth, uint8_t flag, int bestTag, int sym) {
+        Bucket &b = buckets[key & mask];
+        TTData en{int16_t(value), uint8_t(depth), flag, int16_t(bestTag), int8_t(sym), age};
+        uint64_t d = b.deep.data.load(memory_order_relaxed);
+        TTData deep;
+        memcpy(&deep, &d, sizeof(d));
+        if ((b.deep.check.load(memory_order_relaxed) ^ d) == key || deep.age != age || depth >= deep.depth) b.deep.save(key, en);
+        else b.recent.save(key, en);
+    }
+};
@@ -0,0 +1,206 @@
+import os, sys
+import importlib
+import re
+import argparse
+import json
+import random
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(BASE_DIR))
+for path in (BASE_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# this directory's build, named after the directory as setup.py names it
+MapuAlpha = importlib.import_module(re.sub(r"\W", "_", os.path.basename(BASE_DIR)))
+from build_book import move_to_bit
+from utils_coord import BoardState, EDGE_BOX_MASKS, NUM_EDGES
+
+PHASES = ("opening", "middle", "endgame")
+
+def is_safe(board, move):
+    # does not draw the third side of any box
+    edges = board.edges | (1 << move)
+    return all(bin(edges & mask).count("1") < 3 for _, mask in EDGE_BOX_MASKS[move])
+
+def random_position(phase, rng):
+    # safe random lines; the endgame stops when every remaining line hands over boxes (loony endgame)
+    board = BoardState()
+    target = {"opening": rng.randint(4, 10), "middle": rng.randint(14, 24), "endgame": NUM_EDGES}[phase]
+    for _ in range(target):
+        safe = [m for m in sorted(board.legal_moves) if is_safe(board, m)]
+        if not safe:
+            break
+        board.apply_move(rng.choice(safe), 0)
+    return board.code
+
+def build_corpus(per_phase, ref_time_ms, seed):
+    rng = random.Random(seed)
+    positions = []
+    seen = set()
+    for phase in PHASES:
+        count = 0
+        while count < per_phase:
+            code = random_position(phase, rng)
+            canon = MapuAlpha.canonical_code(code)[0]
+            if canon in seen:
+                continue
+            seen.add(canon)
+            info = MapuAlpha.search_stats(code, time_ms=ref_time_ms, threads=os.cpu_count() or 1)
+            if not is_legal(code, info["best_move"]):
+                raise RuntimeError(f"reference search of {code:#x} returned the drawn line {info['best_move']}")
+            positions.append({"phase": phase, "code": code, "move": list(info["best_move"]),
+                              "value": info["value"], "exact": info["finished"]})
+            print(f"{phase:8s} {code:#017x} value {info['value']:+d} depth {info['depth']}"
+                  f"{' exact' if info['finished'] else ''}")
+            count += 1
+    return {"seed": seed, "ref_time_ms": ref_time_ms, "positions": positions}
+
+def is_legal(code, move):
+    return not code >> move_to_bit(move) & 1
+
+def same_move(code, a, b):
+    # moves are equal up to the symmetries of the position
+    return (MapuAlpha.canonical_code(code | 1 << move_to_bit(a))[0] ==
+            MapuAlpha.canonical_code(code | 1 << move_to_bit(b))[0])
+
+def run_bench(corpus, depth, time_ms, seed):
+    results = []
+    for pos in corpus["positions"]:
+        code = pos["code"]
+        MapuAlpha.set_seed(seed)
+        fixed_depth = MapuAlpha.search_stats(code, depth=depth)
+        MapuAlpha.set_seed(seed)
+        fixed_time = MapuAlpha.search_stats(code, time_ms=time_ms)
+        value_agrees = None
+        if pos["exact"]:
+            # a depth-limited value is only as good as its horizon: an exact reference is checked against
+            # a search run to the end of the game, which a correct engine always agrees with
+            MapuAlpha.set_seed(seed)
+            solved = MapuAlpha.search_stats(code, depth=MapuAlpha.NUM_BIT)
+            value_agrees = solved["finished"] and solved["value"] == pos["value"]
+        results.append({
+            "phase": pos["phase"],
+            "code": code,
+            "nodes": fixed_depth["nodes"],
+            "time_to_depth_ms": fixed_depth["used_ms"],
+            "depth_at_time": fixed_time["depth"],
+            "legal": is_legal(code, fixed_depth["best_move"]) and is_legal(code, fixed_time["best_move"]),
+            # agreement is taken from searches without a clock so it does not depend on machine speed
+            "move_agrees": same_move(code, fixed_depth["best_move"], pos["move"]),
+            "value_agrees": value_agrees,
+        })
+    return results
+
+def summarize(results):
+    nodes = sum(r["nodes"] for r in results)
+    time_ms = sum(r["time_to_depth_ms"] for r in results)
+    exact = [r for r in results if r["value_agrees"] is not None]
+    summary = {
+        "nodes": nodes,
+        "nodes_per_sec": nodes / time_ms * 1000 if time_ms else 0.0,
+        "time_to_depth_ms": time_ms,
+        "avg_depth_at_time": sum(r["depth_at_time"] for r in results) / len(results),
+        "move_agreement": sum(r["move_agrees"] for r in results) / len(results),
+        "value_agreement": sum(r["value_agrees"] for r in exact) / len(exact) if exact else 1.0,
+        "illegal_moves": sum(not r.get("legal", True) for r in results),
+    }
+    for phase in PHASES:
+        rows = [r for r in results if r["phase"] == phase]
+        if rows:
+            summary[f"{phase}_time_to_depth_ms"] = sum(r["time_to_depth_ms"] for r in rows) / len(rows)
+            summary[f"{phase}_depth_at_time"] = sum(r["depth_at_time"] for r in rows) / len(rows)
+    return summary
+
+# Only metrics that do not depend on the machine can fail a run: the node count at fixed depth and the
+# agreement with the reference moves and values. Speed and depth at fixed time are printed for information.
+HIGHER_IS_BETTER = ("move_agreement", "value_agreement")
+LOWER_IS_BETTER = ("nodes", "illegal_moves")
+
+def compare(summary, results, baseline, tolerance):
+    regressions = []
+    base = baseline["summary"]
+    for key, value in summary.items():
+        if key not in base:
+            continue
+        old = base[key]
+        delta = (value - old) / old * 100 if old else 0.0
+        flag = ""
+        if ((key in HIGHER_IS_BETTER and value < old * (1 - tolerance)) or
+                (key in LOWER_IS_BETTER and value > old * (1 + tolerance))):
+            flag = "  <-- regression"
+            regressions.append(key)
+        elif key not in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            flag = "  (machine dependent)"
+        print(f"{key:28s} {old:14.3f} {value:14.3f} {delta:+8.2f}%{flag}")
+
+    # a search that answers with a drawn line is broken whatever the baseline says
+    if summary["illegal_moves"] and "illegal_moves" not in regressions:
+        print(f"illegal_moves {summary['illegal_moves']:>21d}  <-- regression")
+        regressions.append("illegal_moves")
+
+    # node counts are deterministic, so any change means the search tree itself changed
+    old_nodes = {r["code"]: r["nodes"] for r in baseline["results"]}
+    changed = [r for r in results if r["code"] in old_nodes and r["nodes"] != old_nodes[r["code"]]]
+    if changed:
+        print(f"search tree changed on {len(changed)}/{len(results)} positions "
+              f"(nodes {base['nodes']} -> {summary['nodes']})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducible MapuAlpha search benchmark")
+    parser.add_argument("--corpus", default=os.path.join(BASE_DIR, "bench_positions.json"),
+                        help="position corpus (default: bench_positions.json next to the agent)")
+    parser.add_argument("--baseline", default=os.path.join(BASE_DIR, "bench_baseline.json"),
+                        help="baseline results to compare against (default: bench_baseline.json)")
+    parser.add_argument("--build-corpus", action="store_true",
+                        help="generate a new corpus with reference moves and values, then exit")
+    parser.add_argument("--per-phase", type=int, default=8,
+                        help="corpus positions per phase (default: 8)")
+    parser.add_argument("--ref-time-ms", type=float, default=5000,
+                        help="search time for the reference move and value (default: 5000)")
+    parser.add_argument("--depth", type=int, default=8,
+                        help="depth for nodes/sec, time-to-depth and agreement (default: 8)")
+    parser.add_argument("--time-ms", type=float, default=100,
+                        help="search time for the depth reached at fixed time (default: 100)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="root move order seed (default: 0)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="relative change of a deterministic metric counted as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    if args.build_corpus:
+        corpus = build_corpus(args.per_phase, args.ref_time_ms, args.seed)
+        with open(args.corpus, "w") as f:
+            json.dump(corpus, f, indent=1)
+        print(f"{len(corpus['positions'])} positions written to {args.corpus}")
+        return
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    results = run_bench(corpus, args.depth, args.time_ms, args.seed)
+    summary = summarize(results)
+    settings = {"depth": args.depth, "time_ms": args.time_ms, "seed": args.seed}
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "summary": summary, "results": results}, f, indent=1)
+        print(f"baseline written to {args.baseline}")
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        for key, value in summary.items():
+            print(f"{key:28s} {value:14.3f}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["settings"] != settings:
+        print(f"warning: baseline was run with {baseline['settings']}")
+    print(f"{'':28s} {'baseline':>14s} {'current':>14s}")
+    if compare(summary, results, baseline, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os, sys
+import importlib
+import re
+import argparse
+import struct
+from array import array
+from tqdm import tqdm
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# this directory's build, named after the directory as setup.py names it; other board sizes are
+# separate builds with the size appended (see setup.py)
+BUILD_NAME = re.sub(r"\W", "_", os.path.basename(BASE_DIR))
+MapuAlpha = importlib.import_module(BUILD_NAME)
+
+BOOK_VERSION = 1
+
+def load_build(xsize, ysize):
+    # the build of that board size; its compiled-in size must be the one asked for, or the book
+    # would hold codes and moves of another board
+    build = MapuAlpha if (xsize, ysize) == (5, 5) else importlib.import_module(f"{BUILD_NAME}_{xsize}x{ysize}")
+    if (build.BOX_X, build.BOX_Y) != (xsize, ysize):
+        raise ValueError(f"{build.__name__} is built for {build.BOX_X}x{build.BOX_Y} boxes, not {xsize}x{ysize}")
+    return build
+
+def book_path(xsize, ysize):
+    name = "book.bin" if (xsize, ysize) == (5, 5) else f"book_{xsize}x{ysize}.bin"
+    return os.path.join(BASE_DIR, name)
+
+def move_to_bit(move, build=MapuAlpha):
+    # encode_board_lines bit of [x, y, z]: vertical lines row by row, then horizontal ones
+    x, y, z = move
+    return y * (build.BOX_X + 1) + x if z == 1 else (build.BOX_X + 1) * build.BOX_Y + y * build.BOX_X + x
+
+def canonical_positions(max_moves, build=MapuAlpha):
+    # Every position with up to max_moves lines, one representative per symmetry class.
+    level = {0}
+    positions = [0]
+    for _ in range(max_moves):
+        nxt = set()
+        for code in level:
+            for bit in range(build.NUM_BIT):
+                if not code >> bit & 1:
+                    nxt.add(build.canonical_code(code | (1 << bit))[0])
+        level = nxt
+        positions.extend(sorted(level))
+    return positions
+
+def write_book(path, entries, build=MapuAlpha):
+    entries.sort()
+    words = build.CODE_WORDS
+    with open(path + ".tmp", "wb") as f:
+        f.write(struct.pack("<4sIQ", b"MABK", BOOK_VERSION, len(entries)))
+        f.write(array("Q", [code >> (64 * w) & 0xFFFFFFFFFFFFFFFF for code, _, _ in entries for w in range(words)]).tobytes())
+        f.write(bytes(bit for _, bit, _ in entries))
+        f.write(array("b", [value for _, _, value in entries]).tobytes())
+    os.replace(path + ".tmp", path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the MapuAlpha opening book")
+    parser.add_argument("--max-moves", type=int, default=3,
+                        help="book every position with up to this many lines (default: 3)")
+    parser.add_argument("--time-ms", type=float, default=2000,
+                        help="search time per position in ms (default: 2000)")
+    parser.add_argument("--xsize", type=int, default=5,
+                        help="board width in boxes, needs the build of that size (default: 5)")
+    parser.add_argument("--ysize", type=int, default=5,
+                        help="board height in boxes (default: 5)")
+    parser.add_argument("--out", default=None,
+                        help="output file (default: book.bin next to the agent, book_<x>x<y>.bin for other sizes)")
+    args = parser.parse_args()
+
+    try:
+        build = load_build(args.xsize, args.ysize)
+    except (ImportError, ValueError) as e:
+        parser.error(str(e))
+    out = args.out or book_path(args.xsize, args.ysize)
+
+    positions = canonical_positions(args.max_moves, build)
+    entries = []
+    for code in tqdm(positions, desc="book"):
+        move, value = build.analyze(code, args.time_ms)
+        entries.append((code, move_to_bit(move, build), value))
+    write_book(out, entries, build)
+    print(f"{len(entries)} positions written to {out}")
+
+if __name__ == "__main__":
+    main()
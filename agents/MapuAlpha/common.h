@@ -13,46 +13,158 @@
 #include <cstring>
 #include <numeric>
 #include <iostream>
+#include <atomic>
+#include <limits>
+#include <type_traits>
 
-static constexpr int BOX_X = 5;
-static constexpr int BOX_Y = 5;
+// Board size is fixed per build (setup.py passes -DMAPUALPHA_BOX_X/Y for other leagues), so every
+// loop bound and table size below stays a compile-time constant.
+#ifndef MAPUALPHA_BOX_X
+#define MAPUALPHA_BOX_X 5
+#endif
+#ifndef MAPUALPHA_BOX_Y
+#define MAPUALPHA_BOX_Y 5
+#endif
+#ifndef MAPUALPHA_MODULE
+#define MAPUALPHA_MODULE MapuAlpha
+#endif
+
+static constexpr int BOX_X = MAPUALPHA_BOX_X;
+static constexpr int BOX_Y = MAPUALPHA_BOX_Y;
 static constexpr int DOT_X = BOX_X + 1;
 static constexpr int DOT_Y = BOX_Y + 1;
 static constexpr int NUM_EDGE = BOX_X * BOX_Y * 4;
-static constexpr int MAX_CHAINS = 9; 
+static constexpr int NUM_BIT = DOT_X * BOX_Y + BOX_X * DOT_Y; // lines on the board = bits of encode_board_lines
+static constexpr int VERTICAL_BITS = DOT_X * BOX_Y;           // vertical lines come first in the code
+static constexpr int MAX_CHAINS = BOX_X * BOX_Y / 3 + 1; 
 static constexpr int DEADEND = -1;
 static constexpr int REMOVED = -2;
-static constexpr int NO_DOUBLE_DEAL = 101;
-static constexpr int DOUBLE_DEAL = 102;
+static constexpr int NO_DOUBLE_DEAL = NUM_EDGE + 1;
+static constexpr int DOUBLE_DEAL = NUM_EDGE + 2;
 static constexpr int OPEN_CHAIN = 3;   
 static constexpr int PRUNING = 20;
+static constexpr int TT_DEFAULT_MB = 64;
+static constexpr int TT_MIN_DEPTH = 2;   // nodes closer to the horizon are cheaper to search than to hash
+static constexpr int TT_SYM_DEPTH = 3;   // from here up, keys are symmetry-canonical (8 hashes per probe)
+static constexpr double PONDER_GUESS_MS = 50; // search for the opponent's likely reply before pondering on it
+static constexpr double DEFAULT_TIME_LIMIT_MS = 24000; // game clock of one player
 using namespace std;
-using BoardLines = array<array<array<int8_t, 2>, 6>, 6>;   // input of run()
+// Smallest integer widths that fit the board: 5x5 keeps int8_t edges, 6x6 and up need int16_t.
+using Edge = conditional_t<DOUBLE_DEAL <= INT8_MAX, int8_t, int16_t>;  // edge index or getChildren tag
+using Bit = conditional_t<NUM_BIT <= INT8_MAX, int8_t, int16_t>;       // encode_board_lines bit
+using Score = conditional_t<BOX_X * BOX_Y < INT8_MAX, int8_t, int16_t>;
+static constexpr int SCORE_INF = numeric_limits<Score>::max();
+static_assert(BOX_X * BOX_Y < INT8_MAX, "box counts are stored in int8_t");
+using BoardLines = array<array<array<int8_t, 2>, DOT_Y>, DOT_X>;   // input of run()
 using XYZ = array<int8_t, 3>;
 using pii = pair<int,int>;
 using Clock = chrono::steady_clock;
 
+// Edge set in encode_board_lines order for boards with more than 64 lines; words are little-endian.
+struct WideCode {
+    static constexpr int WORDS = (NUM_BIT + 63) / 64;
+    uint64_t w[WORDS];
+
+    bool operator<(const WideCode &o) const {
+        for (int i = WORDS - 1; i >= 0; i--) if (w[i] != o.w[i]) return w[i] < o.w[i];
+        return false;
+    }
+    bool operator==(const WideCode &o) const { return memcmp(w, o.w, sizeof(w)) == 0; }
+    bool operator!=(const WideCode &o) const { return !(*this == o); }
+    WideCode &operator|=(const WideCode &o) {
+        for (int i = 0; i < WORDS; i++) w[i] |= o.w[i];
+        return *this;
+    }
+};
+using Code = conditional_t<NUM_BIT <= 64, uint64_t, WideCode>;
+static constexpr int CODE_WORDS = sizeof(Code) / sizeof(uint64_t);
+
+inline bool code_test(uint64_t c, int b) { return c >> b & 1; }
+inline void code_set(uint64_t &c, int b) { c |= 1ULL << b; }
+inline int code_count(uint64_t c) { return __builtin_popcountll(c); }
+inline unsigned code_nibble(uint64_t c, int i) { return c >> (4 * i) & 0xF; }
+inline bool code_test(const WideCode &c, int b) { return c.w[b >> 6] >> (b & 63) & 1; }
+inline void code_set(WideCode &c, int b) { c.w[b >> 6] |= 1ULL << (b & 63); }
+inline int code_count(const WideCode &c) {
+    int n = 0;
+    for (uint64_t x : c.w) n += __builtin_popcountll(x);
+    return n;
+}
+inline unsigned code_nibble(const WideCode &c, int i) { return c.w[i >> 4] >> (4 * (i & 15)) & 0xF; }
+
+struct TranspositionTable;
+
+// Clock, budget and stop flag of one search, shared by all threads working on it.
+struct SearchContext {
+    TranspositionTable *tt = nullptr;  // owned by the engine running the search
+    const Edge *order = nullptr;       // its shuffled root move order, NUM_EDGE edges
+    Clock::time_point startTime;
+    double timeLimitMs = 0;      // hard stop, raises timeUp
+    double plannedMs = 0;        // time allocator budget checked between iterations, 0 = run until timeUp
+    long long nodeLimit = 0;     // per thread, 0 = unlimited
+    int maxDepth = NUM_BIT;      // last iterative-deepening depth
+    int threads = 1;             // Lazy SMP threads, 1 = no helpers
+    int scoreDiff = 0;           // boxes the side to move at the root leads by, taken before the root
+    atomic<bool> timeUp{false};  // Is time over
+    // Statistics, summed over all threads once they stop
+    atomic<long long> nodes{0}, expanded{0}, cutoffs{0};
+    double usedMs = 0;
+    atomic<int> depth{0};        // last fully searched iterative-deepening depth
+    atomic<long long> liveNodes{0};  // running node count in steps of 1024, readable during the search
+    int rootMoves = 0;           // root children after simplification, 0 for forced and book moves
+    int startDepth = 0;          // first iterative-deepening depth, above 3 when the TT warm-started the root
+    bool mcts = false;           // move came from the Monte Carlo search; nodes are then playouts, depth the tree depth
+    bool finished = false;       // search ended on its own rather than on timeUp
+    bool bookHit = false;
+    bool ponderHit = false;      // move came from the search started on the opponent's time
+
+    void start(double limitMs, long long nodeBudget = 0, int depthLimit = NUM_BIT) {
+        startTime = Clock::now();
+        timeLimitMs = limitMs;
+        plannedMs = 0;
+        nodeLimit = nodeBudget;
+        maxDepth = depthLimit;
+        timeUp = false;
+        nodes = expanded = cutoffs = liveNodes = 0;
+        usedMs = 0;
+        depth = rootMoves = startDepth = 0;
+        finished = bookHit = ponderHit = mcts = false;
+    }
+};
+
 extern XYZ eToXYZ[NUM_EDGE];
-extern Clock::time_point c_startTime;
-extern double g_timeLimitMs; // time limit of 24 seconds
-extern double g_timeLeft;
-extern double c_timeLimitMs;
-extern bool g_timeUp;      
-extern int prev_move_count; // To know if new game has started
-extern long long g_nodes; 
-extern array<int8_t, NUM_EDGE> order;
-
-inline uint64_t encode_board_lines(const BoardLines &board) {
-    uint64_t code = 0ULL;
-    for (int x = 0; x < DOT_X; ++x) for (int y = 0; y < BOX_X; ++y) if (board[x][y][1]) code |= (1ULL << (y * 6 + x));
-    for (int x = 0; x < BOX_X; ++x) for (int y = 0; y < DOT_Y; ++y) if (board[x][y][0]) code |= (1ULL << (30 + y * 5 + x));
+extern thread_local SearchContext *g_search; // search the current thread works for
+extern thread_local long long g_nodes; 
+extern thread_local long long g_expanded, g_cutoffs; // nodes whose children were generated, beta cutoffs among them
+extern thread_local bool g_horizon; // a leaf was cut off by depth, so the value is not proven
+extern uint64_t zobristOpp[NUM_EDGE][NUM_EDGE + 1];
+extern uint64_t zobristNext[NUM_EDGE][NUM_EDGE];
+extern uint64_t zobristLen[NUM_EDGE][BOX_X * BOX_Y + 1];
+extern uint64_t zobristComp[2 * BOX_X * BOX_Y + 1];
+extern uint64_t zobristDoubleDeal[8];
+extern uint64_t zobristBoxes[BOX_X * BOX_Y + 1];
+
+inline Code encode_board_lines(const BoardLines &board) {
+    Code code{};
+    for (int x = 0; x < DOT_X; ++x) for (int y = 0; y < BOX_Y; ++y) if (board[x][y][1]) code_set(code, y * DOT_X + x);
+    for (int x = 0; x < BOX_X; ++x) for (int y = 0; y < DOT_Y; ++y) if (board[x][y][0]) code_set(code, VERTICAL_BITS + y * BOX_X + x);
     return code;
 }
 
 inline bool check_time() {
-    auto elapsedMs = chrono::duration_cast<chrono::milliseconds>(Clock::now() - c_startTime).count();
-    if (elapsedMs >= c_timeLimitMs) g_timeUp = true;
-    return g_timeUp;
+    SearchContext &sc = *g_search;
+    sc.liveNodes += 0x400;
+    auto elapsedMs = chrono::duration_cast<chrono::milliseconds>(Clock::now() - sc.startTime).count();
+    if (elapsedMs >= sc.timeLimitMs || (sc.nodeLimit && g_nodes >= sc.nodeLimit)) sc.timeUp = true;
+    return sc.timeUp;
+}
+
+// Adds the calling thread's counters to its search and resets them.
+inline void flush_stats() {
+    g_search->nodes += g_nodes;
+    g_search->expanded += g_expanded;
+    g_search->cutoffs += g_cutoffs;
+    g_nodes = g_expanded = g_cutoffs = 0;
 }
 
 #endif 
\ No newline at end of file
@@ -3,123 +3,783 @@
 
 #include "common.h" // macros
 #include "TimeManager.h"
+#include "TranspositionTable.h"
 #include "DotsAndBoxesState.h"
+#include "OpeningBook.h"
+#include "Mcts.h"
+#include <thread>
+#include <optional>
+#include <pybind11/numpy.h>
 namespace py = pybind11;
 using namespace std;
 
-TimeManager timeManager(g_timeLimitMs / 1000.0, BOX_X *DOT_Y + BOX_Y * DOT_X, BOX_X *BOX_Y);
-
-int8_t minimax(const DotsAndBoxesState &gs, int depth, int alpha, int beta) {
-    if (g_timeUp || (!(++g_nodes & 0x7FFF) && check_time())) return 0;
-    if (!depth || !gs.remainingBoxes) return gs.doubleDealState ? int8_t(gs.score + (gs.remainingBoxes + (gs.remainingBoxes & 1)) / 2) : gs.score;
-    static thread_local vector<DotsAndBoxesState> childBuf[64];
-    vector<DotsAndBoxesState> &children = childBuf[depth];
-    children.clear();
-    gs.getChildren(children, nullptr);
-    int val = -127;
-    for (DotsAndBoxesState &child : children) {
-        int v = (gs.turn == child.turn) ? minimax(child, depth - 1, alpha, beta) : -minimax(child, depth - 1, -beta, -alpha);
-        val = max(val, v);
-        if (val >= beta) return val;
+// Boards with more than 64 lines pass their edge codes to and from Python as plain ints.
+namespace pybind11 { namespace detail {
+template <> struct type_caster<WideCode> {
+    PYBIND11_TYPE_CASTER(WideCode, _("int"));
+    bool load(handle src, bool) {
+        if (!PyLong_Check(src.ptr())) return false;
+        object v = reinterpret_borrow<object>(src);
+        for (int i = 0; i < WideCode::WORDS; i++) {
+            value.w[i] = PyLong_AsUnsignedLongLongMask(v.ptr());
+            v = v.attr("__rshift__")(64);
+        }
+        return !PyErr_Occurred();
+    }
+    static handle cast(const WideCode &c, return_value_policy, handle) {
+        object v = int_(0);
+        for (int i = WideCode::WORDS - 1; i >= 0; i--) v = v.attr("__lshift__")(64).attr("__or__")(int_(c.w[i]));
+        return v.release();
+    }
+};
+}}
+
+OpeningBook book;                            // read-only once loaded, shared by every engine
+thread_local MoveOrdering *g_ordering = nullptr; // killers and history of the search running on this thread
+thread_local UndoStack undoStack;   // minimax plays and takes back moves on one state per thread
+
+// gs is walked in place with make/unmake and comes back unchanged.
+Score minimax(DotsAndBoxesState &gs, int depth, int alpha, int beta, int ply = 1) {
+    if (g_search->timeUp || (!(++g_nodes & 0x3FF) && check_time())) return 0;
+    TranspositionTable &tt = *g_search->tt;
+    MoveOrdering &ordering = *g_ordering;
+    if (gs.componentsOnly()) return Score(gs.score + gs.solveEndgame());   // exact at any depth, no horizon
+    if (depth == 0 && gs.remainingBoxes > 0) g_horizon = true;
+    if (!depth || !gs.remainingBoxes) return gs.doubleDealState ? Score(gs.score + (gs.remainingBoxes + (gs.remainingBoxes & 1)) / 2) : gs.score;
+    uint64_t key = 0;
+    int sym = 0;
+    Edge hint = REMOVED;
+    TTData en;
+    if (depth >= TT_MIN_DEPTH && gs.remainingBoxes > 0) {  // impossible states (see below) are not hashed
+        key = (depth >= TT_SYM_DEPTH) ? gs.canonicalHash(&sym) : gs.hash();
+        if (tt.probe(key, en)) {
+            int v = en.value + gs.score;
+            int bound = en.flag & TT_BOUND;
+            bool proven = en.flag & TT_SOLVED;
+            if ((en.depth >= depth || proven) && (bound == TT_EXACT || (bound == TT_LOWER ? v >= beta : v <= alpha))) {
+                g_horizon |= !proven;
+                return v;
+            }
+            if (en.sym == sym) hint = Edge(en.bestTag);
+        }
+    }
+    Edge tags[PRUNING + 2];
+    int n = gs.getMoves(tags, &ordering, ply, hint);   // children are played one at a time: a cutoff skips the rest
+    g_expanded++;
+    int alphaOrig = alpha, val = -SCORE_INF, best = -1;
+    bool outerHorizon = g_horizon;
+    g_horizon = false;
+    for (int i = 0; i < n; i++) {
+        int8_t turn = gs.turn;
+        Undo undo = gs.make(tags[i], undoStack);
+        int v = (turn == gs.turn) ? minimax(gs, depth - 1, alpha, beta, ply + 1) : -minimax(gs, depth - 1, -beta, -alpha, ply + 1);
+        gs.unmake(undo, undoStack);
+        if (v > val) {val = v; best = i;}
+        if (val >= beta) {
+            g_cutoffs++;
+            ordering.cutoff(tags[i], gs.orderSlot(tags[i]), ply, depth);
+            break;
+        }
         alpha = max(alpha, val);
     }
+    bool solved = !g_horizon;
+    g_horizon |= outerHorizon;
+    // Branches through impossible states (remainingBoxes < 0) come back as +-SCORE_INF sentinels;
+    // they are never chosen and must not reach the TT.
+    if (key && best >= 0 && !g_search->timeUp && abs(val) <= BOX_X * BOX_Y) tt.store(key, val - gs.score, depth, (val <= alphaOrig ? TT_UPPER : (val >= beta ? TT_LOWER : TT_EXACT)) | (solved ? TT_SOLVED : 0), tags[best], sym);
     return val;
 }
 
-XYZ choose_move(DotsAndBoxesState &gs) {
-    DotsAndBoxesState original = gs; // Deep copy
-    int8_t componentToEdge[MAX_CHAINS];
-    int8_t discovered = 0;
-    for (int8_t e = 0; e < NUM_EDGE; e++) {
-        if (gs.opp[e] == REMOVED) continue;
-        int8_t prev = gs.componentsCount;
-        gs.simplify(e);
-        if (gs.componentsCount != prev) componentToEdge[discovered++] = e;
-    }
-    int8_t doubleDealingEdge = DEADEND;
-    int8_t loops[MAX_CHAINS];
-    int8_t chains[MAX_CHAINS];
-    int8_t loopsCount = 0;
-    int8_t chainsCount = 0;
-    for (int8_t e = 0; e < NUM_EDGE; e++) {
-        int8_t oe = gs.opp[e];
-        if (oe == REMOVED || gs.next[e] != e) continue;
-        if (oe != DEADEND && gs.next[oe] == oe) {
-            if (gs.simplifiedBoxCount[e] != 2) return eToXYZ[e];
-            loops[loopsCount++] = e; 
-        } else {
-            if (gs.simplifiedBoxCount[e] != 1) return eToXYZ[e];
-            chains[chainsCount++] = e; 
+// Lazy SMP helper: searches the same root children as the main thread, at an offset depth and
+// starting from a different root move, only to fill the shared TT. Stops when the search's timeUp is raised.
+void helper_search(SearchContext *search, const vector<DotsAndBoxesState> *children, int id) {
+    MoveOrdering ordering;
+    g_search = search;
+    g_ordering = &ordering;
+    g_nodes = 0;
+    int n = (int)children->size();
+    for (int depth = 3 + (id & 1); depth < search->maxDepth; depth++) {
+        for (int k = 0; k < n; k++) {
+            DotsAndBoxesState child = (*children)[(k + id) % n];   // the root children are shared with the main thread
+            minimax(child, depth - 1, -SCORE_INF, SCORE_INF);
+            if (search->timeUp) break;
         }
-        doubleDealingEdge = e; 
-    }
-    if (chainsCount && loopsCount) return eToXYZ[loops[0]];
-    if (chainsCount > 1) return eToXYZ[chains[0]];
-    if (loopsCount > 2) return eToXYZ[loops[0]];
-    if (chainsCount == 1) gs.doubleDealState = 2;
-    if (loopsCount == 2) gs.doubleDealState = 4;
-    gs.removeAndSimplify(doubleDealingEdge);
-    vector<int8_t> eList;
-    vector<DotsAndBoxesState> children;
-    gs.getChildren(children, &eList);
-    size_t chSize = children.size();
-    vector<pii> scores;
-    scores.reserve(chSize);
-    for (int i = 0; i < (int)chSize; i++) scores.emplace_back(i, 0);
-    XYZ bestMove = {0, 0, 0};
-    int depth = 2;
-    while (depth++ < 60) {
-        for (auto &[idx, val] : scores) {
-            DotsAndBoxesState &child = children[idx];
-            val = child.turn * minimax(child, depth - 1, -127, 127);
-            if (g_timeUp) return bestMove;
-        }
-        sort(scores.begin(), scores.end(), [](const auto &A, const auto &B){ return A.second > B.second; }); // Move ordering
-        int8_t e = eList[scores[0].first];
-        if (e == NO_DOUBLE_DEAL) bestMove = eToXYZ[doubleDealingEdge];
-        else if (e == DOUBLE_DEAL) bestMove = eToXYZ[original.next[original.opp[doubleDealingEdge]]];
-        else if (e <= -OPEN_CHAIN) {
-            int8_t componentNumber = - e - OPEN_CHAIN;
-            int8_t componentEdge = componentToEdge[componentNumber];
-            if (gs.components[componentNumber] == -2 && original.opp[componentEdge] == DEADEND) bestMove = eToXYZ[original.next[componentEdge]];
-            else bestMove = eToXYZ[componentEdge];
-        } else if (gs.simplifiedBoxCount[e] == 2) bestMove = eToXYZ[original.next[original.opp[e]]];
-        else bestMove = eToXYZ[e];
-    }
-    return bestMove;
+        if (search->timeUp) break;
+    }
+    flush_stats();
 }
 
-XYZ choose_move_wrapper(const BoardLines &board) {
-    c_startTime = Clock::now();
-    g_timeUp = false; // Is time over
-    g_nodes = 0;      // How many nodes has been explored
-    uint64_t code = encode_board_lines(board);
-    int move_count = __builtin_popcountll(code);
-    static thread_local mt19937 rng(random_device{}()); // Randomize order of node exploration
-    if (prev_move_count > move_count) {
-        g_timeLeft = g_timeLimitMs;                         // Reset timer
+struct HelperThreads {
+    SearchContext *search = g_search;
+    vector<thread> threads;
+    HelperThreads(const vector<DotsAndBoxesState> &children) {
+        for (int id = 1; id < search->threads && !children.empty(); id++) threads.emplace_back(helper_search, search, &children, id);
+    }
+    ~HelperThreads() {
+        search->timeUp = true;
+        for (thread &t : threads) t.join();
+    }
+};
+
+
+// Points the calling thread at a search and its killers/history until the scope ends.
+struct ActiveSearch {
+    SearchContext *outerSearch = g_search;
+    MoveOrdering *outerOrdering = g_ordering;
+    ActiveSearch(SearchContext &search, MoveOrdering &ordering) {
+        g_search = &search;
+        g_ordering = &ordering;
+    }
+    ~ActiveSearch() {
+        g_search = outerSearch;
+        g_ordering = outerOrdering;
+    }
+};
+
+struct Engine;
+
+// Pondering: after choose_move_code answers, a background thread predicts the opponent's reply with a
+// short search, then searches the position we expect to face next until the next call stops it.
+// Its search is separate from the engine's game search, and everything it learns stays in the engine's TT.
+struct Ponder {
+    Engine &engine;
+    bool enabled = false;
+    thread worker;
+    SearchContext guess, search;   // reply prediction, then the ponder search itself
+    atomic<bool> ready{false};     // target is set and being searched
+    atomic<bool> done{true};
+    atomic<bool> stopping{false};
+    Code target{};
+    XYZ move{};
+
+    explicit Ponder(Engine &owner) : engine(owner) {}
+    ~Ponder() { stop(); }
+
+    // after is before with our answer drawn, scoreDiff our lead there.
+    void start(const Code &before, const Code &after, int scoreDiff, int threads) {
+        stop();
+        done = false;
+        search.threads = threads;
+        worker = thread(&Ponder::run, this, before, after, scoreDiff);
+    }
+    void run(Code before, Code code, int scoreDiff);
+    bool matches(const Code &code) const { return ready && target == code; }
+    void stop() {
+        if (!worker.joinable()) return;
+        stopping = true;
+        // keep raising the flags: a search that starts after the first store resets them
+        while (!done) {
+            guess.timeUp = true;
+            search.timeUp = true;
+            this_thread::yield();
+        }
+        worker.join();
+        ready = stopping = false;
+    }
+    // Ponder hit: the running search continues on the real clock and its move is taken when the budget runs out.
+    XYZ finish(SearchContext &game) {
+        while (!done && chrono::duration<double, milli>(Clock::now() - game.startTime).count() < game.plannedMs)
+            this_thread::sleep_for(chrono::milliseconds(1));
+        stop();
+        game.nodes = search.nodes.load();
+        game.expanded = search.expanded.load();
+        game.cutoffs = search.cutoffs.load();
+        game.depth = search.depth.load();
+        game.rootMoves = search.rootMoves;
+        game.finished = search.finished;
+        game.bookHit = search.bookHit;
+        game.startDepth = search.startDepth;
+        game.mcts = search.mcts;
+        game.ponderHit = true;
+        return move;
+    }
+};
+
+// One player: game clock, transposition table, root move order, killers/history and ponder thread.
+// Engines share only the read-only tables and the opening book, so each can play its own game on
+// its own thread; a single engine must not be called from two threads at once.
+struct Engine {
+    double timeLimitMs;
+    double timeLeft;
+    int prevMoveCount = NUM_BIT + 1;   // move count of the last choose_move_code
+    Code lastCode{};                   // and its position with our answer drawn, which every later position of the game extends
+    int scoreDiff = 0;                 // our boxes minus the opponent's at lastCode, counted from the first position we saw
+    TimeManager timeManager;
+    TranspositionTable tt;
+    mt19937 rng;
+    array<Edge, NUM_EDGE> order;       // shuffled per game to randomize node exploration
+    MoveOrdering ordering;             // killers and history of searches on the caller's thread
+    SearchContext game;                // the search behind choose_move
+    Mcts mcts;
+    int mctsUntil = 0;                 // positions with fewer lines are searched by MCTS instead of alpha-beta
+    Ponder ponder{*this};
+
+    Engine(double timeLimit = DEFAULT_TIME_LIMIT_MS, int threads = 1, size_t ttMegabytes = TT_DEFAULT_MB)
+        : timeLimitMs(timeLimit), timeLeft(timeLimit), timeManager(timeLimit / 1000.0, NUM_BIT, BOX_X * BOX_Y),
+          tt(ttMegabytes), rng(random_device{}()) {
+        game.threads = max(1, threads);
+        iota(order.begin(), order.end(), 0);
+        new_game();
+    }
+    ~Engine() { ponder.stop(); }
+
+    // Full clock, a fresh root order, an empty TT and no killers/history: nothing from the last game is worth keeping.
+    void new_game() {
+        ponder.stop();
+        timeLeft = timeLimitMs;
         shuffle(order.begin(), order.end(), rng);
+        mcts.seed = rng();
+        tt.clear();
+        ordering.clear();
+        prevMoveCount = 0;
+        lastCode = Code{};
+        scoreDiff = 0;
+    }
+    void set_time_limit(double ms) {
+        timeLimitMs = ms;
+        timeManager = TimeManager(ms / 1000.0, NUM_BIT, BOX_X * BOX_Y);
+    }
+    void attach(SearchContext &search) {
+        search.tt = &tt;
+        search.order = order.data();
+    }
+
+    // Root search of a simplified position on the current g_search. Captures the simplification leaves
+    // no choice about are returned unsearched, with *forced set; search_code values them when asked to.
+    XYZ choose_move(DotsAndBoxesState &gs, int *value = nullptr, bool *forced = nullptr) {
+        if (value) *value = 0;
+        if (forced) *forced = true;
+        g_search->finished = true;
+        DotsAndBoxesState original = gs; // Deep copy
+        Edge componentToEdge[MAX_CHAINS];
+        int8_t discovered = 0;
+        for (Edge e = 0; e < NUM_EDGE; e++) {
+            if (gs.edges[e].opp == REMOVED) continue;
+            int8_t prev = gs.componentsCount;
+            gs.simplify(e);
+            if (gs.componentsCount != prev) componentToEdge[discovered++] = e;
+        }
+        Edge doubleDealingEdge = DEADEND;
+        Edge loops[MAX_CHAINS];
+        Edge chains[MAX_CHAINS];
+        int8_t loopsCount = 0;
+        int8_t chainsCount = 0;
+        for (Edge e = 0; e < NUM_EDGE; e++) {
+            Edge oe = gs.edges[e].opp;
+            if (oe == REMOVED || gs.edges[e].next != e) continue;
+            if (oe != DEADEND && gs.edges[oe].next == oe) {
+                if (gs.edges[e].len != 2) return eToXYZ[e];
+                loops[loopsCount++] = e; 
+            } else {
+                if (gs.edges[e].len != 1) return eToXYZ[e];
+                chains[chainsCount++] = e; 
+            }
+            doubleDealingEdge = e; 
+        }
+        if (chainsCount && loopsCount) return eToXYZ[loops[0]];
+        if (chainsCount > 1) return eToXYZ[chains[0]];
+        if (loopsCount > 2) return eToXYZ[loops[0]];
+        if (chainsCount == 1) gs.doubleDealState = 2;
+        if (loopsCount == 2) gs.doubleDealState = 4;
+        gs.removeAndSimplify(doubleDealingEdge);
+        if (forced) *forced = false;
+        vector<Edge> eList;
+        vector<DotsAndBoxesState> children;
+        g_ordering->newSearch();
+        gs.getChildren(children, &eList, g_ordering, 0);
+        size_t chSize = children.size();
+        vector<pii> scores;
+        scores.reserve(chSize);
+        for (int i = 0; i < (int)chSize; i++) scores.emplace_back(i, 0);
+        g_search->rootMoves = (int)chSize;
+        auto rootMove = [&](Edge e) -> XYZ {   // board line of a root tag
+            if (e == NO_DOUBLE_DEAL) return eToXYZ[doubleDealingEdge];
+            if (e == DOUBLE_DEAL) return eToXYZ[original.edges[original.edges[doubleDealingEdge].opp].next];
+            if (e <= -OPEN_CHAIN) {
+                int8_t componentNumber = - e - OPEN_CHAIN;
+                Edge componentEdge = componentToEdge[componentNumber];
+                if (gs.components[componentNumber] == -2 && original.edges[componentEdge].opp == DEADEND) return eToXYZ[original.edges[componentEdge].next];
+                return eToXYZ[componentEdge];
+            }
+            if (gs.edges[e].len == 2) return eToXYZ[original.edges[original.edges[e].opp].next];
+            return eToXYZ[e];
+        };
+        // A search stopped before its first iteration completes still answers with a legal move: the first in move order.
+        XYZ bestMove = chSize ? rootMove(eList[0]) : XYZ{0, 0, 0};
+        // Warm start: the TT keeps every search of this game, so the last move's search has usually been
+        // through these children already. When it reached all of them, their stored values (bounds included)
+        // order the root and give a move to fall back on, and iterative deepening resumes at the shallowest
+        // depth they were stored with instead of at 3.
+        int depth = 2, stable = 0, known = NUM_BIT;
+        for (auto &[idx, val] : scores) {
+            const DotsAndBoxesState &child = children[idx];
+            if (!child.remainingBoxes || child.componentsOnly()) continue;   // never stored, and instant anyway
+            int sym;
+            TTData en;
+            if (!g_search->tt->probe(child.canonicalHash(&sym), en)) {
+                known = 0;
+                continue;
+            }
+            val = child.turn * (en.value + child.score);
+            if (!(en.flag & TT_SOLVED)) known = min(known, int(en.depth));
+        }
+        if (known > depth) {
+            stable_sort(scores.begin(), scores.end(), [](const auto &A, const auto &B){ return A.second > B.second; });
+            bestMove = rootMove(eList[scores[0].first]);
+            if (value) *value = scores[0].second;
+            depth = min(known, g_search->maxDepth - 1);
+        }
+        g_search->startDepth = depth + 1;
+        HelperThreads helpers(children);
+        long long iterNodes = 0, prevIterNodes = 0, nodesBefore = g_nodes;
+        while (depth++ < g_search->maxDepth) {
+            g_horizon = false;
+            for (auto &[idx, val] : scores) {
+                DotsAndBoxesState &child = children[idx];
+                val = child.turn * minimax(child, depth - 1, -SCORE_INF, SCORE_INF);
+                if (g_search->timeUp) {g_search->finished = false; return bestMove;}
+            }
+            g_search->depth = depth;
+            sort(scores.begin(), scores.end(), [](const auto &A, const auto &B){ return A.second > B.second; }); // Move ordering
+            if (value) *value = scores[0].second;
+            XYZ prevBest = bestMove;
+            bestMove = rootMove(eList[scores[0].first]);
+            if (!g_horizon) {                // every line below the root reached the end of the game
+                g_search->depth = g_search->maxDepth;
+                break;
+            }
+            if (g_search->plannedMs > 0) {   // game moves only: fixed-budget searches run until timeUp
+                stable = (bestMove == prevBest) ? stable + 1 : 0;
+                prevIterNodes = iterNodes;
+                iterNodes = g_nodes - nodesBefore;
+                if (depth == g_search->startDepth && depth > 3) iterNodes = 0;   // a warm iteration is mostly TT hits: no growth estimate
+                nodesBefore = g_nodes;
+                double elapsed = chrono::duration<double>(Clock::now() - g_search->startTime).count();
+                if (!timeManager.keep_searching(elapsed, g_search->plannedMs / 1000, g_search->timeLimitMs / 1000, stable,
+                                                iterNodes, prevIterNodes, elapsed > 0 ? g_nodes / elapsed : 0.0)) {
+                    g_search->finished = false;
+                    break;
+                }
+            }
+        }
+        return bestMove;
     }
-    prev_move_count = move_count;
-    DotsAndBoxesState gs;
-    static const int dx[4]={0,1,0,0}, dy[4]={0,0,1,0}, dir[4]={0,1,0,1};
-    for (int8_t x=0; x<BOX_X; ++x){
-        int8_t rowStart = 4*x;
-        for (int8_t y=0; y<BOX_Y; ++y){
-            int8_t up = rowStart + 20*y;
-            int cnt=0;
-            for(int k=0;k<4;k++) cnt += board[x+dx[k]][y+dy[k]][dir[k]] ? (gs.remove(up+k),1) : 0;
-            if(cnt==4) gs.remainingBoxes--;
+
+    // Book lookup, then search of the canonical orientation (by MCTS before mctsUntil); the move is mapped back.
+    XYZ search_code(const Code &code, int *value) {
+        int sym;
+        Code canon = canonical_code(code, &sym);
+        Bit bit;
+        int8_t bookValue;
+        if (book.probe(canon, bit, bookValue)) {
+            if (value) *value = bookValue;
+            g_search->bookHit = g_search->finished = true;
+            return transform_move(bitToXYZ[bit], symInverse[sym]);
         }
+        if (code_count(code) < mctsUntil && g_search->maxDepth >= NUM_BIT)   // depth-limited searches stay alpha-beta
+            return transform_move(mcts.search(canon, *g_search, value), symInverse[sym]);
+        DotsAndBoxesState gs(canon);
+        bool forced;
+        XYZ move = transform_move(choose_move(gs, value, &forced), symInverse[sym]);
+        if (forced && value) *value = forced_value(code, move);
+        return move;
     }
-    c_timeLimitMs = timeManager.get_time_for_move(g_timeLeft / 1000.0, 60 - move_count, gs.remainingBoxes) * 1000;
-    XYZ move = choose_move(gs);
-    auto elapsedMs = chrono::duration_cast<chrono::milliseconds>(Clock::now() - c_startTime).count();
-    g_timeLeft -= elapsedMs;
-    return move;
+
+    // A forced reply is worth the boxes it takes plus the value of the position it leads to, searched on
+    // what is left of the same budget. Game moves ask for no value and still return at once.
+    int forced_value(const Code &code, XYZ move) {
+        Code next = code;
+        code_set(next, xyzToBit(move));
+        int taken = DotsAndBoxesState(code).remainingBoxes - DotsAndBoxesState(next).remainingBoxes;
+        int value = 0;
+        if (code_count(next) < NUM_BIT) {
+            int scoreDiff = g_search->scoreDiff;
+            g_search->scoreDiff = taken ? scoreDiff + taken : -scoreDiff;   // the lead of whoever moves next
+            search_code(next, &value);
+            g_search->scoreDiff = scoreDiff;
+        }
+        return taken ? taken + value : -value;
+    }
+
+    // Fixed-budget search on the calling thread that leaves the game clock (timeLeft, prevMoveCount) alone.
+    pair<XYZ, int> search_fixed(const Code &code, SearchContext &search, MoveOrdering &killers, double timeMs,
+                                long long nodes = 0, int depth = NUM_BIT) {
+        search.start(timeMs > 0 ? timeMs : numeric_limits<double>::infinity(), nodes, depth);
+        attach(search);
+        ActiveSearch active(search, killers);
+        g_nodes = 0;
+        int value;
+        XYZ move = search_code(code, &value);
+        flush_stats();
+        search.usedMs = chrono::duration<double, milli>(Clock::now() - search.startTime).count();
+        return {move, value};
+    }
+
+    // Next move of the current game on the game clock. Searches of earlier moves stay in the TT and warm-start
+    // this one; a position that does not extend the last one with our answer drawn starts a new game first.
+    // A new game whose first position happens to extend an aborted one cannot be told apart: callers that
+    // know a game starts call new_game().
+    XYZ choose_move_code(const Code &code) {
+        Clock::time_point startTime = Clock::now();
+        Code merged = lastCode;
+        merged |= code;
+        if (merged != code) new_game();   // lines were taken away or our move is missing: nothing searched so far applies
+        int boxesLeft = DotsAndBoxesState(code).remainingBoxes;
+        if (code_count(lastCode)) scoreDiff -= DotsAndBoxesState(lastCode).remainingBoxes - boxesLeft;   // the opponent's since
+        int move_count = code_count(code);
+        bool ponderHit = ponder.matches(code);
+        if (!ponderHit) ponder.stop();                          // wrong guess: dropped, the TT keeps what it found
+        tt.newSearch();
+        prevMoveCount = move_count;
+        double planned = timeManager.get_time_for_move(timeLeft / 1000.0, NUM_BIT - move_count, boxesLeft);
+        game.start(timeManager.get_hard_limit(timeLeft / 1000.0, planned) * 1000);
+        game.plannedMs = planned * 1000;
+        game.startTime = startTime;
+        game.scoreDiff = scoreDiff;
+        attach(game);
+        XYZ move;
+        if (ponderHit) move = ponder.finish(game);
+        else {
+            ActiveSearch active(game, ordering);
+            g_nodes = 0;      // How many nodes has been explored
+            move = search_code(code, nullptr);
+            flush_stats();
+        }
+        lastCode = code;
+        code_set(lastCode, xyzToBit(move));
+        scoreDiff += boxesLeft - DotsAndBoxesState(lastCode).remainingBoxes;
+        game.usedMs = chrono::duration<double, milli>(Clock::now() - startTime).count();
+        timeLeft -= game.usedMs;   // unrounded: whole milliseconds dropped every move add up over a 9x9 game
+        if (ponder.enabled) {                                   // started after the clock stops: opponent's time
+            ponder.start(code, lastCode, scoreDiff, game.threads);
+        }
+        return move;
+    }
+
+    pair<XYZ, int> analyze(const Code &code, double timeMs, int scoreDiff = 0) {
+        ponder.stop();
+        SearchContext search;
+        search.threads = game.threads;
+        search.scoreDiff = scoreDiff;
+        tt.newSearch();
+        return search_fixed(code, search, ordering, timeMs);
+    }
+
+    // Searches every code with its own time/node budget on a pool of threads sharing the TT.
+    void evaluate(const vector<Code> &in, vector<XYZ> &moves, vector<int8_t> &values, double timeMs, long long nodes, int threads) {
+        size_t n = in.size();
+        ponder.stop();
+        if (threads <= 0) threads = max(1u, thread::hardware_concurrency());
+        threads = int(min<size_t>(size_t(threads), max<size_t>(n, 1)));
+        tt.newSearch();
+        atomic<size_t> next{0};
+        auto worker = [&] {
+            MoveOrdering killers;
+            for (size_t i; (i = next++) < n;) {
+                int value;
+                SearchContext search;
+                tie(moves[i], value) = search_fixed(in[i], search, killers, timeMs, nodes);
+                values[i] = int8_t(value);
+            }
+        };
+        vector<thread> pool;
+        for (int t = 1; t < threads; t++) pool.emplace_back(worker);
+        worker();
+        for (thread &t : pool) t.join();
+    }
+
+    pair<XYZ, int> search_limited(const Code &code, SearchContext &search, double timeMs, int depth, long long nodes) {
+        ponder.stop();
+        tt.newSearch();
+        return search_fixed(code, search, ordering, timeMs, nodes, depth > 0 ? depth : NUM_BIT);
+    }
+
+    // Deterministic mode: reseed the root move order, drop everything learned so far and start a new game.
+    void set_seed(unsigned seed) {
+        ponder.stop();
+        rng.seed(seed);
+        iota(order.begin(), order.end(), 0);
+        new_game();
+    }
+    // Depth and node count of the game search in progress, safe to call from another thread.
+    pair<int, long long> progress() const {
+        return {game.depth.load(), game.liveNodes.load()};
+    }
+    void set_mcts(int untilMove) {
+        ponder.stop();
+        mctsUntil = min(max(0, untilMove), NUM_BIT);
+    }
+    void set_threads(int n) {
+        ponder.stop();
+        game.threads = max(1, n);
+    }
+    void set_tt_size(size_t megabytes) {
+        ponder.stop();
+        tt.resize(megabytes);
+    }
+};
+
+void Ponder::run(Code before, Code code, int scoreDiff) {
+    int boxes = DotsAndBoxesState(code).remainingBoxes;
+    bool ours = boxes < DotsAndBoxesState(before).remainingBoxes;   // we completed a box and move again
+    while (!ours && !stopping && code_count(code) < NUM_BIT) {      // the opponent keeps moving while it completes boxes
+        guess.scoreDiff = -scoreDiff;
+        XYZ reply = engine.search_fixed(code, guess, engine.ordering, PONDER_GUESS_MS).first;
+        code_set(code, xyzToBit(reply));
+        int left = DotsAndBoxesState(code).remainingBoxes;
+        ours = left == boxes;
+        scoreDiff -= boxes - left;
+        boxes = left;
+    }
+    if (ours && !stopping && code_count(code) < NUM_BIT) {
+        target = code;
+        ready = true;
+        search.scoreDiff = scoreDiff;
+        move = engine.search_fixed(code, search, engine.ordering, 0).first;
+    }
+    done = true;
 }
 
-PYBIND11_MODULE(MapuAlpha, m) {
+// Engine behind the module-level functions, which keep the single-game interface of the agent API.
+Engine defaultEngine;
+
+// The engine starts a new game by itself when the position does not extend the last one.
+XYZ choose_move_code(const Code &code) {
+    return defaultEngine.choose_move_code(code);
+}
+
+// uint8[NUM_BIT] indexed by encode_board_lines bit (bytes, bytearray, NumPy, ...), read in place.
+Code buffer_code(const py::buffer &edges) {
+    py::buffer_info info = edges.request();
+    if (info.ndim != 1 || info.shape[0] != NUM_BIT || info.itemsize != 1)
+        throw invalid_argument("edges must be a 1-D buffer of " + to_string(NUM_BIT) + " single-byte items");
+    const uint8_t *p = static_cast<const uint8_t *>(info.ptr);
+    Code code{};
+    for (int b = 0; b < NUM_BIT; b++) if (p[b * info.strides[0]]) code_set(code, b);
+    return code;
+}
+
+pair<py::array_t<int8_t>, py::array_t<int8_t>> evaluate_positions(Engine &engine,
+        py::array_t<uint64_t, py::array::c_style | py::array::forcecast> codes, double timeMs, long long nodes, int threads) {
+    if (timeMs <= 0 && nodes <= 0) throw invalid_argument("evaluate_positions needs time_ms or nodes");
+    size_t n = codes.ndim() ? size_t(codes.shape(0)) : 0;
+    if (size_t(codes.size()) != n * CODE_WORDS) throw invalid_argument("codes must have shape (N,) or (N, " + to_string(CODE_WORDS) + ")");
+    vector<Code> in(n);
+    memcpy(in.data(), codes.data(), n * sizeof(Code));
+    vector<XYZ> moves(n);
+    vector<int8_t> values(n);
+    {
+        py::gil_scoped_release release;
+        engine.evaluate(in, moves, values, timeMs, nodes, threads);
+    }
+    py::array_t<int8_t> outMoves({py::ssize_t(n), py::ssize_t(3)}), outValues({py::ssize_t(n)});
+    auto mv = outMoves.mutable_unchecked<2>();
+    for (size_t i = 0; i < n; i++) for (int k = 0; k < 3; k++) mv(i, k) = moves[i][k];
+    memcpy(outValues.mutable_data(), values.data(), n);
+    return {outMoves, outValues};
+}
+
+py::dict search_info(const SearchContext &sc) {
+    long long expanded = sc.expanded;
+    py::dict info;
+    info["nodes"] = (long long)sc.nodes;
+    info["depth"] = sc.depth.load();
+    info["start_depth"] = sc.startDepth;
+    info["mcts"] = sc.mcts;
+    info["budget_ms"] = sc.plannedMs > 0 ? sc.plannedMs : sc.timeLimitMs;
+    info["hard_limit_ms"] = sc.timeLimitMs;
+    info["used_ms"] = sc.usedMs;
+    info["root_moves"] = sc.rootMoves;
+    info["cutoff_rate"] = expanded ? double(sc.cutoffs) / expanded : 0.0;
+    info["finished"] = sc.finished;
+    info["book"] = sc.bookHit;
+    info["ponder_hit"] = sc.ponderHit;
+    info["threads"] = sc.threads;
+    return info;
+}
+
+py::dict last_search_info(const Engine &engine) {
+    py::dict info = search_info(engine.game);
+    info["move"] = engine.prevMoveCount;
+    info["time_left_ms"] = engine.timeLeft;
+    info["score_diff"] = engine.scoreDiff;
+    return info;
+}
+
+// Same position: every side still on the board, the live components and the counters.
+bool same_state(const DotsAndBoxesState &a, const DotsAndBoxesState &b) {
+    for (int e = 0; e < NUM_EDGE; e++) {
+        const EdgeState &x = a.edges[e], &y = b.edges[e];
+        if (x.opp != y.opp || x.next != y.next || x.prev != y.prev || x.len != y.len) return false;
+    }
+    if (a.componentsCount != b.componentsCount || a.doubleDealState != b.doubleDealState || a.score != b.score ||
+        a.turn != b.turn || a.remainingBoxes != b.remainingBoxes) return false;
+    return equal(a.components, a.components + a.componentsCount, b.components);
+}
+
+// Every getMoves() line from gs down to depth plies, played with make/unmake on gs itself: each move
+// must give what child() builds on a copy, and each unmake the position before the move.
+long long check_make_unmake(DotsAndBoxesState &gs, int depth, UndoStack &undo) {
+    if (depth <= 0) return 0;
+    Edge tags[PRUNING + 2];
+    int n = gs.getMoves(tags);
+    long long moves = 0;
+    for (int i = 0; i < n; i++) {
+        DotsAndBoxesState before = gs, after = gs.child(tags[i]);
+        Undo u = gs.make(tags[i], undo);
+        if (!same_state(gs, after)) throw runtime_error("make(" + to_string(tags[i]) + ") differs from child()");
+        moves += 1 + check_make_unmake(gs, depth - 1, undo);
+        gs.unmake(u, undo);
+        if (!same_state(gs, before)) throw runtime_error("unmake(" + to_string(tags[i]) + ") did not restore the position");
+    }
+    return moves;
+}
+
+// Search with explicit limits (0 = none, but at least one is required) that also returns the search statistics.
+py::dict search_stats(Engine &engine, const Code &code, double timeMs, int depth, long long nodes, int threads) {
+    if (timeMs <= 0 && depth <= 0 && nodes <= 0) throw invalid_argument("search_stats needs time_ms, depth or nodes");
+    SearchContext search;
+    search.threads = max(1, threads);
+    pair<XYZ, int> result;
+    {
+        py::gil_scoped_release release;
+        result = engine.search_limited(code, search, timeMs, depth, nodes);
+    }
+    py::dict info = search_info(search);
+    info["best_move"] = result.first;
+    info["value"] = result.second;
+    return info;
+}
+
+PYBIND11_MODULE(MAPUALPHA_MODULE, m) {
     m.doc() = "The Final Model";
-    m.def("choose_move", &choose_move_wrapper, py::arg("board_lines"), "Select move [x,y,z] for given board");
+    m.attr("BOX_X") = BOX_X;
+    m.attr("BOX_Y") = BOX_Y;
+    m.attr("NUM_BIT") = NUM_BIT;
+    m.attr("CODE_WORDS") = CODE_WORDS;
+    m.attr("NUM_SYM") = NUM_SYM;
+    m.attr("SYM_INVERSE") = vector<int>(symInverse, symInverse + NUM_SYM);   // symmetry undoing each one
+
+    // module_local: every size build defines its own Engine, and several builds can share a process
+    py::class_<Engine>(m, "Engine", py::module_local(), "Independent player with its own clock, transposition table, move order and ponder "
+                                    "thread; engines can search concurrently on separate threads")
+        .def(py::init([](double timeLimitMs, int threads, size_t ttMegabytes, optional<unsigned> seed) {
+                 auto engine = make_unique<Engine>(timeLimitMs, threads, ttMegabytes);
+                 if (seed) engine->set_seed(*seed);
+                 return engine;
+             }), py::arg("time_limit_ms") = DEFAULT_TIME_LIMIT_MS, py::arg("threads") = 1,
+             py::arg("tt_mb") = TT_DEFAULT_MB, py::arg("seed") = py::none())
+        .def("new_game", &Engine::new_game, "Refill the clock, reshuffle the root move order and clear the TT",
+             py::call_guard<py::gil_scoped_release>())
+        .def("choose_move", [](Engine &e, const BoardLines &board) { return e.choose_move_code(encode_board_lines(board)); },
+             py::arg("board_lines"), "Select move [x,y,z] for given board on this engine's game clock",
+             py::call_guard<py::gil_scoped_release>())
+        .def("choose_move_code", &Engine::choose_move_code, py::arg("code"),
+             "Select move [x,y,z] for an encode_board_lines edge code on this engine's game clock",
+             py::call_guard<py::gil_scoped_release>())
+        .def("choose_move_buffer", [](Engine &e, const py::buffer &edges) {
+                 Code code = buffer_code(edges);
+                 py::gil_scoped_release release;
+                 return e.choose_move_code(code);
+             }, py::arg("edges"), "Select move [x,y,z] for a uint8 edge buffer with one item per line")
+        .def("analyze", &Engine::analyze, py::arg("code"), py::arg("time_ms"), py::arg("score_diff") = 0,
+             "Search an edge code for time_ms without touching the game clock; returns ([x,y,z], value). "
+             "score_diff is the side to move's lead in boxes already taken, which MCTS needs to tell wins from losses",
+             py::call_guard<py::gil_scoped_release>())
+        .def("evaluate_positions", &evaluate_positions, py::arg("codes"), py::arg("time_ms") = 0.0, py::arg("nodes") = 0,
+             py::arg("threads") = 0, "Like the module's evaluate_positions, on this engine's TT")
+        .def("search_stats", &search_stats, py::arg("code"), py::arg("time_ms") = 0.0, py::arg("depth") = 0,
+             py::arg("nodes") = 0, py::arg("threads") = 1, "Like the module's search_stats, on this engine's TT")
+        .def("last_search_info", &last_search_info, "Statistics of the last choose_move search as a dict")
+        .def("search_progress", &Engine::progress,
+             "(depth, nodes) of the choose_move search in progress, for polling from another thread")
+        .def("set_seed", &Engine::set_seed, py::arg("seed"), "Seed the root move order, clear the TT and start a new game",
+             py::call_guard<py::gil_scoped_release>())
+        .def("set_ponder", [](Engine &e, bool enabled) { e.ponder.enabled = enabled; if (!enabled) e.ponder.stop(); },
+             py::arg("enabled"), "Allow or forbid searching on the opponent's time after each choose_move",
+             py::call_guard<py::gil_scoped_release>())
+        .def("stop_ponder", [](Engine &e) { e.ponder.stop(); }, "Stop a running ponder search",
+             py::call_guard<py::gil_scoped_release>())
+        .def("set_threads", &Engine::set_threads, py::arg("n"), "Set the number of Lazy SMP search threads",
+             py::call_guard<py::gil_scoped_release>())
+        .def("set_mcts", &Engine::set_mcts, py::arg("until_move"),
+             "Search positions with fewer than until_move lines by parallel MCTS, then hand over to alpha-beta (0 = never)",
+             py::call_guard<py::gil_scoped_release>())
+        .def("set_tt_size", &Engine::set_tt_size, py::arg("megabytes"), "Set transposition table memory budget",
+             py::call_guard<py::gil_scoped_release>())
+        .def_property("time_limit_ms", [](const Engine &e) { return e.timeLimitMs; }, &Engine::set_time_limit,
+                      "Game clock of one player, applied from the next new_game()")
+        .def_property("time_left_ms", [](const Engine &e) { return e.timeLeft; }, [](Engine &e, double ms) { e.timeLeft = ms; },
+                      "Remaining game clock");
+
+    // Module-level functions play one game at a time on a shared default engine.
+    m.def("choose_move", [](const BoardLines &board) { return choose_move_code(encode_board_lines(board)); },
+          py::arg("board_lines"), "Select move [x,y,z] for given board", py::call_guard<py::gil_scoped_release>());
+    m.def("choose_move_code", &choose_move_code, py::arg("code"), "Select move [x,y,z] for an encode_board_lines edge code",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("choose_move_buffer", [](const py::buffer &edges) {
+              Code code = buffer_code(edges);
+              py::gil_scoped_release release;
+              return choose_move_code(code);
+          }, py::arg("edges"), "Select move [x,y,z] for a uint8 edge buffer with one item per line");
+    m.def("canonical_code", [](const Code &code) { int sym; Code c = canonical_code(code, &sym); return make_pair(c, sym); },
+          py::arg("code"), "Smallest symmetric image of an edge code and the symmetry producing it");
+    m.def("transform_code", [](const Code &code, int sym) {
+              if (sym < 0 || sym >= NUM_SYM) throw invalid_argument("sym must be in [0, " + to_string(NUM_SYM) + ")");
+              return transform_code(code, sym);
+          }, py::arg("code"), py::arg("sym"), "Image of an edge code under symmetry sym, numbered as by canonical_code");
+    m.def("analyze", [](const Code &code, double timeMs, int scoreDiff) { return defaultEngine.analyze(code, timeMs, scoreDiff); },
+          py::arg("code"), py::arg("time_ms"), py::arg("score_diff") = 0,
+          "Search an edge code for time_ms without touching the game clock; returns ([x,y,z], value). "
+          "score_diff is the side to move's lead in boxes already taken, which MCTS needs to tell wins from losses",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("evaluate_positions", [](py::array_t<uint64_t, py::array::c_style | py::array::forcecast> codes, double timeMs,
+                                   long long nodes, int threads) { return evaluate_positions(defaultEngine, codes, timeMs, nodes, threads); },
+          py::arg("codes"), py::arg("time_ms") = 0.0, py::arg("nodes") = 0, py::arg("threads") = 0,
+          "Search a batch of edge codes (shape (N,) or (N, CODE_WORDS)), each with time_ms and/or nodes, on a thread pool (0 = all cores); "
+          "returns (moves int8[N,3], values int8[N]) and leaves the game clock alone");
+    m.def("last_search_info", [] { return last_search_info(defaultEngine); }, "Statistics of the last choose_move search as a dict");
+    m.def("search_progress", [] { return defaultEngine.progress(); },
+          "(depth, nodes) of the choose_move search in progress, for polling from another thread");
+    m.def("search_stats", [](const Code &code, double timeMs, int depth, long long nodes, int threads) {
+              return search_stats(defaultEngine, code, timeMs, depth, nodes, threads);
+          }, py::arg("code"), py::arg("time_ms") = 0.0, py::arg("depth") = 0, py::arg("nodes") = 0, py::arg("threads") = 1,
+          "Search an edge code up to the given time/depth/node limits without touching the game clock; "
+          "returns last_search_info()-style statistics plus best_move and value");
+    m.def("set_seed", [](unsigned seed) { defaultEngine.set_seed(seed); }, py::arg("seed"),
+          "Seed the root move order and clear the transposition table so single-threaded searches are reproducible",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("set_ponder", [](bool enabled) { defaultEngine.ponder.enabled = enabled; if (!enabled) defaultEngine.ponder.stop(); },
+          py::arg("enabled"), "Allow or forbid searching on the opponent's time after each choose_move (off by default)",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("new_game", [] { defaultEngine.new_game(); },
+          "Refill the clock, reshuffle the root move order and clear the TT before the first move of a game",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("stop_ponder", [] { defaultEngine.ponder.stop(); }, "Stop a running ponder search, e.g. at the end of a game",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("set_threads", [](int n) { defaultEngine.set_threads(n); }, py::arg("n"), "Set the number of Lazy SMP search threads");
+    m.def("set_mcts", [](int untilMove) { defaultEngine.set_mcts(untilMove); }, py::arg("until_move"),
+          "Search positions with fewer than until_move lines by parallel MCTS (threads as set_threads), then hand over to alpha-beta (0 = never)",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("check_make_unmake", [](const Code &code, int depth) {
+              array<Edge, NUM_EDGE> order;             // getMoves() reads the root order of the running search
+              iota(order.begin(), order.end(), 0);
+              SearchContext search;
+              search.order = order.data();
+              MoveOrdering ordering;
+              ActiveSearch active(search, ordering);
+              DotsAndBoxesState gs(code);
+              for (Edge e = 0; e < NUM_EDGE; e++) if (gs.edges[e].opp != REMOVED) gs.simplify(e);   // as choose_move roots it
+              unique_ptr<UndoStack> undo(new UndoStack);
+              return check_make_unmake(gs, depth, *undo);
+          }, py::arg("code"), py::arg("depth"),
+          "Self-test of the in-place search state: plays every move line of the position, simplified as the root "
+          "search does, down to depth plies with make/unmake and compares against copies; returns the number of "
+          "moves checked, raises on a mismatch",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("load_book", [](const string &path) { defaultEngine.ponder.stop(); book.load(path); return book.count; }, py::arg("path"),
+          "Memory-map an opening book built by build_book.py, shared by all engines (load it before any engine searches); "
+          "returns the number of positions");
+    m.def("set_tt_size", [](size_t megabytes) { defaultEngine.set_tt_size(megabytes); }, py::arg("megabytes"),
+          "Set transposition table memory budget");
 }
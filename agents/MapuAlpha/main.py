@@ -1,13 +1,118 @@
 import os, sys
+import re
+import importlib.machinery
+import importlib.util
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-if BASE_DIR not in sys.path:
-    sys.path.insert(0, BASE_DIR)
-    
-import MapuAlpha
+
+# Builds are named after the agent directory (setup.py uses the same rule), so a copy of this agent
+# holding another version (an SPRT of two builds) gets its own extension module. A build already
+# loaded under the same name from somewhere else is refused: Python and pybind11 cache modules by
+# name, so it would silently be the other directory's engine.
+BUILD_NAME = re.sub(r"\W", "_", os.path.basename(BASE_DIR))
+
+def load_build(name):
+    for suffix in importlib.machinery.EXTENSION_SUFFIXES:
+        path = os.path.join(BASE_DIR, name + suffix)
+        if os.path.exists(path):
+            break
+    else:
+        raise ImportError(f"{name} is not built in {BASE_DIR} (python setup.py build_ext --inplace)")
+    loaded = sys.modules.get(name)
+    if loaded is not None:
+        if os.path.realpath(getattr(loaded, "__file__", "")) != os.path.realpath(path):
+            raise ImportError(f"{name} is already loaded from {loaded.__file__}; rebuild {BASE_DIR} "
+                              f"under its own directory name so the two versions do not collide")
+        return loaded
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+MapuAlpha = load_build(BUILD_NAME)
+
+# build_book.py writes one book per board size, for that size's build
+BOOK_PATH = os.path.join(BASE_DIR, "book.bin")
+if os.path.exists(BOOK_PATH):
+    MapuAlpha.load_book(BOOK_PATH)
+
+# Other board sizes are separate builds (MAPUALPHA_SIZES=6x6 python setup.py build_ext --inplace)
+_builds = {(5, 5): MapuAlpha}
+
+# Engines of this agent instance, one per board size. load_agent() executes this file afresh for every
+# agent it loads, so two seats or two games in one process never share a TT, a clock or a game history.
+_engines = {}
+_last_engine = None
+_ponder = False
+_seed = None
+_mcts = 0
+
+def engine(xsize, ysize):
+    global _last_engine
+    if (xsize, ysize) not in _engines:
+        if (xsize, ysize) not in _builds:
+            build = _builds[xsize, ysize] = load_build(f"{BUILD_NAME}_{xsize}x{ysize}")
+            book_path = os.path.join(BASE_DIR, f"book_{xsize}x{ysize}.bin")
+            if os.path.exists(book_path):
+                build.load_book(book_path)
+        eng = _builds[xsize, ysize].Engine(seed=_seed)
+        eng.set_ponder(_ponder)
+        eng.set_mcts(_mcts)
+        _engines[xsize, ysize] = eng
+    _last_engine = _engines[xsize, ysize]
+    return _last_engine
+
+def _current():
+    return _last_engine if _last_engine is not None else engine(5, 5)
 
 def init():
     pass
 
 def run(board_lines, xsize, ysize):
-    return MapuAlpha.choose_move(board_lines)
+    return engine(xsize, ysize).choose_move(board_lines)
+
+def run_code(code, xsize, ysize):
+    return engine(xsize, ysize).choose_move_code(code)
+
+def search_info():
+    return _current().last_search_info()
+
+# (depth, nodes) of the move being searched, callable from another thread while run() is busy
+def search_progress():
+    return _current().search_progress()
+
+# Search on the opponent's time between moves; off unless the evaluator allows it
+def set_ponder(enabled):
+    global _ponder
+    _ponder = enabled
+    for eng in _engines.values():
+        eng.set_ponder(enabled)
+
+# Called by the harness before the first move of every game: a game is also detected when the
+# position does not extend the last one, but not one that starts from a superset of an aborted game
+def new_game():
+    for eng in _engines.values():
+        eng.new_game()
+
+def stop_ponder():
+    for eng in _engines.values():
+        eng.stop_ponder()
+
+# Fixed-budget search for data generation: leaves the game clock alone, value is for the side to move.
+# score_diff is its lead in boxes taken so far, which the lines alone do not tell
+def analyze(code, xsize, ysize, time_ms, score_diff=0):
+    return engine(xsize, ysize).analyze(code, time_ms, score_diff)
+
+def set_seed(seed):
+    global _seed
+    _seed = seed
+    for eng in _engines.values():
+        eng.set_seed(seed)
+
+# Monte Carlo tree search for moves before line until_move, alpha-beta after it; 0 turns it off
+def set_mcts(until_move):
+    global _mcts
+    _mcts = until_move
+    for eng in _engines.values():
+        eng.set_mcts(until_move)
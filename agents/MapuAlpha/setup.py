@@ -1,3 +1,5 @@
+import os
+import re
 from setuptools import setup, Extension
 import pybind11
 
@@ -7,21 +9,41 @@ include_dirs = [
     "."
 ]
 
-ext_modules = [
-    Extension(
-        "MapuAlpha",            
-        ["main.cpp", "DotsAndBoxesState.cpp", "common.cpp"],    
+# One module per board size, e.g. MAPUALPHA_SIZES=5x5,6x6 builds MapuAlpha and MapuAlpha_6x6.
+# Sizes are compile-time constants so every build keeps fixed-size tables and loops.
+SIZES = os.environ.get("MAPUALPHA_SIZES", "5x5").split(",")
+
+# Modules are named after the agent directory, as main.py loads them: a copy of the agent in another
+# directory builds modules of its own and can play against this one in the same process.
+BUILD_NAME = re.sub(r"\W", "_", os.path.basename(os.path.dirname(os.path.abspath(__file__))))
+
+def module_name(xsize, ysize):
+    return BUILD_NAME if (xsize, ysize) == (5, 5) else f"{BUILD_NAME}_{xsize}x{ysize}"
+
+def size_extension(size):
+    xsize, ysize = (int(v) for v in size.lower().split("x"))
+    name = module_name(xsize, ysize)
+    return Extension(
+        name,
+        ["main.cpp", "DotsAndBoxesState.cpp", "common.cpp", "Symmetry.cpp", "OpeningBook.cpp", "Mcts.cpp"],
         include_dirs=include_dirs,
+        define_macros=[
+            ("MAPUALPHA_BOX_X", str(xsize)),
+            ("MAPUALPHA_BOX_Y", str(ysize)),
+            ("MAPUALPHA_MODULE", name),
+        ],
         language="c++",
         extra_compile_args = [
             "-O3",
             "-std=c++17",
+            "-fvisibility=hidden",   # size builds share symbol names; keep them out of each other's way
         ]
-    ),
-]
+    )
+
+ext_modules = [size_extension(size) for size in SIZES]
 
 setup(
     name="MapuAlpha",
     version="0.0.1",
     ext_modules=ext_modules,
-)
\ No newline at end of file
+)
@@ -13,4 +13,10 @@ def run(board_lines, xsize, ysize):
             if y < ysize and board_lines[x][y][1] == 0:
                 legal_moves.append((x, y, 1))
 
-    return random.choice(legal_moves)
\ No newline at end of file
+    return random.choice(legal_moves)
+
+def run_batch(edges, current_player, rng):
+    # edges: (N, 60) bool array in utils_coord index order, True where a line is drawn
+    keys = rng.random(edges.shape)
+    keys[edges] = -1.0
+    return keys.argmax(axis=1)
@@ -0,0 +1,182 @@
+import argparse
+import multiprocessing
+import time
+import numpy as np
+from tqdm import tqdm
+
+from utils_coord import get_box_edges, get_edge_squares
+from play_game import load_agent, available_cpus
+
+NUM_EDGES = 60
+NUM_BOXES = 25
+
+# Box b = x * 5 + y. Border edges touch only one box; their second slot points at the dummy
+# box NUM_BOXES, whose edge count is never read as a completion.
+BOX_EDGES = np.array([get_box_edges(x, y) for x in range(5) for y in range(5)], dtype=np.intp)
+EDGE_BOXES = np.array([[bx * 5 + by for bx, by in get_edge_squares(i)] + [NUM_BOXES] * (2 - len(get_edge_squares(i)))
+                       for i in range(NUM_EDGES)], dtype=np.intp)
+
+
+class BatchGames:
+    def __init__(self, num_games):
+        self.num_games = num_games
+        self.rows = np.arange(num_games)
+        self.edges = np.zeros((num_games, NUM_EDGES), dtype=bool)
+        self.box_counts = np.zeros((num_games, NUM_BOXES + 1), dtype=np.int8)
+        self.square_owner = np.full((num_games, NUM_BOXES + 1), -1, dtype=np.int8)
+        self.scores = np.zeros((num_games, 2), dtype=np.int16)
+        self.current_player = np.zeros(num_games, dtype=np.int8)
+        self.moves = np.zeros((num_games, NUM_EDGES), dtype=np.int8)
+        self.players = np.zeros((num_games, NUM_EDGES), dtype=np.int8)
+        self.move_count = 0
+
+    def apply_moves(self, moves):
+        if self.edges[self.rows, moves].any():
+            raise ValueError("batch policy returned an occupied edge")
+        self.moves[:, self.move_count] = moves
+        self.players[:, self.move_count] = self.current_player
+        self.move_count += 1
+
+        self.edges[self.rows, moves] = True
+        rows = self.rows[:, None]
+        boxes = EDGE_BOXES[moves]
+        counts = self.box_counts[rows, boxes] + 1
+        self.box_counts[rows, boxes] = counts
+        completed = (counts == 4) & (boxes < NUM_BOXES)
+        self.square_owner[rows, boxes] = np.where(completed, self.current_player[:, None], self.square_owner[rows, boxes])
+
+        gained = completed.sum(axis=1, dtype=np.int16)
+        self.scores[self.rows, self.current_player] += gained
+        self.current_player = np.where(gained > 0, self.current_player, 1 - self.current_player).astype(np.int8)
+        return gained
+
+    def is_over(self):
+        # every move draws exactly one line, so all games in the batch end together
+        return self.move_count == NUM_EDGES
+
+
+def greedy_policy(edges, current_player, rng):
+    # take a box if one is available, otherwise avoid drawing the third side of a box
+    counts = np.zeros((edges.shape[0], NUM_BOXES + 1), dtype=np.int8)
+    counts[:, :NUM_BOXES] = edges[:, BOX_EDGES].sum(axis=2)
+    adjacent = counts[:, EDGE_BOXES]
+    keys = rng.random(edges.shape)
+    keys += 2.0 * (adjacent == 3).any(axis=2) + 1.0 * ~(adjacent == 2).any(axis=2)
+    keys[edges] = -1.0
+    return keys.argmax(axis=1)
+
+BUILTIN_POLICIES = {
+    "greedy": greedy_policy,
+}
+
+def load_policy(name):
+    if name in BUILTIN_POLICIES:
+        return BUILTIN_POLICIES[name]
+    agent = load_agent(name)
+    if not hasattr(agent, "run_batch"):
+        raise AttributeError(f"Agent '{name}' has no run_batch() function")
+    return agent.run_batch
+
+def load_policies(names):
+    policies = [load_policy(names[0])]
+    policies.append(policies[0] if names[1] == names[0] else load_policy(names[1]))
+    return policies
+
+def play_batch(policies, num_games, rng):
+    games = BatchGames(num_games)
+    while not games.is_over():
+        if policies[0] is policies[1]:
+            moves = policies[0](games.edges, games.current_player, rng)
+        else:
+            moves = np.empty(num_games, dtype=np.intp)
+            for p in range(2):
+                turn = games.current_player == p
+                if turn.any():
+                    moves[turn] = policies[p](games.edges[turn], games.current_player[turn], rng)
+        games.apply_moves(moves)
+    return games
+
+def simulate_chunk(policies, num_games, rng, keep_records=False):
+    games = play_batch(policies, num_games, rng)
+    diff = games.scores[:, 0].astype(np.int32) - games.scores[:, 1]
+    wins = np.array([(diff > 0).sum(), (diff < 0).sum(), (diff == 0).sum()], dtype=np.int64)
+    records = (games.moves, games.players, games.scores) if keep_records else None
+    return wins, games.scores.sum(axis=0, dtype=np.int64), records
+
+_worker_policies = None
+
+def _init_worker(names):
+    global _worker_policies
+    _worker_policies = load_policies(names)
+
+def _simulate_worker(task):
+    num_games, seed, keep_records = task
+    return simulate_chunk(_worker_policies, num_games, np.random.default_rng(seed), keep_records)
+
+def simulate(names, num_games, batch_size=10000, seed=None, out=None, workers=1):
+    chunks = [min(batch_size, num_games - i) for i in range(0, num_games, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))   # independent streams per chunk
+    tasks = [(n, s, out is not None) for n, s in zip(chunks, seeds)]
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(names,))
+        results = pool.imap(_simulate_worker, tasks)
+    else:
+        policies = load_policies(names)
+        results = (simulate_chunk(policies, n, np.random.default_rng(s), keep) for n, s, keep in tasks)
+
+    wins = np.zeros(3, dtype=np.int64)   # player 0, player 1, draw
+    total_score = np.zeros(2, dtype=np.int64)
+    records = []
+    try:
+        with tqdm(total=num_games, unit="game") as bar:
+            for n, (chunk_wins, chunk_score, chunk_records) in zip(chunks, results):
+                wins += chunk_wins
+                total_score += chunk_score
+                if chunk_records is not None:
+                    records.append(chunk_records)
+                bar.update(n)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if out:
+        np.savez_compressed(out,
+                            moves=np.concatenate([r[0] for r in records]),
+                            players=np.concatenate([r[1] for r in records]),
+                            scores=np.concatenate([r[2] for r in records]))
+    return wins, total_score
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized batch simulator for run_batch agents")
+    parser.add_argument("agent1", help="선공 정책 (agents/ 안의 run_batch 에이전트 또는 greedy)")
+    parser.add_argument("agent2", help="후공 정책")
+    parser.add_argument("--num-games", "-n", type=int, default=1000000,
+                        help="대국 판수 (default: 1000000)")
+    parser.add_argument("--batch-size", type=int, default=10000,
+                        help="한 번에 진행할 대국 수 (default: 10000)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="병렬 시뮬레이션 프로세스 수 (default: 1)")
+    parser.add_argument("--out", default=None,
+                        help="착수 기록을 저장할 .npz 파일")
+    args = parser.parse_args()
+
+    workers = min(args.workers, available_cpus())
+    start = time.perf_counter()
+    wins, total_score = simulate([args.agent1, args.agent2], args.num_games, args.batch_size,
+                                 args.seed, args.out, workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"==== {args.agent1} plays first ====")
+    print(f"Games             : {args.num_games} ({args.num_games / elapsed * 60:,.0f} games/min)")
+    print(f"{args.agent1} wins      : {wins[0]} ({wins[0]/args.num_games*100:.2f}%)")
+    print(f"{args.agent2} wins      : {wins[1]} ({wins[1]/args.num_games*100:.2f}%)")
+    print(f"Draws             : {wins[2]}")
+    print(f"Avg Player1 score : {total_score[0] / args.num_games:.3f}")
+    print(f"Avg Player2 score : {total_score[1] / args.num_games:.3f}")
+
+if __name__ == "__main__":
+    main()
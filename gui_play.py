@@ -1,85 +1,29 @@
 import os
+import time
+import threading
 import tkinter as tk
 import tkinter.font as tkfont
 from tkinter import messagebox, simpledialog
 import importlib.util
 
+from utils_coord import coord_to_idx, BoardState
+from match_client import RemoteAgent
+
 XSIZE = 5
 YSIZE = 5
-NUM_EDGES = 60   # 5x5 기준
 
 PLAYER1_EDGE_COLOR = "#087CA7"
 PLAYER2_EDGE_COLOR = "#D72638"
 PLAYER1_BOX_COLOR = "#A5D8F3"
 PLAYER2_BOX_COLOR = "#FFC9C9"
-
-
-# ======================
-# 좌표 계산 함수
-# ======================
-def coord_to_idx(x, y, z):
-    return (x * 6 + y) if z == 0 else (30 + x * 5 + y)
-
-def idx_to_coord(idx):
-    z = idx >= 30
-    base = 6 - z
-    i = idx - 30*z
-    return [i // base, i % base, int(z)]
-
-def get_box_edges(x, y):
-    top    = coord_to_idx(x,   y,   0)
-    bottom = coord_to_idx(x,   y+1, 0)
-    left   = coord_to_idx(x,   y,   1)
-    right  = coord_to_idx(x+1, y,   1)
-    return [top, bottom, left, right]
-
-def get_edge_squares(idx):
-    x, y, z = idx_to_coord(idx)
-    squares = []
-
-    if z == 0:  # horizontal
-        if y <= 4:
-            squares.append((x, y))
-        if 1 <= y <= 5:
-            squares.append((x, y-1))
-    else:       # vertical
-        if x <= 4:
-            squares.append((x, y))
-        if 1 <= x <= 5:
-            squares.append((x-1, y))
-
-    return squares
-    
-def apply_move(state_vec, square_owner, move_idx, player_id):
-    state_vec[move_idx] = player_id + 1
-    completed = 0
-
-    for (bx, by) in get_edge_squares(move_idx):
-        if square_owner[bx][by] != 0:
-            continue
-        edges = get_box_edges(bx, by)
-        if all(state_vec[e] != 0 for e in edges):
-            square_owner[bx][by] = (player_id + 1)
-            completed += 1
-
-    return completed
-
-def build_board_lines_from_state_vec(state_vec, xsize=5, ysize=5):
-    board_lines = [[[0, 0] for _ in range(6)] for _ in range(6)]
-
-    for idx, v in enumerate(state_vec):
-        x, y, z = idx_to_coord(idx)
-        if (z == 0 and x < xsize) or (z == 1 and y < ysize):
-            board_lines[x][y][z] = 1 if v != 0 else 0
-
-    return board_lines
+POLL_MS = 100   # how often the Tk loop checks on a running search
 
 
 # =====================================================
 #                      GUI (반응형 버전)
 # =====================================================
 class DotsAndBoxesGUI:
-    def __init__(self, root, agent_name="MapuAlpha", human_first=True):
+    def __init__(self, root, agent_name="MapuAlpha", human_first=True, server=None):
 
         # 화면 크기 기반 scaling
         sw = root.winfo_screenwidth()
@@ -109,18 +53,23 @@ class DotsAndBoxesGUI:
         )
         self.human_first = not (choice and choice.lower().startswith("a"))
 
-        # load agent
-        self.agent_module = load_agent(agent_name)
+        # load agent (server 주소가 있으면 match_server의 에이전트를 사용)
+        self.agent_module = RemoteAgent(agent_name, server) if server else load_agent(agent_name)
 
         # state
-        self.state_vec = [0] * NUM_EDGES
-        self.square_owner = [[0] * YSIZE for _ in range(XSIZE)]
+        self.board = BoardState()
         self.current_player = 0
         self.scores = [0, 0]
 
         # 🔒 입력 잠금 플래그
         self.input_locked = False
 
+        # 백그라운드 탐색: 결과는 root.after 폴링으로 받음
+        self.search_thread = None
+        self.search_result = None
+        self.search_started = 0.0
+        self.game_id = 0
+
         # Canvas
         self.canvas = tk.Canvas(root, width=self.canvas_size, height=self.canvas_size, bg="white")
         self.canvas.pack()
@@ -132,8 +81,8 @@ class DotsAndBoxesGUI:
         )
         self.info_label.pack(pady=5)
 
-        self.edge_items = {}
-        self.box_items = {}
+        self.edge_items = {}   # edge idx -> canvas item
+        self.box_items = {}    # box x * YSIZE + y -> canvas item
 
         self._create_board()
 
@@ -149,7 +98,7 @@ class DotsAndBoxesGUI:
         # 선공이 AI인 경우: 시작부터 입력 잠금 + AI 호출 예약
         if not self.human_first:
             self.input_locked = True
-            self.root.after(500, self.ai_move)
+            self.root.after(500, self.ai_move, self.game_id)
 
     # ====================================================
     #  반응형: 좌표 계산
@@ -166,7 +115,7 @@ class DotsAndBoxesGUI:
                 x2 = self.px(x+1)
                 y2 = self.px(y+1)
                 item = self.canvas.create_rectangle(x1, y1, x2, y2, outline="", fill="")
-                self.box_items[(x, y)] = item
+                self.box_items[x * YSIZE + y] = item
 
         # Horizontal edges
         for y in range(YSIZE + 1):
@@ -181,7 +130,7 @@ class DotsAndBoxesGUI:
                     fill="#dddddd"
                 )
                 self.canvas.tag_bind(item, "<Button-1>", lambda e, idx=move_idx: self.on_edge_click(idx))
-                self.edge_items[item] = move_idx
+                self.edge_items[move_idx] = item
 
         # Vertical edges
         for y in range(YSIZE):
@@ -196,7 +145,7 @@ class DotsAndBoxesGUI:
                     fill="#dddddd"
                 )
                 self.canvas.tag_bind(item, "<Button-1>", lambda e, idx=move_idx: self.on_edge_click(idx))
-                self.edge_items[item] = move_idx
+                self.edge_items[move_idx] = item
 
         # Dots
         for y in range(YSIZE + 1):
@@ -220,15 +169,12 @@ class DotsAndBoxesGUI:
 
         if not self.is_human_turn():
             return "break"
-        if move_idx < 0 or move_idx >= NUM_EDGES:
-            return
-        if self.state_vec[move_idx] != 0:
+        if not self.board.is_legal(move_idx):
             return
 
-        completed = apply_move(self.state_vec, self.square_owner, move_idx, self.current_player)
+        completed = self.board.apply_move(move_idx, self.current_player)
 
-        self.update_edges()
-        self.update_boxes()
+        self.redraw_move(move_idx)
 
         if completed > 0:
             self.scores[self.current_player] += completed
@@ -244,17 +190,43 @@ class DotsAndBoxesGUI:
         if not self.is_human_turn():
             # 이제 AI 턴 → 이 시점부터 들어오는 입력은 전부 잠금
             self.input_locked = True
-            self.root.after(200, self.ai_move)
+            self.root.after(200, self.ai_move, self.game_id)
 
-    def ai_move(self):
-        if self.is_game_over() or self.is_human_turn():
+    def ai_move(self, game_id):
+        # 예약된 사이에 Restart 했으면 이전 판의 차례
+        if game_id != self.game_id or self.is_game_over() or self.is_human_turn():
             return
 
-        board_lines = build_board_lines_from_state_vec(self.state_vec, XSIZE, YSIZE)
-        x, y, z = self.agent_module.run(board_lines, XSIZE, YSIZE)
+        # 탐색은 작업 스레드에서: Tk 루프는 계속 그리고, 결과는 _poll_search가 가져감
+        board_lines = self.board.to_board_lines()
+        self.search_result = None
+        self.search_started = time.perf_counter()
+        self.search_thread = threading.Thread(target=self._search, args=(board_lines,), daemon=True)
+        self.search_thread.start()
+        self.root.after(POLL_MS, self._poll_search, self.game_id)
+
+    def _search(self, board_lines):
+        try:
+            self.search_result = (True, self.agent_module.run(board_lines, XSIZE, YSIZE))
+        except Exception as e:
+            self.search_result = (False, e)
+
+    def _poll_search(self, game_id):
+        if game_id != self.game_id:
+            return
+        if self.search_result is None:
+            self.show_thinking()
+            self.root.after(POLL_MS, self._poll_search, game_id)
+            return
+        ok, result = self.search_result
+        self.search_result = None
+        if not ok:
+            messagebox.showerror("Error", f"Agent failed: {result}")
+            return
+        x, y, z = result
         move_idx = coord_to_idx(int(x), int(y), int(z))
 
-        if move_idx < 0 or move_idx >= NUM_EDGES or self.state_vec[move_idx] != 0:
+        if not self.board.is_legal(move_idx):
             messagebox.showerror("Error", f"Agent made a fatal mistake: {(x, y, z)}")
             self.current_player = 1 - self.current_player
             self.update_info()
@@ -263,10 +235,9 @@ class DotsAndBoxesGUI:
                 self.root.after(150, self.unlock_input)
             return
 
-        completed = apply_move(self.state_vec, self.square_owner, move_idx, self.current_player)
+        completed = self.board.apply_move(move_idx, self.current_player)
 
-        self.update_edges()
-        self.update_boxes()
+        self.redraw_move(move_idx)
         self.highlight_edge(move_idx)
 
         if completed > 0:
@@ -274,7 +245,7 @@ class DotsAndBoxesGUI:
             self.scores[self.current_player] += completed
             self.update_info()
             if not self.is_game_over():
-                self.root.after(200, self.ai_move)
+                self.root.after(200, self.ai_move, self.game_id)
             else:
                 self.end_game()
         else:
@@ -291,15 +262,10 @@ class DotsAndBoxesGUI:
         self.input_locked = False
 
     def highlight_edge(self, move_idx):
-        target_item = None
-        for item, idx in self.edge_items.items():
-            if idx == move_idx:
-                target_item = item
-                break
-        if target_item is None:
-            return
+        target_item = self.edge_items[move_idx]
+        game_id = self.game_id
 
-        owner = self.state_vec[move_idx]
+        owner = self.board.edge_owner[move_idx]
         if owner == 1:
             original = PLAYER1_EDGE_COLOR
         elif owner == 2:
@@ -308,8 +274,10 @@ class DotsAndBoxesGUI:
             original = "#dddddd"
 
         def blink(count=6):
+            if game_id != self.game_id:
+                return
             if count == 0:
-                self.update_edges()
+                self.draw_edge(move_idx)
                 return
             cur = self.canvas.itemcget(target_item, "fill")
             new = "yellow" if cur != "yellow" else original
@@ -322,29 +290,48 @@ class DotsAndBoxesGUI:
         return (self.current_player == 0) if self.human_first else (self.current_player == 1)
 
     def is_game_over(self):
-        return all(v != 0 for v in self.state_vec)
+        return self.board.is_over()
+
+    def draw_edge(self, idx):
+        owner = self.board.edge_owner[idx]
+        item = self.edge_items[idx]
+        if owner == 0:
+            self.canvas.itemconfig(item, fill="#dddddd")
+        elif owner == 1:
+            self.canvas.itemconfig(item, fill=PLAYER1_EDGE_COLOR)
+        elif owner == 2:
+            self.canvas.itemconfig(item, fill=PLAYER2_EDGE_COLOR)
+
+    def draw_box(self, box):
+        owner = self.board.box_owner[box]
+        item = self.box_items[box]
+        if owner == 0:
+            self.canvas.itemconfig(item, fill="", outline="")
+        elif owner == 1:
+            self.canvas.itemconfig(item, fill=PLAYER1_BOX_COLOR, outline="#4444ff")
+        elif owner == 2:
+            self.canvas.itemconfig(item, fill=PLAYER2_BOX_COLOR, outline="#ff4444")
+
+    def redraw_move(self, move_idx):
+        # 한 수로 바뀌는 것은 그 선과 양옆의 (최대 2개) 박스뿐
+        self.draw_edge(move_idx)
+        for box, _ in self.board.tables.edge_box_masks[move_idx]:
+            self.draw_box(box)
 
     def update_edges(self):
-        for item, idx in self.edge_items.items():
-            owner = self.state_vec[idx]
-            if owner == 0:
-                self.canvas.itemconfig(item, fill="#dddddd")
-            elif owner == 1:
-                self.canvas.itemconfig(item, fill=PLAYER1_EDGE_COLOR)
-            elif owner == 2:
-                self.canvas.itemconfig(item, fill=PLAYER2_EDGE_COLOR)
+        for idx in self.edge_items:
+            self.draw_edge(idx)
 
     def update_boxes(self):
-        for x in range(XSIZE):
-            for y in range(YSIZE):
-                owner = self.square_owner[x][y]
-                item = self.box_items[(x, y)]
-                if owner == 0:
-                    self.canvas.itemconfig(item, fill="", outline="")
-                elif owner == 1:
-                    self.canvas.itemconfig(item, fill=PLAYER1_BOX_COLOR, outline="#4444ff")
-                elif owner == 2:
-                    self.canvas.itemconfig(item, fill=PLAYER2_BOX_COLOR, outline="#ff4444")
+        for box in self.box_items:
+            self.draw_box(box)
+
+    def show_thinking(self):
+        text = f"Agent thinking... {time.perf_counter() - self.search_started:.1f}s"
+        if hasattr(self.agent_module, "search_progress"):
+            depth, nodes = self.agent_module.search_progress()
+            text += f"   |   depth {depth}   |   {nodes / 1e6:.1f}M nodes"
+        self.info_label.config(text=text, fg="blue")
 
     def update_info(self):
         p0 = "Human" if self.human_first else "Agent"
@@ -373,8 +360,22 @@ class DotsAndBoxesGUI:
         messagebox.showinfo("Game Over", f"{p0}: {s0}  |  {p1}: {s1}\nWinner: {w}")
 
     def reset_board(self):
-        self.state_vec = [0] * NUM_EDGES
-        self.square_owner = [[0]*YSIZE for _ in range(XSIZE)]
+        # 진행 중인 탐색의 결과는 이전 판의 것: game_id를 바로 올려 _poll_search가 버리게 함
+        self.game_id += 1
+        self.input_locked = True
+        self._start_new_game(self.game_id)
+
+    def _start_new_game(self, game_id):
+        if game_id != self.game_id:
+            return   # 그 사이에 다시 Restart
+        # 에이전트는 한 번에 한 탐색만: 진행 중인 탐색이 끝난 뒤 새 판
+        if self.search_thread is not None and self.search_thread.is_alive():
+            self.root.after(POLL_MS, self._start_new_game, game_id)
+            return
+        self.search_result = None
+        if hasattr(self.agent_module, "new_game"):
+            self.agent_module.new_game()
+        self.board = BoardState()
         self.scores = [0, 0]
         self.current_player = 0
 
@@ -406,8 +407,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--agent", type=str, default="MapuAlpha")
     parser.add_argument("--human-first", action="store_true", default=True)
+    parser.add_argument("--server", default=None,
+                        help="에이전트를 직접 불러오지 않고 match_server.py에 착수를 요청 (host:port 또는 소켓 경로)")
     args = parser.parse_args()
 
     root = tk.Tk()
-    gui = DotsAndBoxesGUI(root, agent_name=args.agent, human_first=args.human_first)
+    gui = DotsAndBoxesGUI(root, agent_name=args.agent, human_first=args.human_first, server=args.server)
     root.mainloop()
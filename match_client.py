@@ -0,0 +1,165 @@
+import os
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils_coord import board_tables, coord_to_idx
+
+DEFAULT_ADDRESS = "127.0.0.1:7878"
+
+# Line protocol of match_server.py: one JSON object per line each way. A request names its "op";
+# the reply carries the op's fields, or {"error": message} when it failed.
+#   play      {"agents": [first, second], "xsize", "ysize", "report", "replay"}
+#             -> {"scores", "forced_winner", "reason", "moves", "record"}, a whole game on one worker
+#   new_game  {"agents": [name, ...], "xsize", "ysize"} -> {"game"}; seats are numbered as listed
+#   move      {"game", "seat", "code"} -> {"move": [x, y, z], "edge", "time_ms", "time_left_ms", "timeout", "info"}
+#   end_game  {"game"} -> {}
+#   status    {} -> {"workers", "idle", "games", "waiting"}
+
+class MatchError(Exception):
+    pass
+
+def parse_address(address):
+    # "host:port" for TCP, anything with a path separator for a Unix socket
+    if os.sep in address or address.endswith(".sock"):
+        return socket.AF_UNIX, address
+    host, port = address.rsplit(":", 1)
+    return socket.AF_INET, (host, int(port))
+
+class MatchClient:
+    def __init__(self, address=DEFAULT_ADDRESS):
+        family, target = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.connect(target)
+        self.file = self.sock.makefile("rwb")
+
+    def request(self, op, **fields):
+        self.file.write(json.dumps({"op": op, **fields}).encode() + b"\n")
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise MatchError("match server closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise MatchError(reply["error"])
+        return reply
+
+    def play(self, first, second, xsize=5, ysize=5, report=False, replay=False):
+        return self.request("play", agents=[first, second], xsize=xsize, ysize=ysize, report=report, replay=replay)
+
+    def new_game(self, agents, xsize=5, ysize=5):
+        return self.request("new_game", agents=list(agents), xsize=xsize, ysize=ysize)["game"]
+
+    def move(self, game, seat, code):
+        return self.request("move", game=game, seat=seat, code=code)
+
+    def end_game(self, game):
+        self.request("end_game", game=game)
+
+    def status(self):
+        return self.request("status")
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class RemoteAgent:
+    # Stands in for an agent module (init/run/run_code/search_info); moves come from a warm worker
+    # of the match server, which keeps one game open and starts a new one when a position does not
+    # extend the last one with our answer drawn, the test the MapuAlpha engine uses, or on new_game().
+    def __init__(self, name, address=DEFAULT_ADDRESS):
+        self.name = name
+        self.client = MatchClient(address)
+        self.game = None
+        self.size = None
+        self.last_code = 0   # last position with our answer drawn
+        self.info = {}
+
+    def init(self):
+        pass
+
+    def run_code(self, code, xsize=5, ysize=5):
+        if self.game is None or (xsize, ysize) != self.size or self.last_code | code != code:
+            self.end_game()
+            self.game = self.client.new_game([self.name], xsize, ysize)
+            self.size = (xsize, ysize)
+        reply = self.client.move(self.game, 0, code)
+        self.info = reply["info"] or {}
+        self.last_code = code
+        if reply["edge"] is not None:
+            self.last_code |= board_tables(xsize, ysize).code_bits[reply["edge"]]
+        return reply["move"]
+
+    def run(self, board_lines, xsize=5, ysize=5):
+        code_bits = board_tables(xsize, ysize).code_bits
+        code = 0
+        for x, column in enumerate(board_lines):
+            for y, lines in enumerate(column):
+                for z, drawn in enumerate(lines):
+                    if drawn and (z == 0 and x < xsize or z == 1 and y < ysize):
+                        code |= code_bits[coord_to_idx(x, y, z, xsize, ysize)]
+        return self.run_code(code, xsize, ysize)
+
+    def search_info(self):
+        return self.info
+
+    def new_game(self):
+        # the next move opens a new game on the server, whose worker starts its agent afresh
+        self.end_game()
+
+    def end_game(self):
+        if self.game is not None:
+            self.client.end_game(self.game)
+            self.game = None
+
+    def close(self):
+        self.end_game()
+        self.client.close()
+
+class MatchPool:
+    # Plays evaluator games on a match server, `clients` requests in flight at once
+    def __init__(self, address=DEFAULT_ADDRESS, clients=1):
+        self.address = address
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(clients)
+        self.opened = []
+
+    def _client(self):
+        if not hasattr(self.local, "client"):
+            self.local.client = MatchClient(self.address)
+            self.opened.append(self.local.client)
+        return self.local.client
+
+    def _play(self, first, second, xsize, ysize, report, replay):
+        reply = self._client().play(first, second, xsize, ysize, report, replay)
+        p1_score, p2_score = reply["scores"]
+        return p1_score, p2_score, reply["forced_winner"], reply["reason"], reply["moves"], reply["record"]
+
+    def _play_pair(self, first, second, xsize, ysize):
+        return (self._play(first, second, xsize, ysize, False, False),
+                self._play(second, first, xsize, ysize, False, False))
+
+    def play_games(self, first, second, num_games, xsize=5, ysize=5, report=False, replay=False):
+        # same tuples as play_reported_game, in completion order
+        futures = [self.executor.submit(self._play, first, second, xsize, ysize, report, replay)
+                   for _ in range(num_games)]
+        for future in as_completed(futures):
+            yield future.result()
+
+    def play_pairs(self, first, second, num_pairs, xsize=5, ysize=5):
+        # (game with first moving first, game with second moving first) per pair, in completion order
+        futures = [self.executor.submit(self._play_pair, first, second, xsize, ysize) for _ in range(num_pairs)]
+        for future in as_completed(futures):
+            yield future.result()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        for client in self.opened:
+            client.close()
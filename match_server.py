@@ -0,0 +1,261 @@
+import os
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from play_game import MAX_TIME, load_agent, agent_choose_move, play_reported_game, set_pondering, available_cpus
+from match_client import DEFAULT_ADDRESS, parse_address
+from utils_coord import BoardState, idx_to_coord
+
+GRACE = 2.0   # seconds past a time budget before a worker that has not answered is killed
+
+# Worker process: keeps agents loaded across games, one module per (seat, name) as play_game loads
+# them, and serves requests from the server one at a time.
+def _worker_main(conn, ponder):
+    agents = {}
+
+    def agent(seat, name):
+        if (seat, name) not in agents:
+            agents[seat, name] = {"agent": load_agent(name), "name": name}
+            set_pondering([agents[seat, name]], ponder)
+        return agents[seat, name]
+
+    while True:
+        try:
+            op, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            if op == "load":
+                for name in args[0]:
+                    agent(0, name)
+                    agent(1, name)
+                result = None
+            elif op == "play":
+                names, xsize, ysize, report, replay = args
+                result = play_reported_game([agent(seat, name) for seat, name in enumerate(names)],
+                                            False, xsize, ysize, report, replay)
+            elif op == "new_game":
+                for seat, name in enumerate(args[0]):
+                    module = agent(seat, name)["agent"]
+                    if hasattr(module, "new_game"):
+                        module.new_game()
+                result = None
+            elif op == "move":
+                seat, name, code, xsize, ysize = args
+                module = agent(seat, name)["agent"]
+                board = BoardState.from_code(code, xsize, ysize)
+                start = time.perf_counter()
+                move = agent_choose_move(module, board, xsize, ysize)
+                elapsed = time.perf_counter() - start
+                info = module.search_info() if hasattr(module, "search_info") else None
+                result = (move, elapsed, info)
+            elif op == "end":
+                for loaded in agents.values():
+                    if hasattr(loaded["agent"], "stop_ponder"):
+                        loaded["agent"].stop_ponder()
+                result = None
+            else:
+                raise ValueError(f"unknown worker op {op!r}")
+            conn.send((True, result))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+class Worker:
+    def __init__(self, ctx, ponder, threads):
+        self.ctx = ctx
+        self.ponder = ponder
+        self.threads = threads   # blocking pipe reads run here, off the event loop
+        self.start()
+
+    def start(self):
+        self.conn, child = self.ctx.Pipe()
+        self.process = self.ctx.Process(target=_worker_main, args=(child, self.ponder), daemon=True)
+        self.process.start()
+        child.close()
+
+    def restart(self):
+        # a worker stuck in an agent cannot be interrupted, only replaced; its warm agents go with it
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.start()
+
+    def _call(self, op, args, timeout):
+        self.conn.send((op, args))
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        return self.conn.recv()
+
+    async def call(self, op, *args, timeout=None):
+        loop = asyncio.get_running_loop()
+        try:
+            ok, result = await loop.run_in_executor(self.threads, self._call, op, args, timeout)
+        except TimeoutError:
+            self.restart()
+            raise
+        except (EOFError, OSError):
+            self.restart()
+            raise RuntimeError("worker process died")
+        if not ok:
+            raise RuntimeError(result)
+        return result
+
+class Game:
+    def __init__(self, worker, agents, xsize, ysize):
+        self.worker = worker
+        self.agents = agents
+        self.xsize = xsize
+        self.ysize = ysize
+        self.time = [0.0] * len(agents)   # seconds used per seat, against MAX_TIME
+        self.lock = asyncio.Lock()        # one move at a time on the game's worker
+
+class MatchServer:
+    def __init__(self, workers, ponder=False):
+        ctx = multiprocessing.get_context("spawn")
+        self.threads = ThreadPoolExecutor(workers)
+        self.workers = [Worker(ctx, ponder, self.threads) for _ in range(workers)]
+        self.idle = asyncio.Queue()
+        for worker in self.workers:
+            self.idle.put_nowait(worker)
+        self.waiting = 0
+        self.games = {}
+        self.next_game = 0
+
+    async def preload(self, names):
+        await asyncio.gather(*(worker.call("load", names) for worker in self.workers))
+
+    async def acquire(self):
+        # a game holds one worker from start to end; later games wait for one to free up
+        self.waiting += 1
+        try:
+            return await self.idle.get()
+        finally:
+            self.waiting -= 1
+
+    async def release(self, worker):
+        try:
+            await worker.call("end", timeout=GRACE)
+        except (TimeoutError, RuntimeError):
+            pass
+        self.idle.put_nowait(worker)
+
+    async def play(self, agents, xsize=5, ysize=5, report=False, replay=False):
+        worker = await self.acquire()
+        try:
+            # per-player MAX_TIME is judged inside the game; this only catches an agent that never returns
+            result = await worker.call("play", agents, xsize, ysize, report, replay,
+                                       timeout=2 * MAX_TIME + GRACE)
+        except TimeoutError:
+            raise RuntimeError(f"game between {agents} overran {2 * MAX_TIME}s and its worker was killed")
+        finally:
+            await self.release(worker)
+        p1_score, p2_score, forced_winner, reason, move_stats, record = result
+        return {"scores": [p1_score, p2_score], "forced_winner": forced_winner, "reason": reason,
+                "moves": move_stats, "record": record}
+
+    async def new_game(self, agents, xsize=5, ysize=5):
+        worker = await self.acquire()
+        try:
+            await worker.call("new_game", agents)   # the worker's agents may still hold the last game it served
+        except Exception:
+            await self.release(worker)
+            raise
+        game = self.next_game
+        self.next_game += 1
+        self.games[game] = Game(worker, agents, xsize, ysize)
+        return {"game": game}
+
+    async def move(self, game, seat, code):
+        g = self.games[game]
+        async with g.lock:
+            budget = MAX_TIME - g.time[seat]
+            if budget <= 0:
+                raise RuntimeError(f"seat {seat} has no time left")
+            try:
+                move, elapsed, info = await g.worker.call("move", seat, g.agents[seat], code, g.xsize, g.ysize,
+                                                          timeout=budget + GRACE)
+            except TimeoutError:
+                g.time[seat] = MAX_TIME
+                raise RuntimeError(f"seat {seat} ran out of time and its worker was killed")
+            g.time[seat] += elapsed
+        return {"move": idx_to_coord(move, g.xsize, g.ysize) if move is not None else [-1, -1, -1],
+                "edge": move, "time_ms": elapsed * 1000,
+                "time_left_ms": max(0.0, MAX_TIME - g.time[seat]) * 1000,
+                "timeout": g.time[seat] > MAX_TIME, "info": info}
+
+    async def end_game(self, game):
+        g = self.games.pop(game, None)
+        if g is not None:
+            async with g.lock:
+                await self.release(g.worker)
+        return {}
+
+    async def status(self):
+        return {"workers": len(self.workers), "idle": self.idle.qsize(), "games": len(self.games),
+                "waiting": self.waiting}
+
+    async def handle(self, reader, writer):
+        opened = set()   # interactive games of this connection, ended when it closes
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    op = request.pop("op")
+                    if op not in ("play", "new_game", "move", "end_game", "status"):
+                        raise ValueError(f"unknown op {op!r}")
+                    reply = await getattr(self, op)(**request)
+                    if op == "new_game":
+                        opened.add(reply["game"])
+                    elif op == "end_game":
+                        opened.discard(request["game"])
+                except Exception as e:
+                    reply = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game in opened:
+                await self.end_game(game)
+            writer.close()
+
+    async def serve(self, address):
+        family, target = parse_address(address)
+        if isinstance(target, str):
+            if os.path.exists(target):
+                os.unlink(target)
+            server = await asyncio.start_unix_server(self.handle, path=target)
+        else:
+            server = await asyncio.start_server(self.handle, *target)
+        print(f"match server on {address} with {len(self.workers)} workers", flush=True)
+        async with server:
+            await server.serve_forever()
+
+async def _main(args):
+    server = MatchServer(args.workers, args.ponder)
+    if args.preload:
+        await server.preload(args.preload)
+    await server.serve(args.address)
+
+def main():
+    parser = argparse.ArgumentParser(description="Dots and Boxes match server")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS,
+                        help=f"host:port 또는 Unix 소켓 경로 (default: {DEFAULT_ADDRESS})")
+    parser.add_argument("--workers", "-w", type=int, default=available_cpus(),
+                        help="에이전트를 올려 두는 작업 프로세스 수, 동시에 진행되는 대국 수 (default: 코어 수)")
+    parser.add_argument("--preload", nargs="*", default=[],
+                        help="시작할 때 모든 작업 프로세스에 미리 불러올 에이전트 이름들")
+    parser.add_argument("--ponder", action="store_true",
+                        help="상대 차례에 백그라운드 탐색 허용 (default: 금지)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
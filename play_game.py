@@ -1,6 +1,9 @@
 import os
 import argparse
+import csv
 import importlib.util
+import json
+import multiprocessing
 import time
 from tqdm import tqdm
 
@@ -9,7 +12,9 @@ TIMEOUT = 2
 NORMAL = -1
 MAX_TIME = 24
 
-from utils_coord import coord_to_idx, idx_to_coord, apply_move, build_board_lines_from_state_vec
+from utils_coord import coord_to_idx, idx_to_coord, is_valid_coord, BoardState
+from replay import ReplayWriter
+from match_client import MatchPool
 
 def load_agent(agent_name):
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -31,18 +36,23 @@ def load_agent(agent_name):
     module.init()
     return module
 
-def agent_choose_move(agent_module, state_vec, xsize=5, ysize=5):
-    board_lines = build_board_lines_from_state_vec(state_vec, xsize, ysize)
-    move_coord = agent_module.run(board_lines, xsize, ysize)
+def agent_choose_move(agent_module, board, xsize=5, ysize=5):
+    if hasattr(agent_module, "run_code"):
+        # fast path: the edge bitmask code, no nested board_lines list to build and convert
+        move_coord = agent_module.run_code(board.code, xsize, ysize)
+    else:
+        move_coord = agent_module.run(board.to_board_lines(), xsize, ysize)
 
     if not isinstance(move_coord, (list, tuple)) or len(move_coord) != 3:
         raise ValueError(f"Agent run() must return (x, y, z), got: {move_coord}")
 
     x, y, z = int(move_coord[0]), int(move_coord[1]), int(move_coord[2])
-    move_idx = coord_to_idx(x, y, z)
+    if not is_valid_coord(x, y, z, xsize, ysize):
+        return None
+    move_idx = coord_to_idx(x, y, z, xsize, ysize)
     return move_idx
 
-def play_one_game(agents, print_log=False, xsize=5, ysize=5):
+def play_one_game(agents, print_log=False, xsize=5, ysize=5, move_stats=None, record=None):
     players = [
         {
             "agent" : agents[0]["agent"],
@@ -59,51 +69,131 @@ def play_one_game(agents, print_log=False, xsize=5, ysize=5):
     replay_data = [xsize, ysize]
     log_data = []
 
-    state_vec = [0.0] * 60          
-    square_owner = [[0] * ysize for _ in range(xsize)]
+    board = BoardState(xsize, ysize)
 
     forced_winner = -1
     reason = 0
 
     current_player = 0 
 
-    while True:
-        legal_moves = [i for i, v in enumerate(state_vec) if v == 0]
-        if not legal_moves:
-            break 
+    # a full clock and nothing kept from an earlier or aborted game
+    for player in players:
+        if hasattr(player["agent"], "new_game"):
+            player["agent"].new_game()
 
+    while not board.is_over():
         start = time.perf_counter()
-        move = agent_choose_move(players[current_player]["agent"], state_vec, xsize, ysize)
+        move = agent_choose_move(players[current_player]["agent"], board, xsize, ysize)
         elapsed = time.perf_counter() - start
         players[current_player]["time"] += elapsed
 
+        if move_stats is not None:
+            agent = players[current_player]["agent"]
+            stats = {"player": current_player, "edge": move, "time_ms": elapsed * 1000}
+            if hasattr(agent, "search_info"):
+                stats.update(agent.search_info())
+            move_stats.append(stats)
+
         if players[current_player]["time"] > MAX_TIME:
             forced_winner = 1 - current_player
             reason = TIMEOUT
             break
 
         replay_data.append(current_player)
-        replay_data.extend(idx_to_coord(move))
+        replay_data.extend(idx_to_coord(move, xsize, ysize) if move is not None else [-1, -1, -1])
+        if record is not None:
+            record.append((move, elapsed * 1000))
 
-        if move is None or not (0 <= move < 60) or state_vec[move] != 0:
+        if not board.is_legal(move):
             forced_winner = not current_player
             reason = INVALID_MOVE
             break 
 
-        completed = apply_move(state_vec, square_owner, move, current_player)
+        completed = board.apply_move(move, current_player)
 
         if completed > 0:
             players[current_player]["score"] += completed
         else:
             current_player = 1 - current_player
 
+    # a ponder search must not keep running into the next game
+    for player in players:
+        if hasattr(player["agent"], "stop_ponder"):
+            player["agent"].stop_ponder()
+
     if print_log:
-        print(",".join(map(str,replay_data)))
-        print(players[0]["score"], players[1]["score"])
+        # single write so lines from parallel workers do not interleave
+        print(f"{','.join(map(str, replay_data))}\n{players[0]['score']} {players[1]['score']}", flush=True)
 
     return players[0]["score"], players[1]["score"], forced_winner, reason
 
-def evaluate_agents(agents, num_games=1000, xsize=5, ysize=5, print_log=False):
+# Each worker process loads its own copy of the agents: a loaded agent keeps the state of the
+# game it is playing (MapuAlpha one engine per load), so it must never be shared between games in flight.
+_worker_agents = None
+
+def _init_worker(agent_names, ponder):
+    global _worker_agents
+    _worker_agents = [{"agent": load_agent(name), "name": name} for name in agent_names]
+    set_pondering(_worker_agents, ponder)
+
+def set_pondering(agents, ponder):
+    # searching on the opponent's time takes CPU from the opponent, so it is opt-in
+    for agent in agents:
+        if hasattr(agent["agent"], "set_ponder"):
+            agent["agent"].set_ponder(ponder)
+
+def _play_game_worker(task):
+    swapped, print_log, xsize, ysize, report, replay = task
+    agents = _worker_agents[::-1] if swapped else _worker_agents
+    return play_reported_game(agents, print_log, xsize, ysize, report, replay)
+
+def play_reported_game(agents, print_log, xsize, ysize, report, replay=False):
+    move_stats = [] if report else None
+    record = [] if replay else None
+    result = play_one_game(agents, print_log=print_log, xsize=xsize, ysize=ysize,
+                           move_stats=move_stats, record=record)
+    return result + (move_stats, record)
+
+def summarize_moves(move_stats, player):
+    moves = [m for m in move_stats if m["player"] == player]
+    summary = {
+        "moves": len(moves),
+        "time_ms": sum(m["time_ms"] for m in moves),
+    }
+    searched = [m for m in moves if "nodes" in m]
+    if searched:
+        # unused budget carries over to later moves, so budgets are only comparable move by move
+        summary["avg_budget_ms"] = sum(m["budget_ms"] for m in searched) / len(searched)
+        summary["avg_budget_used"] = sum(m["used_ms"] / m["budget_ms"] for m in searched if m["budget_ms"] > 0) / len(searched)
+        summary["nodes"] = sum(m["nodes"] for m in searched)
+        summary["avg_depth"] = sum(m["depth"] for m in searched) / len(searched)
+        summary["stopped_by_clock"] = sum(not m["finished"] for m in searched)
+        summary["book_moves"] = sum(m["book"] for m in searched)
+        summary["ponder_hits"] = sum(m.get("ponder_hit", False) for m in searched)
+    return summary
+
+def write_report(path, games):
+    if path.endswith(".csv"):
+        # one row per move
+        rows = [{"game": g["game"], "first": g["first"], "second": g["second"], **m}
+                for g in games for m in g["moves"]]
+        fields = list(dict.fromkeys(key for row in rows for key in row))
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w") as f:
+            json.dump(games, f, indent=1)
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def evaluate_agents(agents, num_games=1000, xsize=5, ysize=5, print_log=False, workers=1, report=None,
+                    ponder=False, replay=None, server=None):
     players = [
         {
             "agent": agents[0]["agent"],
@@ -118,71 +208,134 @@ def evaluate_agents(agents, num_games=1000, xsize=5, ysize=5, print_log=False):
             "total_score": 0,
         }
     ]
-    
-    for i in range(2):
-        players[0]["wins"] = 0
-        players[1]["wins"] = 0
-        players[0]["total_score"] = 0
-        players[1]["total_score"] = 0
-
-        for game_idx in tqdm(range(num_games),
-                             desc=f"{players[0]['name']} vs {players[1]['name']}",
-                             disable=print_log):
-            p1_score, p2_score, forced_winner, reason = play_one_game(
-                agents,
-                print_log=print_log,
-                xsize=xsize,
-                ysize=ysize
-            )
 
-            players[0]["total_score"] += p1_score
-            players[1]["total_score"] += p2_score
-
-            if forced_winner == -1:
-                if p1_score > p2_score:
-                    players[0]["wins"] += 1
-                    last_result = "win"
-                    last_reason = "normal"
-                elif p1_score < p2_score:
-                    players[1]["wins"] += 1
-                    last_result = "lose"
-                    last_reason = "normal"
-            elif forced_winner == 0:
+    # Move times are wall-clock, so more workers than cores would charge agents for time
+    # spent waiting on the scheduler and turn a loaded machine into spurious timeouts.
+    cpus = available_cpus()
+    if workers > cpus:
+        tqdm.write(f"--workers {workers} exceeds {cpus} available cores, using {cpus}")
+        workers = cpus
+
+    pool = None
+    if server:
+        # thin client: the server's warm workers play the games, pondering is its own setting
+        pool = MatchPool(server, workers)
+    else:
+        set_pondering(agents, ponder)
+    if pool is None and workers > 1:
+        pool = multiprocessing.get_context("spawn").Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=([agent["name"] for agent in agents], ponder)
+        )
+
+    games = [] if report else None
+    writer = ReplayWriter(replay, xsize, ysize) if replay else None
+    try:
+        for i in range(2):
+            _evaluate_half(agents, players, pool, i == 1, num_games, xsize, ysize, print_log, games, writer)
+    finally:
+        if isinstance(pool, MatchPool):
+            pool.close()
+        elif pool is not None:
+            pool.close()
+            pool.join()
+        if writer is not None:
+            writer.close()
+
+    if replay:
+        print(f"Replays of {len(writer.offsets)} games written to {replay}")
+
+    if report:
+        write_report(report, games)
+        print(f"Search report for {len(games)} games written to {report}")
+
+def _evaluate_half(agents, players, pool, swapped, num_games, xsize, ysize, print_log, games=None, writer=None):
+    players[0]["wins"] = 0
+    players[1]["wins"] = 0
+    players[0]["total_score"] = 0
+    players[1]["total_score"] = 0
+
+    report = games is not None
+    replay = writer is not None
+    if pool is None:
+        results = (play_reported_game(agents, print_log, xsize, ysize, report, replay)
+                   for _ in range(num_games))
+    elif isinstance(pool, MatchPool):
+        results = pool.play_games(players[0]["name"], players[1]["name"], num_games, xsize, ysize, report, replay)
+    else:
+        # games finish out of order; the summary only depends on the totals
+        results = pool.imap_unordered(_play_game_worker,
+                                      [(swapped, print_log, xsize, ysize, report, replay)] * num_games)
+
+    for game_idx, (p1_score, p2_score, forced_winner, reason, move_stats, record) in enumerate(
+            tqdm(results, total=num_games,
+                 desc=f"{players[0]['name']} vs {players[1]['name']}",
+                 disable=print_log)):
+        players[0]["total_score"] += p1_score
+        players[1]["total_score"] += p2_score
+
+        if forced_winner == -1:
+            if p1_score > p2_score:
                 players[0]["wins"] += 1
                 last_result = "win"
-                last_reason = "opponent timeout" if reason == TIMEOUT else "opponent invalid move"
-                tqdm.write(
-                    f"{players[0]['name']} won because opponent "
-                    f"{'timeout' if reason == TIMEOUT else 'wrong move'}"
-                )
-            elif forced_winner == 1:
+                last_reason = "normal"
+            elif p1_score < p2_score:
                 players[1]["wins"] += 1
                 last_result = "lose"
-                last_reason = "timeout" if reason == TIMEOUT else "invalid move"
-                tqdm.write(
-                    f"{players[1]['name']} won because opponent "
-                    f"{'timeout' if reason == TIMEOUT else 'wrong move'}"
-                )
-
-            games_played = game_idx + 1
-            win_rate = players[0]["wins"] / games_played * 100
-
+                last_reason = "normal"
+        elif forced_winner == 0:
+            players[0]["wins"] += 1
+            last_result = "win"
+            last_reason = "opponent timeout" if reason == TIMEOUT else "opponent invalid move"
             tqdm.write(
-                f"[{games_played}/{num_games}] "
-                f"{players[0]['name']} as first: {last_result} "
-                f"({last_reason}), current win rate = {win_rate:.2f}%"
+                f"{players[0]['name']} won because opponent "
+                f"{'timeout' if reason == TIMEOUT else 'wrong move'}"
+            )
+        elif forced_winner == 1:
+            players[1]["wins"] += 1
+            last_result = "lose"
+            last_reason = "timeout" if reason == TIMEOUT else "invalid move"
+            tqdm.write(
+                f"{players[1]['name']} won because opponent "
+                f"{'timeout' if reason == TIMEOUT else 'wrong move'}"
             )
 
-        print(f"==== {players[0]['name']} plays first ====")
-        print(f"Games             : {num_games}")
-        print(f"{players[0]['name']} wins      : {players[0]['wins']} ({players[0]['wins']/num_games*100:.2f}%)")
-        print(f"{players[1]['name']} wins      : {players[1]['wins']} ({players[1]['wins']/num_games*100:.2f}%)")
-        print(f"Avg Player1 score : {players[0]['total_score'] / num_games:.3f}")
-        print(f"Avg Player2 score : {players[1]['total_score'] / num_games:.3f}")
-        print("")
-
-        players[0], players[1] = players[1], players[0]
-        agents[0], agents[1] = agents[1], agents[0]
+        if replay:
+            writer.write_game(players[0]["name"], players[1]["name"], (p1_score, p2_score),
+                              forced_winner, reason, [m for m, _ in record], [t for _, t in record])
+
+        if report:
+            games.append({
+                "game": len(games),
+                "first": players[0]["name"],
+                "second": players[1]["name"],
+                "scores": [p1_score, p2_score],
+                "forced_winner": forced_winner,
+                "reason": reason,
+                "players": [summarize_moves(move_stats, 0), summarize_moves(move_stats, 1)],
+                "moves": move_stats,
+            })
+
+        games_played = game_idx + 1
+        win_rate = players[0]["wins"] / games_played * 100
+
+        tqdm.write(
+            f"[{games_played}/{num_games}] "
+            f"{players[0]['name']} as first: {last_result} "
+            f"({last_reason}), current win rate = {win_rate:.2f}%"
+        )
+
+    print(f"==== {players[0]['name']} plays first ====")
+    print(f"Games             : {num_games}")
+    print(f"{players[0]['name']} wins      : {players[0]['wins']} ({players[0]['wins']/num_games*100:.2f}%)")
+    print(f"{players[1]['name']} wins      : {players[1]['wins']} ({players[1]['wins']/num_games*100:.2f}%)")
+    print(f"Avg Player1 score : {players[0]['total_score'] / num_games:.3f}")
+    print(f"Avg Player2 score : {players[1]['total_score'] / num_games:.3f}")
+    print("")
+
+    players[0], players[1] = players[1], players[0]
+    agents[0], agents[1] = agents[1], agents[0]
 
 def main():
     parser = argparse.ArgumentParser(
@@ -194,11 +347,27 @@ def main():
                         help="대국 판수 (default: 100)")
     parser.add_argument("--log", action="store_true",
                         help="게임 로그 출력")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="병렬 대국 프로세스 수 (default: 1)")
+    parser.add_argument("--xsize", type=int, default=5,
+                        help="가로 칸 수 (default: 5)")
+    parser.add_argument("--ysize", type=int, default=5,
+                        help="세로 칸 수 (default: 5)")
+    parser.add_argument("--report", default=None,
+                        help="착수별 탐색 통계를 저장할 파일 (.json 또는 .csv)")
+    parser.add_argument("--replay", default=None,
+                        help="대국 기록을 저장할 바이너리 리플레이 파일 (replay.py로 읽기)")
+    parser.add_argument("--ponder", action="store_true",
+                        help="상대 차례에 백그라운드 탐색 허용 (default: 금지)")
+    parser.add_argument("--server", default=None,
+                        help="대국을 맡길 match_server.py 주소 (host:port 또는 소켓 경로), "
+                             "--workers는 동시에 보내는 대국 수")
 
     args = parser.parse_args()
 
-    a1 = load_agent(args.agent1)
-    a2 = load_agent(args.agent2)
+    # with a server the agents are loaded there, not here
+    a1 = load_agent(args.agent1) if not args.server else None
+    a2 = load_agent(args.agent2) if not args.server else None
 
     agents = [
         {
@@ -210,7 +379,9 @@ def main():
         }
     ]
 
-    evaluate_agents(agents, num_games=args.num_games, print_log=args.log)
+    evaluate_agents(agents, num_games=args.num_games, xsize=args.xsize, ysize=args.ysize,
+                    print_log=args.log, workers=args.workers,
+                    report=args.report, ponder=args.ponder, replay=args.replay, server=args.server)
 
 if __name__ == "__main__":
     main()
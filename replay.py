@@ -0,0 +1,176 @@
+import mmap
+import struct
+import numpy as np
+
+from utils_coord import BoardState
+
+# Binary replay file:
+#   header   "DBRP" | uint16 version | uint8 xsize | uint8 ysize
+#   games    per game: GAME header | uint8 moves[n] (edge index, NO_MOVE for an invalid move)
+#            | float16 times[n] (ms spent on each move)
+#   footer   uint16 name count | (uint8 length, utf-8 name) per agent | uint64 offsets[games]
+#   trailer  uint64 footer offset | uint32 games | "DBRI"
+# A file without its trailer (the writer was killed) is still readable; the index is rebuilt by a scan.
+MAGIC = b"DBRP"
+INDEX_MAGIC = b"DBRI"
+VERSION = 1
+NO_MOVE = 255
+
+HEADER = struct.Struct("<4sHBB")
+GAME = struct.Struct("<HBBBBbB")    # moves, first agent, second agent, scores, forced winner, reason
+TRAILER = struct.Struct("<QI4s")
+
+class ReplayWriter:
+    def __init__(self, path, xsize=5, ysize=5, buffer_size=1 << 20):
+        self.file = open(path, "wb", buffering=buffer_size)
+        self.file.write(HEADER.pack(MAGIC, VERSION, xsize, ysize))
+        self.pos = HEADER.size
+        self.names = {}
+        self.offsets = []
+
+    def agent_id(self, name):
+        if name not in self.names:
+            self.names[name] = len(self.names)
+        return self.names[name]
+
+    def write_game(self, first, second, scores, forced_winner, reason, moves, times):
+        record = (GAME.pack(len(moves), self.agent_id(first), self.agent_id(second),
+                            scores[0], scores[1], forced_winner, reason)
+                  + bytes(NO_MOVE if m is None else m for m in moves)
+                  + np.asarray(times, dtype="<f2").tobytes())
+        self.offsets.append(self.pos)
+        self.file.write(record)
+        self.pos += len(record)
+
+    def close(self):
+        if self.file.closed:
+            return
+        footer = [struct.pack("<H", len(self.names))]
+        for name in self.names:
+            encoded = name.encode()
+            footer.append(struct.pack("<B", len(encoded)) + encoded)
+        footer.append(np.asarray(self.offsets, dtype="<u8").tobytes())
+        footer.append(TRAILER.pack(self.pos, len(self.offsets), INDEX_MAGIC))
+        self.file.write(b"".join(footer))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ReplayGame:
+    __slots__ = ("reader", "offset", "num_moves", "agents", "scores", "forced_winner", "reason")
+
+    def __init__(self, reader, offset):
+        n, first, second, score0, score1, forced_winner, reason = GAME.unpack_from(reader.buf, offset)
+        self.reader = reader
+        self.offset = offset + GAME.size
+        self.num_moves = n
+        self.agents = (reader.agent_name(first), reader.agent_name(second))
+        self.scores = (score0, score1)
+        self.forced_winner = forced_winner
+        self.reason = reason
+
+    @property
+    def moves(self):
+        # uint8 view into the mapped file, nothing is copied
+        return np.frombuffer(self.reader.buf, dtype=np.uint8, count=self.num_moves, offset=self.offset)
+
+    @property
+    def times(self):
+        return np.frombuffer(self.reader.buf, dtype="<f2", count=self.num_moves, offset=self.offset + self.num_moves)
+
+    def __iter__(self):
+        # (player, edge, time_ms) per move; the player follows from replaying box completions
+        board = BoardState(self.reader.xsize, self.reader.ysize)
+        player = 0
+        buf, times = self.reader.buf, self.times
+        for i in range(self.num_moves):
+            edge = buf[self.offset + i]
+            yield player, (None if edge == NO_MOVE else edge), float(times[i])
+            if edge == NO_MOVE or not board.is_legal(edge):
+                break
+            if board.apply_move(edge, player) == 0:
+                player = 1 - player
+
+class ReplayReader:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.xsize, self.ysize = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} replay file")
+        self.names = []
+        if not self._read_index():
+            self.offsets = self._scan()
+
+    def _read_index(self):
+        if len(self.buf) < HEADER.size + TRAILER.size:
+            return False
+        footer, games, magic = TRAILER.unpack_from(self.buf, len(self.buf) - TRAILER.size)
+        if magic != INDEX_MAGIC:
+            return False
+        pos = footer
+        (count,) = struct.unpack_from("<H", self.buf, pos)
+        pos += 2
+        for _ in range(count):
+            length = self.buf[pos]
+            self.names.append(self.buf[pos + 1:pos + 1 + length].decode())
+            pos += 1 + length
+        self.offsets = np.frombuffer(self.buf, dtype="<u8", count=games, offset=pos)
+        return True
+
+    def _scan(self):
+        # unfinished file: walk the game records; agent names were never written
+        offsets = []
+        pos = HEADER.size
+        while pos + GAME.size <= len(self.buf):
+            n = struct.unpack_from("<H", self.buf, pos)[0]
+            end = pos + GAME.size + 3 * n
+            if end > len(self.buf):
+                break
+            offsets.append(pos)
+            pos = end
+        return np.array(offsets, dtype=np.uint64)
+
+    def agent_name(self, agent_id):
+        return self.names[agent_id] if agent_id < len(self.names) else f"agent{agent_id}"
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, n):
+        return ReplayGame(self, int(self.offsets[n]))
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def to_arrays(self, start=0, stop=None):
+        # games [start, stop) as padded arrays: moves (NO_MOVE after the end), times (NaN), lengths, scores
+        games = [self[n] for n in range(start, len(self) if stop is None else stop)]
+        width = max((g.num_moves for g in games), default=0)
+        moves = np.full((len(games), width), NO_MOVE, dtype=np.uint8)
+        times = np.full((len(games), width), np.nan, dtype=np.float32)
+        for i, g in enumerate(games):
+            moves[i, :g.num_moves] = g.moves
+            times[i, :g.num_moves] = g.times
+        lengths = np.array([g.num_moves for g in games], dtype=np.int32)
+        scores = np.array([g.scores for g in games], dtype=np.int16).reshape(-1, 2)
+        return moves, times, lengths, scores
+
+    def close(self):
+        self.offsets = None
+        try:
+            self.buf.close()
+        except BufferError:   # moves/times arrays handed out still point into the map; it closes with them
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
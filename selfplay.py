@@ -0,0 +1,184 @@
+import os
+import argparse
+import json
+import multiprocessing
+import numpy as np
+from tqdm import tqdm
+
+from utils_coord import BoardState, coord_to_idx, is_valid_coord
+from play_game import load_agent, agent_choose_move, available_cpus
+
+NO_VALUE = -128   # value of a move the agent did not report one for
+
+# One fixed-width record per searched position. edges is the utils_coord edge bitmask
+# (bit idx = edge idx) split into little-endian uint64 words; score_diff, value and outcome
+# are seen from the side to move.
+def record_dtype(xsize, ysize):
+    words = (xsize * (ysize + 1) + (xsize + 1) * ysize + 63) // 64
+    return np.dtype([
+        ("edges", "<u8", (words,)),
+        ("to_move", "i1"),
+        ("score_diff", "i1"),
+        ("move", "u1"),
+        ("value", "i1"),        # agent's search value: box margin over the rest of the game,
+                                # forced captures included (NO_VALUE only for agents without analyze)
+        ("outcome", "i1"),      # final margin of the game, score_diff included
+        ("ply", "u1"),
+        ("game", "<u4"),        # game number within the shard
+    ])
+
+def choose(agent, board, xsize, ysize, time_ms, score_diff):
+    if hasattr(agent, "analyze"):
+        move_coord, value = agent.analyze(board.code, xsize, ysize, time_ms, score_diff)
+        if not is_valid_coord(*move_coord, xsize, ysize):
+            return None, NO_VALUE
+        return coord_to_idx(*move_coord, xsize, ysize), value
+    return agent_choose_move(agent, board, xsize, ysize), NO_VALUE
+
+def play_game(agent, xsize, ysize, time_ms, random_plies, rng, out, game):
+    # fills out[0:n] with the game's searched positions and returns n
+    board = BoardState(xsize, ysize)
+    words = out.dtype["edges"].shape[0]
+    scores = [0, 0]
+    player = 0
+    n = 0
+    ply = 0
+    while not board.is_over():
+        if ply < random_plies:
+            move = int(rng.choice(sorted(board.legal_moves)))   # opening diversity, not recorded
+        else:
+            move, value = choose(agent, board, xsize, ysize, time_ms, scores[player] - scores[1 - player])
+            if not board.is_legal(move):
+                raise ValueError(f"agent returned an illegal move {move} at ply {ply}")
+            row = out[n]
+            row["edges"] = [(board.edges >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(words)]
+            row["to_move"] = player
+            row["score_diff"] = scores[player] - scores[1 - player]
+            row["move"] = move
+            row["value"] = value
+            row["ply"] = ply
+            row["game"] = game
+            n += 1
+        completed = board.apply_move(move, player)
+        scores[player] += completed
+        if not completed:
+            player = 1 - player
+        ply += 1
+    final = scores[0] - scores[1]
+    out["outcome"][:n] = np.where(out["to_move"][:n] == 0, final, -final)
+    return n
+
+def shard_path(out_dir, shard):
+    return os.path.join(out_dir, f"shard-{shard:06d}.npy")
+
+def write_shard(out_dir, shard, records):
+    # write then rename, so a shard file on disk is always complete
+    path = shard_path(out_dir, shard)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, records)
+    os.replace(tmp, path)
+
+_worker = None
+
+def _init_worker(agent_name, config):
+    global _worker
+    _worker = (load_agent(agent_name), config)
+
+def _play_shard(shard):
+    agent, config = _worker
+    xsize, ysize = config["xsize"], config["ysize"]
+    rng = np.random.default_rng([config["seed"], shard])   # a resumed run replays the same shard seeds
+    if hasattr(agent, "set_seed"):
+        agent.set_seed(int(rng.integers(1 << 31)))
+    num_edges = xsize * (ysize + 1) + (xsize + 1) * ysize
+    # memory is bounded by one shard plus one game per worker
+    buf = np.zeros(config["shard_size"] + num_edges, dtype=record_dtype(xsize, ysize))
+    count = 0
+    game = 0
+    while count < config["shard_size"]:
+        count += play_game(agent, xsize, ysize, config["time_ms"], config["random_plies"], rng,
+                           buf[count:], game)
+        game += 1
+    write_shard(config["out"], shard, buf[:count])
+    return count
+
+def selfplay(agent_name, out, positions, shard_size=100000, time_ms=50, random_plies=4,
+             xsize=5, ysize=5, seed=0, workers=1):
+    os.makedirs(out, exist_ok=True)
+    config = {"agent": agent_name, "xsize": xsize, "ysize": ysize, "time_ms": time_ms,
+              "random_plies": random_plies, "shard_size": shard_size, "seed": seed,
+              "dtype": str(record_dtype(xsize, ysize).descr)}
+    meta_path = os.path.join(out, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            old = json.load(f)
+        if old != config:
+            raise ValueError(f"{out} holds a run with different settings: {old}")
+    else:
+        with open(meta_path, "w") as f:
+            json.dump(config, f, indent=1)
+    config["out"] = out
+
+    # shards are complete or absent; resume by skipping the ones already written
+    num_shards = -(-positions // shard_size)
+    todo = [s for s in range(num_shards) if not os.path.exists(shard_path(out, s))]
+    done = num_shards - len(todo)
+    if done:
+        print(f"resuming: {done} of {num_shards} shards already in {out}")
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker,
+                                                         initargs=(agent_name, config))
+        results = pool.imap_unordered(_play_shard, todo)
+    else:
+        _init_worker(agent_name, config)
+        results = map(_play_shard, todo)
+
+    total = 0
+    try:
+        with tqdm(total=len(todo) * shard_size, unit="pos") as bar:
+            for count in results:
+                total += count
+                bar.update(count)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return total
+
+def load_shards(out, mmap_mode="r"):
+    # every finished shard as a memory-mapped record array
+    names = sorted(f for f in os.listdir(out) if f.startswith("shard-") and f.endswith(".npy"))
+    return [np.load(os.path.join(out, name), mmap_mode=mmap_mode) for name in names]
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-play training data generator")
+    parser.add_argument("agent", help="agents/ 디렉토리 안의 에이전트 이름 (자기 자신과 대국)")
+    parser.add_argument("--out", "-o", required=True,
+                        help="샤드(.npy)를 저장할 디렉토리, 같은 설정이면 이어서 생성")
+    parser.add_argument("--positions", "-n", type=int, default=1000000,
+                        help="생성할 국면 수 (default: 1000000)")
+    parser.add_argument("--shard-size", type=int, default=100000,
+                        help="샤드 하나의 국면 수 (default: 100000)")
+    parser.add_argument("--time-ms", type=float, default=50,
+                        help="착수당 탐색 시간, analyze()가 있는 에이전트만 (default: 50)")
+    parser.add_argument("--random-plies", type=int, default=4,
+                        help="다양성을 위한 무작위 초반 착수 수, 기록하지 않음 (default: 4)")
+    parser.add_argument("--xsize", type=int, default=5,
+                        help="가로 칸 수 (default: 5)")
+    parser.add_argument("--ysize", type=int, default=5,
+                        help="세로 칸 수 (default: 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="병렬 생성 프로세스 수 (default: 1)")
+    args = parser.parse_args()
+
+    total = selfplay(args.agent, args.out, args.positions, args.shard_size, args.time_ms,
+                     args.random_plies, args.xsize, args.ysize, args.seed,
+                     min(args.workers, available_cpus()))
+    print(f"{total} positions written to {args.out}")
+
+if __name__ == "__main__":
+    main()
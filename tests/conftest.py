@@ -0,0 +1,7 @@
+import os, sys
+
+# the scripts and the MapuAlpha build are imported the way the tools import them, from the repo root
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(ROOT_DIR, "agents", "MapuAlpha"), ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
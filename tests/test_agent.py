@@ -0,0 +1,81 @@
+import glob
+import importlib.util
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("MapuAlpha")
+
+from conftest import ROOT_DIR
+from play_game import MAX_TIME, NORMAL, agent_choose_move, load_agent, play_one_game
+from utils_coord import BoardState
+
+def test_loaded_agents_have_their_own_engines():
+    # two seats of one process: a move searched by one must not touch the other's clock or statistics
+    a, b = load_agent("MapuAlpha"), load_agent("MapuAlpha")
+    assert a.engine(5, 5) is not b.engine(5, 5)
+    before = b.search_info()
+    board = BoardState()
+    assert board.is_legal(agent_choose_move(a, board))
+    assert a.search_info()["time_left_ms"] < before["time_left_ms"]
+    assert b.search_info() == before
+
+def test_board_sizes_share_a_process():
+    agent = load_agent("MapuAlpha")
+    for xsize, ysize in ((5, 5), (4, 3), (6, 6)):
+        if (xsize, ysize) != (5, 5) and importlib.util.find_spec(f"MapuAlpha_{xsize}x{ysize}") is None:
+            continue   # that size was not built here
+        board = BoardState(xsize, ysize)
+        assert board.is_legal(agent_choose_move(agent, board, xsize, ysize))
+
+def load_copy(tmp_path, name):
+    # the agent copied to another directory with the builds as they are, loaded the way load_agent loads one
+    agent_dir = os.path.join(ROOT_DIR, "agents", "MapuAlpha")
+    copy_dir = os.path.join(tmp_path, name)
+    os.makedirs(copy_dir)
+    for path in [os.path.join(agent_dir, "main.py")] + glob.glob(os.path.join(agent_dir, "MapuAlpha.*.so")):
+        shutil.copy(path, copy_dir)
+    spec = importlib.util.spec_from_file_location(f"agent_{name}", os.path.join(copy_dir, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_copied_build_is_refused(tmp_path):
+    # same module name from another file: it would silently be the engine already loaded
+    load_agent("MapuAlpha")
+    with pytest.raises(ImportError, match="already loaded"):
+        load_copy(tmp_path, "MapuAlpha")
+
+def test_copy_needs_its_own_build(tmp_path):
+    with pytest.raises(ImportError, match="MapuAlphaCopy is not built"):
+        load_copy(tmp_path, "MapuAlphaCopy")
+
+def test_new_game_is_detected_or_announced():
+    # a later position that lacks our last answer is another game, whatever its move count
+    agent = load_agent("MapuAlpha")
+    full = agent.search_info()["time_left_ms"]
+    board = BoardState()
+    for move in range(0, 40, 3):
+        board.apply_move(move, 0)
+    ours = agent_choose_move(agent, board)
+    assert agent.search_info()["time_left_ms"] < full - 2
+    other = BoardState.from_code(board.code)
+    other.apply_move(next(m for m in sorted(other.legal_moves) if m != ours), 0)
+    assert other.is_legal(agent_choose_move(agent, other))
+    info = agent.search_info()
+    assert info["time_left_ms"] >= full - info["used_ms"] - 1
+
+    # one that extends the aborted game is only known to be new when the caller says so
+    agent.new_game()
+    assert agent.search_info()["time_left_ms"] == full
+
+def test_9x9_game_stays_within_the_clock():
+    # the referee times the whole call, so the engine has to keep time back for what it does not see
+    if importlib.util.find_spec("MapuAlpha_9x9") is None:
+        pytest.skip("MapuAlpha_9x9 is not built here")
+    agents = [{"agent": load_agent("MapuAlpha"), "name": "MapuAlpha"}, {"agent": load_agent("random"), "name": "random"}]
+    move_stats = []
+    _, _, forced_winner, reason = play_one_game(agents, xsize=9, ysize=9, move_stats=move_stats)
+    assert (forced_winner, reason) == (NORMAL, 0)
+    assert sum(m["time_ms"] for m in move_stats if m["player"] == 0) < MAX_TIME * 1000
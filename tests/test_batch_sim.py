@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from batch_sim import NUM_BOXES, greedy_policy, load_policies, play_batch, simulate
+from utils_coord import BoardState, get_box_edges
+
+def replay(moves):
+    # the single-game referee on one recorded game: who drew each line, boxes owned and final scores
+    board = BoardState()
+    players, scores = [], [0, 0]
+    player = 0
+    for move in moves:
+        players.append(player)
+        completed = board.apply_move(int(move), player)
+        scores[player] += completed
+        if not completed:
+            player = 1 - player
+    assert board.is_over()
+    return players, scores, board
+
+@pytest.mark.parametrize("names", [("random", "random"), ("greedy", "random"), ("greedy", "greedy")])
+def test_batch_matches_the_referee(names):
+    games = play_batch(load_policies(names), 200, np.random.default_rng(0))
+    for g in range(games.num_games):
+        players, scores, board = replay(games.moves[g])
+        assert list(games.players[g]) == players
+        assert list(games.scores[g]) == scores
+        # both number box (x, y) x * 5 + y; BoardState stores the owner as player + 1
+        assert list(games.square_owner[g, :NUM_BOXES]) == [owner - 1 for owner in board.box_owner]
+
+def test_greedy_takes_an_open_box():
+    # three sides of box (2, 2) drawn: its fourth is the only line that scores
+    sides = get_box_edges(2, 2)
+    edges = np.zeros((4, 60), dtype=bool)
+    for k in range(4):
+        edges[k, [e for i, e in enumerate(sides) if i != k]] = True
+    moves = greedy_policy(edges, np.zeros(4, dtype=np.int8), np.random.default_rng(1))
+    assert list(moves) == list(sides)
+
+def test_simulate_totals():
+    wins, total_score = simulate(["random", "random"], 300, batch_size=128, seed=3)
+    assert wins.sum() == 300
+    assert total_score.sum() == 300 * NUM_BOXES
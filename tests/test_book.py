@@ -0,0 +1,57 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("MapuAlpha")
+
+from build_book import load_build, move_to_bit
+from conftest import ROOT_DIR
+from utils_coord import code_bit, idx_to_coord
+
+BUILD_BOOK = os.path.join(ROOT_DIR, "agents", "MapuAlpha", "build_book.py")
+SIZES = [(5, 5), (4, 3), (6, 6), (9, 9)]
+
+def built(xsize, ysize):
+    return (xsize, ysize) == (5, 5) or importlib.util.find_spec(f"MapuAlpha_{xsize}x{ysize}") is not None
+
+@pytest.mark.parametrize("xsize,ysize", SIZES)
+def test_move_to_bit_follows_the_build(xsize, ysize):
+    if not built(xsize, ysize):
+        pytest.skip(f"MapuAlpha_{xsize}x{ysize} is not built here")
+    build = load_build(xsize, ysize)
+    num_edges = xsize * (ysize + 1) + (xsize + 1) * ysize
+    assert build.NUM_BIT == num_edges
+    for i in range(num_edges):
+        assert move_to_bit(idx_to_coord(i, xsize, ysize), build) == code_bit(i, xsize, ysize)
+
+def test_book_of_a_wide_board(tmp_path):
+    # 9x9 codes span three words per key; the engine must find the book it was given
+    if not built(9, 9):
+        pytest.skip("MapuAlpha_9x9 is not built here")
+    path = os.path.join(tmp_path, "book_9x9.bin")
+    subprocess.run([sys.executable, BUILD_BOOK, "--xsize", "9", "--ysize", "9", "--max-moves", "1",
+                    "--time-ms", "5", "--out", path], check=True, capture_output=True)
+    # loaded in a process of its own: a book stays mapped for every later search of the build
+    probe = ("import sys, MapuAlpha_9x9 as m; print(m.load_book(sys.argv[1])); "
+             "print(m.search_stats(1 << 100, time_ms=100)['book'])")
+    out = subprocess.run([sys.executable, "-c", probe, path], check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(BUILD_BOOK)).stdout.split()
+    assert int(out[0]) > 1
+    assert out[1] == "True"
+
+def test_missing_build_is_refused(tmp_path):
+    result = subprocess.run([sys.executable, BUILD_BOOK, "--xsize", "7", "--ysize", "7",
+                             "--out", os.path.join(tmp_path, "book.bin")], capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "MapuAlpha_7x7" in result.stderr
+    assert not os.path.exists(os.path.join(tmp_path, "book.bin"))
+
+def test_build_of_another_size_is_refused(monkeypatch):
+    # a module that answers to the 6x6 name but was compiled for 5x5 would write a 5x5 book as 6x6
+    import build_book
+    monkeypatch.setattr(build_book.importlib, "import_module", lambda name: build_book.MapuAlpha)
+    with pytest.raises(ValueError, match="5x5"):
+        load_build(6, 6)
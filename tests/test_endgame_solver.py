@@ -0,0 +1,97 @@
+import functools
+import random
+
+import pytest
+
+# small enough for a brute-force minimax over every line in Python
+MapuAlpha = pytest.importorskip("MapuAlpha_4x3")
+
+from utils_coord import BoardState, board_tables
+
+XSIZE, YSIZE = 4, 3
+TABLES = board_tables(XSIZE, YSIZE)
+FULL = (1 << TABLES.num_edges) - 1
+BOX_CODES = [sum(TABLES.code_bits[e] for e in range(TABLES.num_edges) if mask >> e & 1) for mask in TABLES.box_masks]
+LINE_BOXES = {TABLES.code_bits[e]: [box for box in BOX_CODES if box & TABLES.code_bits[e]]
+              for e in range(TABLES.num_edges)}
+
+def brute_force(code):
+    # margin the side to move makes on the remaining boxes, every line tried, captures optional
+    @functools.lru_cache(maxsize=None)
+    def value(lines):
+        best = None
+        free = FULL & ~lines
+        while free:
+            line = free & -free
+            free ^= line
+            after = lines | line
+            taken = sum(after & box == box for box in LINE_BOXES[line])
+            v = taken + value(after) if taken else -value(after)
+            best = v if best is None else max(best, v)
+        return best or 0
+    return value(code)
+
+def is_safe(board, move):
+    edges = board.edges | (1 << move)
+    return all(bin(edges & mask).count("1") < 3 for _, mask in TABLES.edge_box_masks[move])
+
+def loony_position(rng):
+    # safe lines until none is left: every box has two sides drawn, the board is chains and loops
+    board = BoardState(XSIZE, YSIZE)
+    while safe := [m for m in sorted(board.legal_moves) if is_safe(board, m)]:
+        board.apply_move(rng.choice(safe), 0)
+    return board
+
+def has_loop(board):
+    # a component none of whose open lines reaches the border
+    open_lines = sorted(board.legal_moves)
+    parent = list(range(TABLES.num_boxes))
+    def find(b):
+        while parent[b] != b:
+            b = parent[b]
+        return b
+    for e in open_lines:
+        boxes = [box for box, _ in TABLES.edge_box_masks[e]]
+        if len(boxes) == 2:
+            parent[find(boxes[0])] = find(boxes[1])
+    border = {find(box) for e in open_lines for box, _ in TABLES.edge_box_masks[e] if len(TABLES.edge_box_masks[e]) == 1}
+    return any(find(box) not in border for e in open_lines for box, _ in TABLES.edge_box_masks[e])
+
+def exact_value(code):
+    info = MapuAlpha.Engine(seed=0).search_stats(code, time_ms=10000)
+    assert info["finished"]
+    return info["value"]
+
+def test_chain_and_loop_endgames():
+    # loops are rarer than chains on a small board: collect some of each
+    rng = random.Random(0)
+    chains, loops = [], []
+    while len(chains) < 8 or len(loops) < 4:
+        board = loony_position(rng)
+        (loops if has_loop(board) else chains).append(board)
+    for board in chains[:8] + loops[:4]:
+        assert exact_value(board.code) == brute_force(board.code), hex(board.code)
+
+def test_positions_after_captures_and_openings():
+    # loony positions part way through: pending captures, opened chains and loops, double-deal choices
+    rng = random.Random(1)
+    for _ in range(25):
+        board = loony_position(rng)
+        for _ in range(rng.randint(1, 5)):
+            board.apply_move(rng.choice(sorted(board.legal_moves)), 0)
+        if board.is_over():
+            continue
+        assert exact_value(board.code) == brute_force(board.code), hex(board.code)
+
+def test_midgame_positions():
+    # any position with few lines left, safe lines included; removeAndSimplify meets chains that
+    # loop back into the box they start from here
+    rng = random.Random(2)
+    checked = 0
+    while checked < 25:
+        board = BoardState(XSIZE, YSIZE)
+        for move in rng.sample(range(TABLES.num_edges), TABLES.num_edges - rng.randint(10, 15)):
+            board.apply_move(move, 0)
+        if not board.is_over():
+            assert exact_value(board.code) == brute_force(board.code), hex(board.code)
+            checked += 1
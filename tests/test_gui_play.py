@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+import gui_play
+from utils_coord import BoardState
+
+class FakeRoot:
+    # root.after without a Tk loop: callbacks run when the test says so
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback, *args):
+        self.pending.append((callback, args))
+
+    def run(self):
+        # one round: what these callbacks schedule waits for the next
+        pending, self.pending = self.pending, []
+        for callback, args in pending:
+            callback(*args)
+
+class SlowAgent:
+    # answers the first line still open once the test releases it
+    def __init__(self):
+        self.release = threading.Event()
+        self.new_games = 0
+
+    def run(self, board_lines, xsize, ysize):
+        self.release.wait()
+        for x in range(xsize):
+            if not board_lines[x][0][0]:
+                return (x, 0, 0)
+
+    def new_game(self):
+        self.new_games += 1
+
+def make_gui(agent):
+    # the game logic of the GUI without a window: drawing is left out
+    gui = gui_play.DotsAndBoxesGUI.__new__(gui_play.DotsAndBoxesGUI)
+    gui.root = FakeRoot()
+    gui.agent_module = agent
+    gui.human_first = True
+    gui.board = BoardState()
+    gui.scores = [0, 0]
+    gui.current_player = 0
+    gui.input_locked = False
+    gui.search_thread = None
+    gui.search_result = None
+    gui.search_started = 0.0
+    gui.game_id = 0
+    for name in ("redraw_move", "highlight_edge", "update_edges", "update_boxes", "update_info",
+                 "show_thinking", "unlock_input", "end_game"):
+        setattr(gui, name, lambda *args: None)
+    return gui
+
+def test_restart_during_a_search_drops_its_move():
+    agent = SlowAgent()
+    gui = make_gui(agent)
+    drawn = []
+    gui.redraw_move = drawn.append
+    gui.on_edge_click(30)          # the human's line hands the turn to the agent
+    gui.root.run()                 # ai_move starts the search
+    gui.root.run()                 # and its poll finds it still thinking
+    assert gui.search_thread.is_alive()
+
+    gui.reset_board()
+    agent.release.set()
+    gui.search_thread.join()
+    while gui.root.pending:
+        gui.root.run()
+
+    assert drawn == [30]           # the old game's answer was never played, on either board
+    assert gui.board.code == 0
+    assert agent.new_games == 1
+    assert not gui.input_locked
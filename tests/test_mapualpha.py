@@ -0,0 +1,221 @@
+import json
+import os
+import random
+import time
+
+import numpy as np
+import pytest
+
+MapuAlpha = pytest.importorskip("MapuAlpha")
+
+from bench import random_position
+from conftest import ROOT_DIR
+from play_game import MAX_TIME
+from utils_coord import BoardState, coord_to_idx
+
+with open(os.path.join(ROOT_DIR, "agents", "MapuAlpha", "bench_positions.json")) as f:
+    BENCH_POSITIONS = json.load(f)["positions"]
+EXACT_CODES = [p["code"] for p in BENCH_POSITIONS if p["exact"]]
+
+# a few lines drawn near the corners, far from anything forced
+CODE = sum(1 << b for b in (30, 34, 55, 59, 0, 5, 24, 29))
+
+def assert_legal(code, move):
+    x, y, z = (int(v) for v in move)
+    assert BoardState.from_code(code).is_legal(coord_to_idx(x, y, z)), f"{[x, y, z]} is already drawn"
+
+@pytest.mark.parametrize("nodes", [1, 50, 100, 1000])
+def test_limited_search_returns_legal_move(nodes):
+    # a budget too small for the first iteration still answers with a legal line
+    engine = MapuAlpha.Engine(seed=3)
+    moves, _ = engine.evaluate_positions(np.array([CODE], dtype=np.uint64), nodes=nodes, threads=1)
+    assert_legal(CODE, moves[0])
+    assert_legal(CODE, engine.search_stats(CODE, nodes=nodes)["best_move"])
+
+@pytest.mark.parametrize("seat", [0, 1])
+def test_engine_keeps_the_score_of_its_game(seat):
+    # MCTS scores playouts on the whole game, so the engine counts the boxes taken on both sides
+    rng = random.Random(seat)
+    engine = MapuAlpha.Engine(time_limit_ms=2000, seed=seat)
+    engine.set_mcts(20)
+    board = BoardState()
+    scores = [0, 0]
+    player = 0
+    while not board.is_over():
+        if player == seat:
+            x, y, z = engine.choose_move_code(board.code)
+            move = coord_to_idx(x, y, z)
+        else:
+            move = rng.choice(sorted(board.legal_moves))
+        completed = board.apply_move(move, player)
+        scores[player] += completed
+        if player == seat:
+            assert engine.last_search_info()["score_diff"] == scores[seat] - scores[1 - seat]
+        if not completed:
+            player = 1 - player
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_mcts_node_limit_is_per_thread(threads):
+    # the same budget alpha-beta gets: nodes are counted per thread, playouts for MCTS
+    engine = MapuAlpha.Engine(seed=0)
+    engine.set_mcts(MapuAlpha.NUM_BIT)
+    info = engine.search_stats(CODE, nodes=4096, threads=threads)
+    assert info["mcts"]
+    assert info["nodes"] >= 4096 * threads
+    assert_legal(CODE, info["best_move"])
+
+@pytest.mark.parametrize("phase", ["opening", "middle", "endgame"])
+def test_make_unmake_restores_the_state(phase):
+    # minimax plays every child in place; each make must match a copied child and each unmake undo it
+    rng = random.Random(phase)
+    for _ in range(5):
+        code = random_position(phase, rng)
+        assert MapuAlpha.check_make_unmake(code, 3) > 0
+
+def test_make_unmake_after_random_lines():
+    # boxes left with three sides, opened chains and loops: captures and double-deals on the first ply
+    rng = random.Random(5)
+    for _ in range(20):
+        board = BoardState.from_code(random_position("endgame", rng))
+        for _ in range(rng.randint(1, 6)):
+            if board.is_over():
+                break
+            board.apply_move(rng.choice(sorted(board.legal_moves)), 0)
+        if not board.is_over():
+            assert MapuAlpha.check_make_unmake(board.code, 4) > 0
+
+def test_single_thread_search_is_reproducible():
+    # the same seed gives the same tree: node count, move and value
+    code = random_position("middle", random.Random(7))
+    runs = []
+    for _ in range(2):
+        engine = MapuAlpha.Engine(seed=11)
+        info = engine.search_stats(code, depth=7)
+        runs.append((info["nodes"], info["best_move"], info["value"]))
+    assert runs[0] == runs[1]
+
+@pytest.mark.parametrize("threads", [2, 4])
+def test_smp_agrees_on_solved_positions(threads):
+    # helpers only fill the shared TT: a search run to the end has the single-thread value. The
+    # bench's exact positions include middle games that take a real search to solve
+    for code in EXACT_CODES:
+        single = MapuAlpha.Engine(seed=0).search_stats(code, depth=MapuAlpha.NUM_BIT)
+        smp = MapuAlpha.Engine(seed=0).search_stats(code, depth=MapuAlpha.NUM_BIT, threads=threads)
+        assert single["finished"] and smp["finished"]
+        assert smp["threads"] == threads
+        assert smp["value"] == single["value"]
+        assert_legal(code, smp["best_move"])
+
+def test_smp_midgame_returns_legal_moves():
+    rng = random.Random(8)
+    engine = MapuAlpha.Engine(seed=0, threads=2)
+    for _ in range(3):
+        code = random_position("middle", rng)
+        info = engine.search_stats(code, time_ms=200, threads=2)
+        assert info["threads"] == 2
+        assert_legal(code, info["best_move"])
+
+def test_entry_points_read_the_same_position():
+    # board_lines, the edge code and a uint8 buffer of the same solved position: same engine state, same move
+    rng = random.Random(9)
+    for _ in range(6):
+        code = random_position("endgame", rng)
+        lines = BoardState.from_code(code).to_board_lines()
+        buffer = np.array([code >> b & 1 for b in range(MapuAlpha.NUM_BIT)], dtype=np.uint8)
+        moves = [MapuAlpha.Engine(seed=5).choose_move(lines),
+                 MapuAlpha.Engine(seed=5).choose_move_code(code),
+                 MapuAlpha.Engine(seed=5).choose_move_buffer(buffer),
+                 MapuAlpha.Engine(seed=5).choose_move_buffer(bytes(buffer)),
+                 MapuAlpha.Engine(seed=5).choose_move_buffer(np.repeat(buffer, 2)[::2])]   # strided view
+        assert all(list(m) == list(moves[0]) for m in moves)
+        assert_legal(code, moves[0])
+
+def test_buffer_must_hold_one_byte_per_line():
+    engine = MapuAlpha.Engine(seed=0)
+    with pytest.raises(ValueError):
+        engine.choose_move_buffer(np.zeros(MapuAlpha.NUM_BIT - 1, dtype=np.uint8))
+    with pytest.raises(ValueError):
+        engine.choose_move_buffer(np.zeros(MapuAlpha.NUM_BIT, dtype=np.int32))
+
+def offered_box():
+    # lines drawn in order until some box has three sides: taking it is the engine's move
+    board = BoardState()
+    for move in sorted(board.legal_moves):
+        board.apply_move(move, 0)
+        if any(bin(board.edges & mask).count("1") == 3 for _, mask in board.tables.edge_box_masks[move]):
+            return board
+    raise AssertionError("no box was offered")
+
+def test_ponder_hit_after_a_capture():
+    # a capture keeps the move: the ponder search runs on our own next position, which then comes
+    board = offered_box()
+    engine = MapuAlpha.Engine(seed=0)
+    engine.set_ponder(True)
+    x, y, z = engine.choose_move_code(board.code)
+    assert board.apply_move(coord_to_idx(x, y, z), 0) == 1
+    time.sleep(0.2)
+    assert_legal(board.code, engine.choose_move_code(board.code))
+    assert engine.last_search_info()["ponder_hit"]
+
+def test_ponder_miss_and_off():
+    # of two different replies at most one is the guess; without pondering nothing is a hit
+    code = random_position("opening", random.Random(4))
+    hits = []
+    for ponder in (True, False):
+        for reply in range(2):
+            engine = MapuAlpha.Engine(seed=0)
+            engine.set_ponder(ponder)
+            board = BoardState.from_code(code)
+            board.apply_move(coord_to_idx(*engine.choose_move_code(board.code)), 0)
+            board.apply_move(sorted(board.legal_moves)[reply], 1)
+            time.sleep(0.1)
+            assert_legal(board.code, engine.choose_move_code(board.code))
+            hits.append(engine.last_search_info()["ponder_hit"])
+    assert not all(hits[:2])
+    assert not any(hits[2:])
+
+def test_search_stops_once_the_value_is_proven():
+    # a 20 s budget on positions the bench solves: each ends as soon as the root value is exact,
+    # far inside the budget, with the solved value
+    values = {p["code"]: p["value"] for p in BENCH_POSITIONS if p["exact"]}
+    for code, value in values.items():
+        info = MapuAlpha.Engine(seed=0).search_stats(code, time_ms=20000)
+        assert info["finished"]
+        assert info["value"] == value
+        assert info["used_ms"] < info["budget_ms"] / 4
+    engine = MapuAlpha.Engine(seed=0)
+    engine.choose_move_code(random_position("endgame", random.Random(3)))
+    assert engine.last_search_info()["time_left_ms"] > MAX_TIME * 1000 - 1000
+
+def test_warm_killers_and_history_only_reorder():
+    # killers and history left over from other searches change the node count, never a solved value
+    engine = MapuAlpha.Engine(seed=0)
+    for code in reversed(EXACT_CODES):
+        engine.search_stats(code, depth=8)
+    for code in EXACT_CODES:
+        warm = engine.search_stats(code, depth=MapuAlpha.NUM_BIT)
+        cold = MapuAlpha.Engine(seed=0).search_stats(code, depth=MapuAlpha.NUM_BIT)
+        assert warm["finished"] and warm["value"] == cold["value"]
+
+def test_set_seed_forgets_killers_and_history():
+    # the first search of a new game must not depend on what the last game taught the move ordering
+    code = random_position("middle", random.Random(11))
+    engine = MapuAlpha.Engine(seed=0)
+    first = engine.search_stats(code, depth=7)
+    for other in EXACT_CODES:
+        engine.search_stats(other, depth=7)
+    engine.set_seed(0)
+    again = engine.search_stats(code, depth=7)
+    assert (again["nodes"], again["best_move"], again["value"]) == (first["nodes"], first["best_move"], first["value"])
+
+def test_transposition_table_reuses_and_survives_a_small_budget():
+    # a second search of a position starts from the stored results; a 1 MB table replaces entries
+    # all the time and must still solve to the same values
+    for code in EXACT_CODES[:4]:
+        engine = MapuAlpha.Engine(seed=0)
+        first = engine.search_stats(code, depth=MapuAlpha.NUM_BIT)
+        again = engine.search_stats(code, depth=MapuAlpha.NUM_BIT)
+        assert again["value"] == first["value"]
+        assert again["nodes"] < first["nodes"]
+        small = MapuAlpha.Engine(seed=0, tt_mb=1).search_stats(code, depth=MapuAlpha.NUM_BIT)
+        assert small["finished"] and small["value"] == first["value"]
@@ -0,0 +1,94 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import ROOT_DIR
+from match_client import MatchClient, MatchError, RemoteAgent
+from play_game import MAX_TIME
+from utils_coord import BoardState, coord_to_idx, idx_to_coord
+
+@pytest.fixture(scope="module")
+def server():
+    # a real server process with two warm workers on a free local port
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    address = f"127.0.0.1:{port}"
+    process = subprocess.Popen([sys.executable, "match_server.py", "--address", address, "--workers", "2"],
+                               cwd=ROOT_DIR, stdout=subprocess.PIPE, text=True)
+    try:
+        assert process.stdout.readline().startswith("match server on")
+        yield address
+    finally:
+        process.kill()
+        process.wait()
+
+def test_remote_agent_detects_a_new_game(server):
+    # a position that lacks our last answer is another game, even with more lines than the last one
+    agent = RemoteAgent("random", server)
+    try:
+        board = BoardState()
+        for move in range(0, 20, 3):
+            board.apply_move(move, 0)
+        board.apply_move(coord_to_idx(*agent.run_code(board.code)), 0)
+        game = agent.game
+
+        board.apply_move(min(board.legal_moves), 1)   # the opponent answers: the same game
+        ours = coord_to_idx(*agent.run_code(board.code))
+        assert agent.game == game
+
+        for move in sorted(board.legal_moves - {ours})[:2]:
+            board.apply_move(move, 1)
+        agent.run_code(board.code)
+        assert agent.game != game
+    finally:
+        agent.close()
+
+def test_play_returns_a_finished_game(server):
+    with MatchClient(server) as client:
+        result = client.play("random", "random")
+    assert result["forced_winner"] == -1
+    assert sum(result["scores"]) == 25
+
+def test_interactive_game_round_trip(server):
+    # the client keeps the board; every reply is a legal line of the position it was sent
+    with MatchClient(server) as client:
+        game = client.new_game(["random", "random"])
+        assert client.status()["games"] == 1
+        board = BoardState()
+        seat = 0
+        while board.legal_moves:
+            reply = client.move(game, seat, board.code)
+            assert reply["edge"] in board.legal_moves
+            assert reply["move"] == list(idx_to_coord(reply["edge"]))
+            assert not reply["timeout"] and 0 < reply["time_left_ms"] <= MAX_TIME * 1000
+            if not board.apply_move(reply["edge"], seat):
+                seat = 1 - seat
+        client.end_game(game)
+        assert client.status()["games"] == 0
+
+def test_bad_requests_get_error_replies(server):
+    # errors come back as replies; the connection stays usable
+    with MatchClient(server) as client:
+        with pytest.raises(MatchError, match="unknown op"):
+            client.request("resign")
+        with pytest.raises(MatchError, match="KeyError"):
+            client.move(12345, 0, 0)
+        with pytest.raises(MatchError, match="TypeError"):
+            client.request("status", verbose=True)
+        assert client.status()["workers"] == 2
+
+def test_closing_the_connection_ends_its_games(server):
+    with MatchClient(server) as client:
+        client.new_game(["random", "random"])
+    # the server notices the closed connection in its own time: poll until the worker is back
+    idle = {"workers": 2, "idle": 2, "games": 0, "waiting": 0}
+    with MatchClient(server) as client:
+        for _ in range(100):
+            if client.status() == idle:
+                break
+            time.sleep(0.05)
+        assert client.status() == idle
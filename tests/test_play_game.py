@@ -0,0 +1,51 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+import play_game
+from play_game import NORMAL, evaluate_agents, load_agent, play_reported_game, summarize_moves
+
+def test_6x6_game_ends_normally():
+    # a whole game of the league on a larger board: every move legal and on time for both seats
+    if importlib.util.find_spec("MapuAlpha_6x6") is None:
+        pytest.skip("MapuAlpha_6x6 is not built here")
+    agents = [{"agent": load_agent("MapuAlpha"), "name": "MapuAlpha"} for _ in range(2)]
+    p1, p2, forced_winner, reason, move_stats, _ = play_reported_game(agents, False, 6, 6, True)
+    assert (forced_winner, reason) == (NORMAL, 0)
+    assert p1 + p2 == 36
+    assert {m["player"] for m in move_stats} == {0, 1}
+
+def test_summary_reports_budgets_per_move():
+    move_stats = [
+        {"player": 0, "time_ms": 10.0, "budget_ms": 100.0, "used_ms": 50.0, "nodes": 5, "depth": 4,
+         "finished": True, "book": False},
+        {"player": 1, "time_ms": 1.0},
+        {"player": 0, "time_ms": 30.0, "budget_ms": 300.0, "used_ms": 300.0, "nodes": 7, "depth": 6,
+         "finished": False, "book": False, "ponder_hit": True},
+    ]
+    summary = summarize_moves(move_stats, 0)
+    assert summary["moves"] == 2
+    assert summary["time_ms"] == 40.0
+    assert summary["avg_budget_ms"] == 200.0
+    assert summary["avg_budget_used"] == 0.75
+    assert (summary["nodes"], summary["avg_depth"], summary["stopped_by_clock"]) == (12, 5.0, 1)
+    assert summary["ponder_hits"] == 1
+    assert summarize_moves(move_stats, 1) == {"moves": 1, "time_ms": 1.0}
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_evaluation_plays_every_game(tmp_path, monkeypatch, workers):
+    # games finish out of order on the worker pool; the report still holds each one, both colorings.
+    # random agents hardly use the clock, so the pool runs even where it would exceed the cores
+    monkeypatch.setattr(play_game, "available_cpus", lambda: workers)
+    agents = [{"agent": load_agent(name), "name": name} for name in ("random", "random")]
+    report = os.path.join(tmp_path, "report.json")
+    evaluate_agents(agents, num_games=6, workers=workers, report=report)
+    with open(report) as f:
+        games = json.load(f)
+    assert len(games) == 12
+    for game in games:
+        assert (game["forced_winner"], game["reason"]) == (NORMAL, 0)
+        assert sum(game["scores"]) == 25
+        assert len(game["moves"]) == 60
@@ -0,0 +1,98 @@
+import os
+import random
+
+import numpy as np
+
+from replay import ReplayReader, ReplayWriter, NO_MOVE, HEADER, GAME
+from utils_coord import BoardState
+
+def random_game(rng, xsize=5, ysize=5):
+    # (moves, times, players, scores) of a random game to the end
+    board = BoardState(xsize, ysize)
+    moves, times, players = [], [], []
+    scores = [0, 0]
+    player = 0
+    while not board.is_over():
+        move = rng.choice(sorted(board.legal_moves))
+        moves.append(move)
+        times.append(rng.uniform(0, 500))
+        players.append(player)
+        completed = board.apply_move(move, player)
+        scores[player] += completed
+        if not completed:
+            player = 1 - player
+    return moves, times, players, scores
+
+def write_games(path, games, names=("alpha", "beta")):
+    with ReplayWriter(path) as writer:
+        for i, (moves, times, _, scores) in enumerate(games):
+            first, second = names if i % 2 == 0 else names[::-1]
+            writer.write_game(first, second, scores, -1, 0, moves, times)
+
+def test_round_trip(tmp_path):
+    rng = random.Random(0)
+    games = [random_game(rng) for _ in range(5)]
+    path = os.path.join(tmp_path, "games.dbr")
+    write_games(path, games)
+
+    with ReplayReader(path) as reader:
+        assert (reader.xsize, reader.ysize) == (5, 5)
+        assert len(reader) == len(games)
+        assert reader.names == ["alpha", "beta"]
+        for i, (game, (moves, times, players, scores)) in enumerate(zip(reader, games)):
+            assert game.agents == (("alpha", "beta") if i % 2 == 0 else ("beta", "alpha"))
+            assert game.scores == tuple(scores)
+            assert game.forced_winner == -1
+            assert list(game.moves) == moves
+            np.testing.assert_allclose(game.times, times, rtol=1e-3)   # stored as float16
+            assert [(p, e) for p, e, _ in game] == list(zip(players, moves))
+
+        moves, times, lengths, scores = reader.to_arrays()
+        assert list(lengths) == [len(g[0]) for g in games]
+        assert scores.tolist() == [g[3] for g in games]
+        for row, length, game in zip(moves, lengths, games):
+            assert list(row[:length]) == game[0]
+            assert (row[length:] == NO_MOVE).all()
+
+def test_invalid_move_is_recorded(tmp_path):
+    path = os.path.join(tmp_path, "invalid.dbr")
+    with ReplayWriter(path) as writer:
+        writer.write_game("alpha", "beta", (0, 0), 1, 1, [3, None], [1.0, 2.0])
+    with ReplayReader(path) as reader:
+        game = reader[0]
+        assert list(game.moves) == [3, NO_MOVE]
+        assert [(p, e) for p, e, _ in game] == [(0, 3), (1, None)]
+
+def test_truncated_file_is_rebuilt_by_scan(tmp_path):
+    rng = random.Random(1)
+    games = [random_game(rng) for _ in range(3)]
+    path = os.path.join(tmp_path, "games.dbr")
+    write_games(path, games)
+    with ReplayReader(path) as reader:
+        last = int(reader.offsets[-1])
+
+    # killed halfway through the last game: no footer, and the partial record is dropped
+    with open(path, "rb") as f:
+        data = f.read()
+    cut = os.path.join(tmp_path, "cut.dbr")
+    with open(cut, "wb") as f:
+        f.write(data[:last + GAME.size + 10])
+
+    with ReplayReader(cut) as reader:
+        assert len(reader) == 2
+        assert reader.names == []
+        assert reader[0].agents == ("agent0", "agent1")
+        for game, (moves, _, _, scores) in zip(reader, games):
+            assert list(game.moves) == moves
+            assert game.scores == tuple(scores)
+
+def test_header_only_file(tmp_path):
+    path = os.path.join(tmp_path, "empty.dbr")
+    with ReplayWriter(path):
+        pass
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    with open(path, "wb") as f:
+        f.write(header)   # killed before the first game
+    with ReplayReader(path) as reader:
+        assert len(reader) == 0
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("MapuAlpha")
+
+from play_game import load_agent
+from selfplay import NO_VALUE, play_game, record_dtype
+
+@pytest.fixture(scope="module")
+def agent():
+    agent = load_agent("MapuAlpha")
+    agent.set_seed(0)
+    return agent
+
+def test_values_are_searched(agent):
+    out = np.zeros(200, dtype=record_dtype(5, 5))
+    rng = np.random.default_rng(0)
+    n = play_game(agent, 5, 5, 5, 4, rng, out, 0)
+    records = out[:n]
+    assert (records["value"] != NO_VALUE).all()
+    # the last line always takes the last boxes, and by then the endgame is solved: the value is exact
+    last = records[-1]
+    assert last["value"] > 0
+    assert last["value"] == last["outcome"] - last["score_diff"]
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+MapuAlpha = pytest.importorskip("MapuAlpha")
+
+from bench import random_position
+from utils_coord import BoardState, coord_to_idx
+
+BOX_X, BOX_Y, NUM_BIT = MapuAlpha.BOX_X, MapuAlpha.BOX_Y, MapuAlpha.NUM_BIT
+VERTICAL_BITS = (BOX_X + 1) * BOX_Y
+
+def bit_dots(b):
+    # the two dots joined by the line of encode_board_lines bit b
+    if b < VERTICAL_BITS:
+        x, y = b % (BOX_X + 1), b // (BOX_X + 1)
+        return (x, y), (x, y + 1)
+    x, y = (b - VERTICAL_BITS) % BOX_X, (b - VERTICAL_BITS) // BOX_X
+    return (x, y), (x + 1, y)
+
+def dots_bit(a, c):
+    (ax, ay), (cx, cy) = sorted((a, c))
+    return ay * (BOX_X + 1) + ax if ax == cx else VERTICAL_BITS + ay * BOX_X + ax
+
+def geometric_images(code):
+    # images of code under the rotations and reflections of the board, worked out on the dots
+    maps = [lambda x, y: (x, y), lambda x, y: (BOX_X - x, BOX_Y - y),
+            lambda x, y: (BOX_X - x, y), lambda x, y: (x, BOX_Y - y)]
+    if BOX_X == BOX_Y:
+        maps += [lambda x, y: (BOX_Y - y, x), lambda x, y: (y, BOX_X - x),
+                 lambda x, y: (y, x), lambda x, y: (BOX_Y - y, BOX_X - x)]
+    images = set()
+    for f in maps:
+        image = 0
+        for b in range(NUM_BIT):
+            if code >> b & 1:
+                a, c = bit_dots(b)
+                image |= 1 << dots_bit(f(*a), f(*c))
+        images.add(image)
+    return images
+
+def random_codes(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.getrandbits(NUM_BIT) & rng.getrandbits(NUM_BIT) for _ in range(count)]
+
+def test_transforms_are_the_board_symmetries():
+    for code in random_codes(200):
+        images = {MapuAlpha.transform_code(code, s) for s in range(MapuAlpha.NUM_SYM)}
+        assert images == geometric_images(code)
+        assert MapuAlpha.transform_code(code, 0) == code
+
+def test_canonical_code_is_invariant():
+    for code in random_codes(200, seed=1):
+        canon, _ = MapuAlpha.canonical_code(code)
+        assert canon == min(geometric_images(code))
+        for s in range(MapuAlpha.NUM_SYM):
+            assert MapuAlpha.canonical_code(MapuAlpha.transform_code(code, s))[0] == canon
+
+def test_inverse_round_trips():
+    for code in random_codes(200, seed=2):
+        canon, sym = MapuAlpha.canonical_code(code)
+        assert MapuAlpha.transform_code(code, sym) == canon
+        assert MapuAlpha.transform_code(canon, MapuAlpha.SYM_INVERSE[sym]) == code
+        for s in range(MapuAlpha.NUM_SYM):
+            image = MapuAlpha.transform_code(code, s)
+            assert MapuAlpha.transform_code(image, MapuAlpha.SYM_INVERSE[s]) == code
+
+def test_search_agrees_on_symmetric_positions():
+    # solved endgames: every orientation has the same exact value and gets a legal move back
+    rng = random.Random(3)
+    engine = MapuAlpha.Engine(seed=0)
+    for _ in range(4):
+        code = random_position("endgame", rng)
+        values = set()
+        for s in range(MapuAlpha.NUM_SYM):
+            image = MapuAlpha.transform_code(code, s)
+            info = engine.search_stats(image, time_ms=5000)
+            assert info["finished"]
+            values.add(info["value"])
+            x, y, z = info["best_move"]
+            assert BoardState.from_code(image).is_legal(coord_to_idx(x, y, z))
+        assert len(values) == 1
@@ -0,0 +1,82 @@
+import math
+
+import pytest
+
+import tournament
+from tournament import Pentanomial, bradley_terry, elo_from_score, pair_score, score_from_elo
+
+def stats_of(counts):
+    stats = Pentanomial()
+    stats.counts = list(counts)
+    return stats
+
+def test_elo_score_conversion():
+    assert elo_from_score(0.5) == 0.0
+    assert elo_from_score(0.75) == pytest.approx(400 * math.log10(3))
+    assert score_from_elo(400) == pytest.approx(10 / 11)
+    for elo in (-300, -5, 0, 5, 120):
+        assert elo_from_score(score_from_elo(elo)) == pytest.approx(elo)
+
+def test_pair_scores():
+    win, loss, draw = (20, 5, -1), (5, 20, -1), (12, 12, -1)
+    assert pair_score(win, loss) == 1.0    # won as first, opponent lost as first
+    assert pair_score(win, win) == 0.5
+    assert pair_score(draw, draw) == 0.5
+    assert pair_score(loss, (0, 0, 0)) == 0.0   # lost as first, then forfeited as second
+
+def test_elo_interval():
+    stats = stats_of([0, 250, 500, 250, 0])
+    elo, lo, hi = stats.elo()
+    assert elo == pytest.approx(0, abs=0.01)
+    # pair variance 1/32 over 1000 pairs: the score margin is 1.96 * sqrt(1/32000)
+    assert hi == pytest.approx(elo_from_score(0.5 + 1.959964 * math.sqrt(1 / 32000)), rel=1e-3)
+    assert lo == pytest.approx(-hi, rel=1e-3)
+
+def test_mle_has_the_asked_mean():
+    stats = stats_of([30, 200, 500, 240, 30])
+    for elo in (-20, 0, 5, 40):
+        score = score_from_elo(elo)
+        p = stats.mle(score)
+        assert sum(p) == pytest.approx(1)
+        assert sum(q * i / 4 for i, q in enumerate(p)) == pytest.approx(score)
+    # at the sample mean the most likely distribution is the sample itself
+    mean, _ = stats.mean_var()
+    n = sum(stats.regularized())
+    assert stats.mle(mean) == pytest.approx([c / n for c in stats.regularized()], rel=1e-6)
+
+def test_llr_matches_the_normal_approximation():
+    # for small Elo differences the GSPRT LLR is N (s1 - s0) (2 mean - s0 - s1) / (2 var)
+    stats = stats_of([100, 800, 2000, 900, 200])
+    mean, var = stats.mean_var()
+    s0, s1 = score_from_elo(0), score_from_elo(5)
+    approx = stats.pairs * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var)
+    assert stats.llr(0, 5) == pytest.approx(approx, rel=0.02)
+    assert stats.llr(5, 0) == pytest.approx(-stats.llr(0, 5))
+
+def test_sprt_stops_at_the_bounds(monkeypatch):
+    def fake_pairs(score):
+        def play_pairs(names, num_pairs, *args):
+            for _ in range(num_pairs):
+                yield score
+        return play_pairs
+    # a clearly stronger agent: H1 long before max_pairs, the LLR just past log((1 - beta) / alpha)
+    monkeypatch.setattr(tournament, "play_pairs", fake_pairs(0.75))
+    verdict, stats = tournament.sprt(["a", "b"], elo0=0, elo1=5, max_pairs=1000)
+    assert verdict == "H1" and stats.pairs < 1000
+    assert stats.llr(0, 5) >= math.log(0.95 / 0.05)
+    monkeypatch.setattr(tournament, "play_pairs", fake_pairs(0.25))
+    verdict, stats = tournament.sprt(["a", "b"], elo0=0, elo1=5, max_pairs=1000)
+    assert verdict == "H0" and stats.llr(0, 5) <= math.log(0.05 / 0.95)
+
+def test_bradley_terry_two_players():
+    # 75 of 100 points plus the virtual draw: the Elo gap of a 75.5/101 score, split around 0
+    ratings, errors = bradley_terry(2, {(0, 1): (75, 100)})
+    gap = elo_from_score(75.5 / 101)
+    assert ratings == pytest.approx([gap / 2, -gap / 2], rel=1e-4)
+    assert errors[0] == pytest.approx(errors[1])
+    assert errors[0] > 0
+
+def test_bradley_terry_is_transitive():
+    ratings, _ = bradley_terry(3, {(0, 1): (60, 100), (1, 2): (60, 100), (0, 2): (70, 100)})
+    assert ratings[0] > ratings[1] > ratings[2]
+    assert sum(ratings) == pytest.approx(0, abs=1e-9)
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from utils_coord import (BoardState, apply_move, build_board_lines_from_state_vec, code_bit,
+                         coord_to_idx, idx_to_coord)
+
+SIZES = [(5, 5), (4, 3), (3, 6)]
+
+@pytest.mark.parametrize("xsize,ysize", SIZES)
+def test_coords_round_trip(xsize, ysize):
+    num_edges = xsize * (ysize + 1) + (xsize + 1) * ysize
+    assert [coord_to_idx(*idx_to_coord(i, xsize, ysize), xsize, ysize) for i in range(num_edges)] == list(range(num_edges))
+    assert sorted(code_bit(i, xsize, ysize) for i in range(num_edges)) == list(range(num_edges))
+
+@pytest.mark.parametrize("xsize,ysize", SIZES)
+def test_board_state_matches_list_referee(xsize, ysize):
+    # the bitboard referee against the original state_vec/square_owner apply_move, move by move
+    rng = random.Random(xsize * 100 + ysize)
+    num_edges = xsize * (ysize + 1) + (xsize + 1) * ysize
+    for _ in range(20):
+        board = BoardState(xsize, ysize)
+        state_vec = [0.0] * num_edges
+        square_owner = [[0] * ysize for _ in range(xsize)]
+        player = 0
+        order = list(range(num_edges))
+        rng.shuffle(order)
+        for move in order:
+            assert board.is_legal(move)
+            assert not board.is_over()
+            completed = board.apply_move(move, player)
+            assert completed == apply_move(state_vec, square_owner, move, player + 1, xsize, ysize)
+            assert not board.is_legal(move)
+            assert board.legal_moves == {i for i in range(num_edges) if state_vec[i] == 0}
+            assert list(board.box_owner) == [square_owner[x][y] for x in range(xsize) for y in range(ysize)]
+            assert board.to_board_lines() == build_board_lines_from_state_vec(state_vec, xsize, ysize)
+            assert board.code == sum(1 << code_bit(i, xsize, ysize) for i in range(num_edges) if state_vec[i])
+            if not completed:
+                player = 1 - player
+        assert board.is_over()
+
+@pytest.mark.parametrize("xsize,ysize", SIZES)
+def test_from_code(xsize, ysize):
+    rng = random.Random(7)
+    num_edges = xsize * (ysize + 1) + (xsize + 1) * ysize
+    for _ in range(50):
+        board = BoardState(xsize, ysize)
+        for move in rng.sample(range(num_edges), rng.randrange(num_edges + 1)):
+            board.apply_move(move, 0)
+        copy = BoardState.from_code(board.code, xsize, ysize)
+        assert (copy.edges, copy.code, copy.legal_moves) == (board.edges, board.code, board.legal_moves)
+        assert copy.box_owner == board.box_owner
+
+def test_is_legal_rejects_bad_moves():
+    board = BoardState()
+    assert not board.is_legal(None)
+    assert not board.is_legal(-1)
+    assert not board.is_legal(60)
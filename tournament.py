@@ -0,0 +1,233 @@
+import os
+import argparse
+import itertools
+import math
+import multiprocessing
+import numpy as np
+from tqdm import tqdm
+
+import play_game
+from play_game import available_cpus
+from match_client import MatchPool
+
+# Games are played in pairs with colors swapped; a pair scores 0, 1/4, ..., 1 for the first agent
+# (pentanomial model), which takes the first-move advantage out of the variance.
+Z95 = 1.959964
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+def score_from_elo(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def game_score(result):
+    # first player's score of a play_reported_game result: 1 win, 0.5 draw, 0 loss
+    p1_score, p2_score, forced_winner = result[:3]
+    if forced_winner != -1:
+        return 1.0 if forced_winner == 0 else 0.0
+    return 1.0 if p1_score > p2_score else (0.0 if p1_score < p2_score else 0.5)
+
+def pair_score(as_first, as_second):
+    return (game_score(as_first) + 1 - game_score(as_second)) / 2
+
+class Pentanomial:
+    def __init__(self):
+        self.counts = [0] * 5
+
+    def add(self, score):
+        self.counts[round(score * 4)] += 1
+
+    @property
+    def pairs(self):
+        return sum(self.counts)
+
+    def regularized(self):
+        # a tiny count in every bin keeps the estimates finite while all pairs so far agree
+        return [c + 1e-3 for c in self.counts]
+
+    def mean_var(self):
+        counts = self.regularized()
+        n = sum(counts)
+        mean = sum(c * i / 4 for i, c in enumerate(counts)) / n
+        var = sum(c * (i / 4 - mean) ** 2 for i, c in enumerate(counts)) / n
+        return mean, var
+
+    def elo(self):
+        # estimate and 95% interval from the normal approximation of the pair mean
+        if not self.pairs:
+            return 0.0, -math.inf, math.inf
+        mean, var = self.mean_var()
+        margin = Z95 * math.sqrt(var / self.pairs)
+        return elo_from_score(mean), elo_from_score(mean - margin), elo_from_score(mean + margin)
+
+    def mle(self, score):
+        # most likely pair distribution with the given mean: p_i = n_i / (N (1 + l (x_i - score))),
+        # l found by bisection so that the p_i sum to one
+        counts = self.regularized()
+        n = sum(counts)
+        lo, hi = -1 / (1 - score) * (1 - 1e-9), 1 / score * (1 - 1e-9)
+        for _ in range(100):
+            mid = (lo + hi) / 2
+            if sum(c * (i / 4 - score) / (1 + mid * (i / 4 - score)) for i, c in enumerate(counts)) > 0:
+                lo = mid
+            else:
+                hi = mid
+        return [c / (n * (1 + lo * (i / 4 - score))) for i, c in enumerate(counts)]
+
+    def llr(self, elo0, elo1):
+        # generalized SPRT log-likelihood ratio of elo1 over elo0
+        p0 = self.mle(score_from_elo(elo0))
+        p1 = self.mle(score_from_elo(elo1))
+        return sum(c * math.log(a / b) for c, a, b in zip(self.regularized(), p1, p0))
+
+def _play_pair(task):
+    # runs in a play_game worker: the same two agents twice, colors swapped
+    xsize, ysize = task
+    return (play_game._play_game_worker((False, False, xsize, ysize, False, False)),
+            play_game._play_game_worker((True, False, xsize, ysize, False, False)))
+
+def play_pairs(names, num_pairs, xsize=5, ysize=5, workers=1, server=None):
+    # pair scores of names[0] against names[1] in completion order; closing the generator stops the games
+    if server:
+        pool = MatchPool(server, workers)
+        try:
+            for as_first, as_second in pool.play_pairs(names[0], names[1], num_pairs, xsize, ysize):
+                yield pair_score(as_first, as_second)
+        finally:
+            pool.close()
+        return
+    if workers <= 1:
+        play_game._init_worker(names, False)
+        for _ in range(num_pairs):
+            yield pair_score(*_play_pair((xsize, ysize)))
+        return
+    pool = multiprocessing.get_context("spawn").Pool(workers, initializer=play_game._init_worker,
+                                                     initargs=(names, False))
+    try:
+        for as_first, as_second in pool.imap_unordered(_play_pair, itertools.repeat((xsize, ysize), num_pairs)):
+            yield pair_score(as_first, as_second)
+    finally:
+        pool.terminate()   # a decided test drops the pairs still in flight
+        pool.join()
+
+def sprt(names, elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05, max_pairs=20000, xsize=5, ysize=5,
+         workers=1, server=None):
+    # H0: names[0] is elo0 stronger than names[1], H1: elo1 stronger; stops at the first bound crossed.
+    # Two versions of one agent are two directories under agents/, each built in place: MapuAlpha names its
+    # modules after the directory, and refuses a copied build that would load as the other version.
+    lower = math.log(beta / (1 - alpha))
+    upper = math.log((1 - beta) / alpha)
+    stats = Pentanomial()
+    verdict = None
+    pairs = play_pairs(names, max_pairs, xsize, ysize, workers, server)
+    with tqdm(total=max_pairs, desc=f"{names[0]} vs {names[1]}", unit="pair") as bar:
+        for score in pairs:
+            stats.add(score)
+            llr = stats.llr(elo0, elo1)
+            bar.update(1)
+            bar.set_postfix_str(f"LLR {llr:.2f} [{lower:.2f}, {upper:.2f}]")
+            if llr >= upper:
+                verdict = "H1"
+                break
+            if llr <= lower:
+                verdict = "H0"
+                break
+    pairs.close()
+    return verdict, stats
+
+def bradley_terry(n, results, iterations=2000):
+    # Elo ratings (mean 0) and their standard errors from {(i, j): (score of i, games)};
+    # one virtual draw per pairing keeps a clean sweep finite
+    wins = np.zeros((n, n))
+    games = np.zeros((n, n))
+    for (i, j), (score, count) in results.items():
+        wins[i, j] += score + 0.5
+        wins[j, i] += count - score + 0.5
+        games[i, j] += count + 1
+        games[j, i] += count + 1
+    gamma = np.ones(n)
+    for _ in range(iterations):
+        denom = (games / (gamma[:, None] + gamma[None, :])).sum(axis=1)
+        gamma = np.where(denom > 0, wins.sum(axis=1) / np.maximum(denom, 1e-300), gamma)
+        gamma /= np.exp(np.log(gamma).mean())
+    r = np.log(gamma)
+    p = 1 / (1 + np.exp(r[None, :] - r[:, None]))
+    info = -games * p * (1 - p)
+    np.fill_diagonal(info, -info.sum(axis=1))
+    cov = np.linalg.pinv(info)   # ratings are only defined up to a constant: the pseudo-inverse fixes the mean
+    scale = 400 / math.log(10)
+    return r * scale, np.sqrt(np.maximum(np.diag(cov), 0)) * scale
+
+def gauntlet(names, pairs_per_match=100, xsize=5, ysize=5, workers=1, server=None):
+    # round robin; returns per-match pentanomial stats and the rating table
+    matches = {}
+    for i, j in itertools.combinations(range(len(names)), 2):
+        stats = Pentanomial()
+        for score in tqdm(play_pairs([names[i], names[j]], pairs_per_match, xsize, ysize, workers, server),
+                          total=pairs_per_match, desc=f"{names[i]} vs {names[j]}", unit="pair"):
+            stats.add(score)
+        matches[i, j] = stats
+    results = {}
+    for (i, j), stats in matches.items():
+        mean, _ = stats.mean_var()
+        results[i, j] = (2 * stats.pairs * mean, 2 * stats.pairs)
+    ratings, errors = bradley_terry(len(names), results)
+    return matches, ratings, errors
+
+def discover_agents():
+    agents_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents")
+    return sorted(name for name in os.listdir(agents_dir)
+                  if not name.startswith(("_", ".")) and os.path.exists(os.path.join(agents_dir, name, "main.py")))
+
+def format_elo(stats):
+    elo, lo, hi = stats.elo()
+    return f"{elo:+.1f} [{lo:+.1f}, {hi:+.1f}]"
+
+def main():
+    parser = argparse.ArgumentParser(description="SPRT tests and round-robin gauntlets with Elo estimates")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    test = sub.add_parser("sprt", help="두 에이전트의 순차 검정 (색을 바꾼 두 판씩)")
+    test.add_argument("agent1", help="검정할 에이전트 (예: 새 버전)")
+    test.add_argument("agent2", help="기준 에이전트")
+    test.add_argument("--elo0", type=float, default=0.0, help="귀무가설 H0의 Elo 차이 (default: 0)")
+    test.add_argument("--elo1", type=float, default=5.0, help="대립가설 H1의 Elo 차이 (default: 5)")
+    test.add_argument("--alpha", type=float, default=0.05, help="1종 오류율 (default: 0.05)")
+    test.add_argument("--beta", type=float, default=0.05, help="2종 오류율 (default: 0.05)")
+    test.add_argument("--max-pairs", type=int, default=20000, help="판정이 안 나도 멈출 쌍 수 (default: 20000)")
+
+    rr = sub.add_parser("gauntlet", help="에이전트 전체 리그전과 Elo 추정")
+    rr.add_argument("agents", nargs="*", help="참가 에이전트 (default: agents/ 안의 모든 에이전트)")
+    rr.add_argument("--pairs", type=int, default=100, help="대진마다 둘 쌍 수 (default: 100)")
+
+    for p in (test, rr):
+        p.add_argument("--workers", "-w", type=int, default=1, help="병렬 대국 수 (default: 1)")
+        p.add_argument("--xsize", type=int, default=5, help="가로 칸 수 (default: 5)")
+        p.add_argument("--ysize", type=int, default=5, help="세로 칸 수 (default: 5)")
+        p.add_argument("--server", default=None, help="대국을 맡길 match_server.py 주소")
+    args = parser.parse_args()
+
+    workers = args.workers if args.server else min(args.workers, available_cpus())
+    if args.mode == "sprt":
+        verdict, stats = sprt([args.agent1, args.agent2], args.elo0, args.elo1, args.alpha, args.beta,
+                              args.max_pairs, args.xsize, args.ysize, workers, args.server)
+        result = {"H1": f"H1 accepted: {args.agent1} is at least {args.elo1:+g} Elo",
+                  "H0": f"H0 accepted: {args.agent1} is at most {args.elo0:+g} Elo",
+                  None: "no decision within --max-pairs"}[verdict]
+        print(result)
+        print(f"pairs {stats.pairs}  pentanomial {stats.counts}  Elo {format_elo(stats)}")
+    else:
+        names = args.agents or discover_agents()
+        if len(names) < 2:
+            parser.error("a gauntlet needs at least two agents")
+        matches, ratings, errors = gauntlet(names, args.pairs, args.xsize, args.ysize, workers, args.server)
+        print("==== matches ====")
+        for (i, j), stats in matches.items():
+            print(f"{names[i]:>16} vs {names[j]:<16} pairs {stats.pairs:5d}  Elo {format_elo(stats)}")
+        print("==== ratings (mean 0, 95% interval) ====")
+        for k in np.argsort(-ratings):
+            print(f"{names[k]:>16} {ratings[k]:+8.1f} ± {Z95 * errors[k]:.1f}")
+
+if __name__ == "__main__":
+    main()
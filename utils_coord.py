@@ -1,44 +1,53 @@
-def coord_to_idx(x, y, z):
-    return (x * 6 + y) if z == 0 else (30 + x * 5 + y)
+from functools import lru_cache
 
-def idx_to_coord(idx):
-    z = idx >= 30
-    base = 6 - z
-    i = idx - 30*z
+# Edge index: horizontal lines (z = 0) first, x * (ysize + 1) + y, then vertical lines (z = 1).
+def coord_to_idx(x, y, z, xsize=5, ysize=5):
+    return (x * (ysize + 1) + y) if z == 0 else (xsize * (ysize + 1) + x * ysize + y)
+
+def idx_to_coord(idx, xsize=5, ysize=5):
+    horizontal = xsize * (ysize + 1)
+    z = idx >= horizontal
+    base = ysize + 1 - z
+    i = idx - horizontal*z
     return [i // base, i % base, int(z)]
 
-def get_box_edges(x, y):
-    top    = coord_to_idx(x,   y,   0)
-    bottom = coord_to_idx(x,   y+1, 0)
-    left   = coord_to_idx(x,   y,   1)
-    right  = coord_to_idx(x+1, y,   1)
+def is_valid_coord(x, y, z, xsize=5, ysize=5):
+    if z == 0:
+        return 0 <= x < xsize and 0 <= y <= ysize
+    return z == 1 and 0 <= x <= xsize and 0 <= y < ysize
+
+def get_box_edges(x, y, xsize=5, ysize=5):
+    top    = coord_to_idx(x,   y,   0, xsize, ysize)
+    bottom = coord_to_idx(x,   y+1, 0, xsize, ysize)
+    left   = coord_to_idx(x,   y,   1, xsize, ysize)
+    right  = coord_to_idx(x+1, y,   1, xsize, ysize)
     return [top, bottom, left, right]
 
-def get_edge_squares(idx):
-    x, y, z = idx_to_coord(idx)
+def get_edge_squares(idx, xsize=5, ysize=5):
+    x, y, z = idx_to_coord(idx, xsize, ysize)
     squares = []
 
     if z == 0:
-        if y <= 4:
+        if y < ysize:
             squares.append((x, y))
-        if y >= 1 and y <= 5:
+        if y >= 1:
             squares.append((x, y-1))
     else:
-        if x <= 4:
+        if x < xsize:
             squares.append((x, y))
-        if x >= 1 and x <= 5:
+        if x >= 1:
             squares.append((x-1, y))
 
     return squares
     
-def apply_move(state_vec, square_owner, move_idx, player_id):
+def apply_move(state_vec, square_owner, move_idx, player_id, xsize=5, ysize=5):
     state_vec[move_idx] = 1.0
     completed = 0
 
-    for (bx, by) in get_edge_squares(move_idx):
+    for (bx, by) in get_edge_squares(move_idx, xsize, ysize):
         if square_owner[bx][by] != 0:
             continue
-        edges = get_box_edges(bx, by)
+        edges = get_box_edges(bx, by, xsize, ysize)
         if all(state_vec[e] != 0 for e in edges):
             square_owner[bx][by] = player_id
             completed += 1
@@ -46,11 +55,95 @@ def apply_move(state_vec, square_owner, move_idx, player_id):
     return completed
 
 def build_board_lines_from_state_vec(state_vec, xsize=5, ysize=5):
-    board_lines = [[[0, 0] for _ in range(6)] for _ in range(6)]
+    board_lines = [[[0, 0] for _ in range(ysize + 1)] for _ in range(xsize + 1)]
 
     for idx, v in enumerate(state_vec):
-        x, y, z = idx_to_coord(idx)
-        if (z == 0 and x < xsize) or (z == 1 and y < ysize):
-            board_lines[x][y][z] = 1 if v != 0 else 0
+        x, y, z = idx_to_coord(idx, xsize, ysize)
+        board_lines[x][y][z] = 1 if v != 0 else 0
+
+    return board_lines
+
+def code_bit(idx, xsize=5, ysize=5):
+    # bit of edge idx in MapuAlpha's encode_board_lines() code: vertical lines first
+    x, y, z = idx_to_coord(idx, xsize, ysize)
+    return (y * (xsize + 1) + x) if z == 1 else ((xsize + 1) * ysize + y * xsize + x)
+
+class BoardTables:
+    def __init__(self, xsize, ysize):
+        self.xsize = xsize
+        self.ysize = ysize
+        self.num_edges = xsize * (ysize + 1) + (xsize + 1) * ysize
+        self.num_boxes = xsize * ysize
+        self.full_board = (1 << self.num_edges) - 1
+        self.code_bits = [1 << code_bit(i, xsize, ysize) for i in range(self.num_edges)]
+        # box x * ysize + y
+        self.box_masks = [sum(1 << e for e in get_box_edges(x, y, xsize, ysize))
+                          for x in range(xsize) for y in range(ysize)]
+        # per edge: (box index, 4-edge mask) of each box the edge borders
+        self.edge_box_masks = [[(bx * ysize + by, self.box_masks[bx * ysize + by])
+                                for bx, by in get_edge_squares(i, xsize, ysize)]
+                               for i in range(self.num_edges)]
+
+@lru_cache(maxsize=None)
+def board_tables(xsize=5, ysize=5):
+    return BoardTables(xsize, ysize)
+
+_DEFAULT = board_tables()
+NUM_EDGES = _DEFAULT.num_edges
+NUM_BOXES = _DEFAULT.num_boxes
+FULL_BOARD = _DEFAULT.full_board
+CODE_BITS = _DEFAULT.code_bits
+BOX_MASKS = _DEFAULT.box_masks
+EDGE_BOX_MASKS = _DEFAULT.edge_box_masks
+
+class BoardState:
+    __slots__ = ("tables", "edges", "code", "edge_owner", "box_owner", "legal_moves")
+
+    def __init__(self, xsize=5, ysize=5):
+        self.tables = board_tables(xsize, ysize)
+        self.edges = 0                         # bit idx set when edge idx is drawn
+        self.code = 0                          # same set in encode_board_lines() order
+        self.edge_owner = bytearray(self.tables.num_edges) # 0 = empty, else player_id + 1
+        self.box_owner = bytearray(self.tables.num_boxes)  # box x * ysize + y, 0 = open, else player_id + 1
+        self.legal_moves = set(range(self.tables.num_edges))
+
+    @classmethod
+    def from_code(cls, code, xsize=5, ysize=5):
+        # lines of an encode_board_lines() code, all owned by player 0
+        board = cls(xsize, ysize)
+        for idx, bit in enumerate(board.tables.code_bits):
+            if code & bit:
+                board.apply_move(idx, 0)
+        return board
+
+    def is_legal(self, move_idx):
+        return move_idx is not None and 0 <= move_idx < self.tables.num_edges and not (self.edges >> move_idx) & 1
+
+    def is_over(self):
+        return self.edges == self.tables.full_board
+
+    def apply_move(self, move_idx, player_id):
+        tables = self.tables
+        edges = self.edges | (1 << move_idx)
+        self.edges = edges
+        self.code |= tables.code_bits[move_idx]
+        self.edge_owner[move_idx] = player_id + 1
+        self.legal_moves.discard(move_idx)
+
+        completed = 0
+        for box, mask in tables.edge_box_masks[move_idx]:
+            if edges & mask == mask:
+                self.box_owner[box] = player_id + 1
+                completed += 1
+        return completed
 
-    return board_lines
\ No newline at end of file
+    def to_board_lines(self):
+        xsize, ysize = self.tables.xsize, self.tables.ysize
+        board_lines = [[[0, 0] for _ in range(ysize + 1)] for _ in range(xsize + 1)]
+        edges = self.edges
+        while edges:
+            low = edges & -edges
+            x, y, z = idx_to_coord(low.bit_length() - 1, xsize, ysize)
+            board_lines[x][y][z] = 1
+            edges ^= low
+        return board_lines